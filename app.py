@@ -118,8 +118,8 @@ def search_route():
         from pathlib import Path
         import os
         index_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "index", "policies.jsonl")
-        recs = scripts.search_jsonl.load_index(Path(index_path))
-        results = scripts.search_jsonl.search(recs, q, topk=topk)
+        recs, bm25 = scripts.search_jsonl.get_index(Path(index_path))
+        results = scripts.search_jsonl.search(recs, q, topk=topk, bm25=bm25)
         sources = [
             {"doc_id": r.get("doc_id"), "chunk_id": int(r.get("chunk_id", 0))}
             for r in results
@@ -134,19 +134,75 @@ def search_route():
         }
         return jsonify(payload), 200
 
-@app.route("/ask", methods=["POST", "GET"])
-def ask():
-    if request.method == "POST":
-        data = request.get_json(silent=True) or {}
-        question = (data.get("question") or "").strip()
-        topk = int(data.get("topk") or 4)
+@app.route("/search/batch", methods=["POST"])
+def search_batch_route():
+    """
+    Vector retrieval for many queries in one call.
+    Body: {"queries": [...], "topk": 3, "method": "headings"|"token" (optional)}
+    Without "method" the data/index embeddings are searched (same as /search?mode=vector);
+    with it, the Step 5 embedding DB for that chunking method is used.
+    """
+    data = request.get_json(silent=True) or {}
+    queries = data.get("queries")
+    if not isinstance(queries, list) or not queries:
+        return jsonify({"error": "queries must be a non-empty list"}), 400
+    queries = [str(q).strip() for q in queries]
+    if not all(queries):
+        return jsonify({"error": "queries must not contain empty strings"}), 400
+    max_batch = int(os.environ.get("SEARCH_BATCH_MAX", 256))
+    if len(queries) > max_batch:
+        return jsonify({"error": f"at most {max_batch} queries per batch"}), 413
+    try:
+        topk = max(1, int(data.get("topk") or 3))
+    except (TypeError, ValueError):
+        return jsonify({"error": "topk must be an integer"}), 400
+    method = data.get("method") or None
+    if method is not None and method not in ("headings", "token"):
+        return jsonify({"error": "method must be 'headings' or 'token'"}), 400
+    t0 = time.time()
+    if method:
+        from steps.step7.services_rag import load_store, embed_queries, retrieve_chunks_batch
+        from steps.step7.services_rag_exceptions import EmbeddingsMissing
+        try:
+            store = load_store(method)
+            q_mat = embed_queries(queries, store.config)
+        except EmbeddingsMissing as e:
+            return jsonify({"error": str(e)}), 503
+        except ValueError as e:
+            # DB embedded with a method that has no query encoder here (e.g. openai)
+            return jsonify({"error": f"{method} embeddings cannot be searched: {e}"}), 503
+        per_query = [
+            [{k: c[k] for k in ("rank", "score", "doc_id", "chunk_id", "snippet")} for c in chunks]
+            for chunks in retrieve_chunks_batch(q_mat, store, topk)
+        ]
     else:
-        question = (request.args.get("q") or request.args.get("question") or "").strip()
-        topk = int(request.args.get("topk") or 4)
-    if not question:
-        return jsonify({"error": "question is required"}), 400
-    from scripts.generate_answer import run as rag_run
-    res = rag_run(question, topk=topk)
+        from scripts.vector_search import index_ready, search_batch
+        if not index_ready():
+            return jsonify({"error": "vector index missing; run scripts/index_jsonl.py and scripts/embed_index.py"}), 503
+        per_query = search_batch(queries, topk=topk)
+    results = []
+    for q, hits in zip(queries, per_query):
+        results.append({
+            "query": q,
+            "results": hits,
+            "sources": [
+                {"doc_id": r.get("doc_id"), "chunk_id": int(r.get("chunk_id", 0))}
+                for r in hits
+                if r.get("doc_id") is not None
+            ],
+        })
+    payload = {
+        "mode": "vector",
+        "method": method,
+        "topk": topk,
+        "count": len(results),
+        "elapsed_ms": int((time.time() - t0) * 1000),
+        "results": results,
+    }
+    return jsonify(payload), 200
+
+def ask_payload(res: dict, question: str) -> dict:
+    """Shape a generate_answer.run() result for /ask (shared with the ASGI app)."""
     answer_text = res.get("answer", "")
     sources = res.get("sources", [])
     # Build a clean sources array for frontend rendering
@@ -158,7 +214,7 @@ def ask():
             "chunk_id": s.get("chunk_id", "?"),
             "score": s.get("score", 0)
         })
-    payload = {
+    return {
         "question": res.get("question", question),
         "answer": answer_text,
         "sources": sources_list,
@@ -167,6 +223,21 @@ def ask():
         "model": res.get("model", ""),
         "tokens": res.get("tokens", 0),
     }
+
+@app.route("/ask", methods=["POST", "GET"])
+def ask():
+    if request.method == "POST":
+        data = request.get_json(silent=True) or {}
+        question = (data.get("question") or "").strip()
+        topk = int(data.get("topk") or 4)
+    else:
+        question = (request.args.get("q") or request.args.get("question") or "").strip()
+        topk = int(request.args.get("topk") or 4)
+    if not question:
+        return jsonify({"error": "question is required"}), 400
+    from scripts.generate_answer import run as rag_run
+    res = rag_run(question, topk=topk)
+    payload = ask_payload(res, question)
     return jsonify(payload), 200
 
 
@@ -230,6 +301,14 @@ def keepalive_status():
     from flask import Response
     return Response(status_json(), mimetype="application/json")
 
+# --- Query encoder registry (optional pre-warm via PREWARM_ENCODERS) ---
+from services.encoder_registry import warm_encoders, encoder_stats
+warm_encoders(logger=app.logger)
+
+@app.get("/encoders/status")
+def encoders_status():
+    return jsonify(encoder_stats()), 200
+
 # Toggle keepalive on/off from homepage
 @app.route("/keepalive/toggle", methods=["POST"])
 def keepalive_toggle():
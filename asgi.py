@@ -0,0 +1,103 @@
+"""
+ASGI entry point: uvicorn asgi:app --workers 1
+
+POST/GET /ask and JSON POSTs to /steps/7/ask are served by native coroutines
+(retrieval on a thread pool, LLM calls on pooled httpx.AsyncClients), so one
+process can keep hundreds of LLM round trips in flight. Every other route,
+including the HTML form flow of /steps/7/ask, is the unchanged Flask app
+behind asgiref's WSGI adapter.
+"""
+import json
+from urllib.parse import parse_qs
+
+from asgiref.wsgi import WsgiToAsgi
+
+from app import app as flask_app, ask_payload
+from scripts.generate_answer import run_async as rag_run_async
+from services.http_pool import aclose_clients
+from steps.step7.async_ask import ask_json, retrieval_executor
+
+wsgi_app = WsgiToAsgi(flask_app)
+
+
+def _headers(scope):
+    return {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope.get("headers", [])}
+
+
+def _wants_json(headers):
+    # Same test as ask_route's JSON branch, decided before the body is read
+    return (headers.get("accept", "").startswith("application/json")
+            or headers.get("content-type", "").startswith("application/json"))
+
+
+async def _read_body(receive):
+    body = b""
+    more = True
+    while more:
+        message = await receive()
+        body += message.get("body", b"")
+        more = message.get("more_body", False)
+    return body
+
+
+def _parse_body(headers, body):
+    if headers.get("content-type", "").startswith("application/json"):
+        try:
+            data = json.loads(body or b"{}")
+        except ValueError:
+            return {}
+        return data if isinstance(data, dict) else {}
+    return {k: v[0] for k, v in parse_qs(body.decode("utf-8", "replace")).items()}
+
+
+async def _send_json(send, status, payload):
+    body = json.dumps(payload).encode("utf-8")
+    await send({"type": "http.response.start", "status": status,
+                "headers": [(b"content-type", b"application/json"),
+                            (b"content-length", str(len(body)).encode("ascii"))]})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def ask(scope, receive, send):
+    headers = _headers(scope)
+    if scope["method"] == "POST":
+        body = await _read_body(receive)
+        # Like request.get_json(silent=True): non-JSON bodies are ignored
+        data = _parse_body(headers, body) if headers.get("content-type", "").startswith("application/json") else {}
+    else:
+        data = {k: v[0] for k, v in parse_qs(scope.get("query_string", b"").decode("utf-8")).items()}
+        data["question"] = data.get("q") or data.get("question")
+    question = (data.get("question") or "").strip()
+    if not question:
+        return await _send_json(send, 400, {"error": "question is required"})
+    res = await rag_run_async(question, topk=int(data.get("topk") or 4), executor=retrieval_executor)
+    await _send_json(send, 200, ask_payload(res, question))
+
+
+async def step7_ask(scope, receive, send):
+    headers = _headers(scope)
+    status, payload = await ask_json(_parse_body(headers, await _read_body(receive)))
+    await _send_json(send, status, payload)
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await aclose_clients()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        return await _lifespan(receive, send)
+    if scope["type"] == "http":
+        path, method = scope["path"], scope["method"]
+        if path == "/ask" and method in ("GET", "POST"):
+            return await ask(scope, receive, send)
+        if path == "/steps/7/ask" and method == "POST" and _wants_json(_headers(scope)):
+            return await step7_ask(scope, receive, send)
+    await wsgi_app(scope, receive, send)
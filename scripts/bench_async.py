@@ -0,0 +1,125 @@
+"""
+Benchmark the sync (Flask/WSGI) and async (asgi.py) /ask serving paths.
+
+A local stub LLM server answers every chat/completions call after --llm-delay
+seconds, standing in for the provider round trip. The sync path is driven by
+--workers threads through Flask's test client (one thread = one blocked
+gunicorn worker); the async path pushes --concurrency requests at once through
+the ASGI app in a single event loop.
+
+  python scripts/bench_async.py --requests 200 --workers 4 --concurrency 200 --llm-delay 0.5
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class _StubLLM(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    delay = 0.5
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(self.delay)
+        body = json.dumps({"model": "stub", "choices": [{"message": {"content": "Stub answer [S1]."}}],
+                           "usage": {"total_tokens": 1}}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def _summary(name, latencies, elapsed):
+    latencies = sorted(latencies)
+    n = len(latencies)
+    return {
+        "path": name,
+        "requests": n,
+        "elapsed_s": round(elapsed, 2),
+        "req_per_s": round(n / elapsed, 1) if elapsed else 0,
+        "p50_ms": int(latencies[n // 2] * 1000) if n else 0,
+        "p95_ms": int(latencies[min(n - 1, int(n * 0.95))] * 1000) if n else 0,
+    }
+
+
+def bench_sync(flask_app, questions, workers):
+    client = flask_app.test_client()
+
+    def one(q):
+        t0 = time.time()
+        r = client.post("/ask", json={"question": q})
+        assert r.status_code == 200, r.status_code
+        return time.time() - t0
+
+    t0 = time.time()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        latencies = list(pool.map(one, questions))
+    return _summary(f"sync x{workers} workers", latencies, time.time() - t0)
+
+
+async def bench_async(asgi_app, questions, concurrency):
+    import httpx
+    from services.http_pool import aclose_clients
+    sem = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=asgi_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        async def one(q):
+            async with sem:
+                t0 = time.time()
+                r = await client.post("/ask", json={"question": q})
+                assert r.status_code == 200, r.status_code
+                return time.time() - t0
+
+        t0 = time.time()
+        latencies = await asyncio.gather(*[one(q) for q in questions])
+        elapsed = time.time() - t0
+    await aclose_clients()
+    return _summary(f"async c={concurrency}", latencies, elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=4, help="sync workers (gunicorn workers x threads)")
+    parser.add_argument("--concurrency", type=int, default=100, help="in-flight requests for the async path")
+    parser.add_argument("--llm-delay", type=float, default=0.5, help="stub LLM latency in seconds")
+    args = parser.parse_args()
+
+    _StubLLM.delay = args.llm_delay
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubLLM)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    # Must be set before scripts.llm_client is imported
+    os.environ["GROQ_API_KEY"] = "bench"
+    os.environ["LLM_GROQ_BASE_URL"] = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    os.environ["ANSWER_CACHE_SIZE"] = "0"
+    os.environ["LLM_HTTP2"] = "0"
+    os.environ.setdefault("LLM_POOL_MAX_CONNECTIONS", str(max(args.workers, 20)))
+
+    from asgi import app as asgi_app, flask_app
+    questions = [f"How many PTO days do employees get? ({i})" for i in range(args.requests)]
+    # Silence the per-request "[retrieval] ..." lines
+    with contextlib.redirect_stderr(io.StringIO()):
+        results = [bench_sync(flask_app, questions, args.workers),
+                   asyncio.run(bench_async(asgi_app, questions, args.concurrency))]
+    server.shutdown()
+    for r in results:
+        print(json.dumps(r))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Benchmark Step 4 chunk output: the old per-row json.dumps + write() writer and
+per-document log appends against the batched write_jsonl() / write_logs(), on
+a synthetic corpus. Reports chunks/s and checks the JSONL bytes are identical.
+
+  python scripts/bench_chunk_write.py --docs 200 --chunks 500 --chars 3000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from steps.step4 import services_chunk
+
+WORDS = ("Employees accrue paid time off at a rate of 1.5 days per month. Managers approve "
+         "requests through the \"HR portal\" — see §4\tand naïve cases.\n").split(" ")
+
+
+def _old_write_jsonl(chunks, out_path, doc_id, method, params):
+    # write_jsonl() before batching: one dict, json.dumps and write() per chunk
+    with open(out_path, 'w', encoding='utf-8') as f:
+        for idx, chunk in enumerate(chunks):
+            rec = {'doc_id': doc_id, 'chunk_id': idx, 'method': method, 'params': params, 'text': chunk}
+            f.write(json.dumps(rec, ensure_ascii=False) + '\n')
+
+
+def _run(label, write, logs, docs, out_dir):
+    os.makedirs(out_dir)
+    params = {'window_size': 700, 'overlap': 150, 'tokenization': 'whitespace_approx'}
+    t0 = time.perf_counter()
+    entries = []
+    for doc_id, chunks in docs:
+        write(chunks, os.path.join(out_dir, f'{doc_id}.jsonl'), doc_id, 'token', params)
+        if logs == 'per-doc':
+            services_chunk.write_log(doc_id, 'token', len(chunks), 0, params)
+        else:
+            entries.append(services_chunk.log_entry(doc_id, 'token', len(chunks), 0, params))
+    services_chunk.write_logs(entries)
+    elapsed = time.perf_counter() - t0
+    n = sum(len(chunks) for _, chunks in docs)
+    return {"path": label, "chunks": n, "elapsed_s": round(elapsed, 2), "chunks_per_s": int(n / elapsed)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=200)
+    parser.add_argument("--chunks", type=int, default=500, help="chunks per document")
+    parser.add_argument("--chars", type=int, default=3000, help="approximate characters per chunk")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    pool = [" ".join(rng.choice(WORDS) for _ in range(args.chars // 6)) for _ in range(64)]
+    docs = [(f"doc_{d:04d}", [rng.choice(pool) for _ in range(args.chunks)]) for d in range(args.docs)]
+    with tempfile.TemporaryDirectory(prefix="bench_chunk_write_") as tmp:
+        services_chunk.CHUNK_LOG = os.path.join(tmp, "chunk.jsonl")
+        rows = [_run("per-row dumps + per-doc log", _old_write_jsonl, "per-doc", docs, os.path.join(tmp, "old")),
+                _run("batched write_jsonl + write_logs", services_chunk.write_jsonl, "batched", docs,
+                     os.path.join(tmp, "new"))]
+        identical = all(open(os.path.join(tmp, "old", f"{d}.jsonl"), "rb").read()
+                        == open(os.path.join(tmp, "new", f"{d}.jsonl"), "rb").read() for d, _ in docs)
+    for row in rows:
+        print(json.dumps(row))
+    print(json.dumps({"identical": identical}))
+
+
+if __name__ == "__main__":
+    main()
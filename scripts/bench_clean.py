@@ -0,0 +1,86 @@
+"""
+Benchmark the streaming Step 3 cleaner against the old whole-text pipeline on
+a synthetic multi-MB parsed file (the repo's Parse-Results repeated).
+
+  python scripts/bench_clean.py --mb 50
+
+Reports wall time and tracemalloc peak for both and checks the outputs match.
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+import unicodedata
+from html import unescape
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import ingest_utils
+
+
+def _whole_text_clean(src, dst):
+    # clean_text() before the streaming rewrite
+    with open(src, "r", encoding="utf-8") as f:
+        text = f.read()
+    text = re.sub(r"\n{3,}", "\n\n", text)
+    text = text.replace("\t", " ")
+    text = "\n".join([line.rstrip() for line in text.splitlines()])
+    text = unicodedata.normalize("NFKC", text)
+    text = unescape(text)
+    with open(dst, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def _streaming_clean(src, dst):
+    res, _ = ingest_utils._clean_doc(src, os.path.dirname(dst))
+    os.replace(res["cleaned_path"], dst)
+
+
+def _measure(name, fn, src, dst):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    fn(src, dst)
+    elapsed = time.perf_counter() - t0
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    size = os.path.getsize(src)
+    return {"path": name, "mb": round(size / 1e6, 1), "elapsed_s": round(elapsed, 2),
+            "mb_per_s": round(size / elapsed / 1e6, 1), "peak_mem_mb": round(peak / 1e6, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mb", type=float, default=20, help="approximate input size")
+    args = parser.parse_args()
+
+    corpus = ""
+    for p in sorted(glob.glob(os.path.join("steps", "step2", "Parse-Results", "*.txt"))):
+        with open(p, "r", encoding="utf-8") as f:
+            corpus += f.read() + "\n\n\n"
+    corpus = corpus or "Heading\t \n\n\n\nBody “text” &amp; more   \n"
+    with tempfile.TemporaryDirectory(prefix="bench_clean_") as tmp:
+        src = os.path.join(tmp, "big.txt")
+        with open(src, "w", encoding="utf-8") as f:
+            written = 0
+            while written < args.mb * 1e6:
+                f.write(corpus)
+                written += len(corpus.encode("utf-8"))
+        out_a, out_b = os.path.join(tmp, "a", "whole.txt"), os.path.join(tmp, "b", "stream.txt")
+        os.makedirs(os.path.dirname(out_a))
+        os.makedirs(os.path.dirname(out_b))
+        rows = [_measure("whole-text", _whole_text_clean, src, out_a),
+                _measure("streaming", _streaming_clean, src, out_b)]
+        with open(out_a, "rb") as a, open(out_b, "rb") as b:
+            identical = a.read() == b.read()
+    for row in rows:
+        print(json.dumps(row))
+    print(json.dumps({"identical": identical}))
+
+
+if __name__ == "__main__":
+    main()
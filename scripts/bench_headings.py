@@ -0,0 +1,110 @@
+"""
+Micro-benchmark for Step 4 heading detection: the per-line re.match loop that
+headings_chunk() used to run vs the single compiled multiline pass, on
+synthetic policy-like documents of 10k-1M lines. Every run checks that both
+produce identical chunks.
+
+  python scripts/bench_headings.py --lines 10000 100000 1000000
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from steps.step4.services_chunk import headings_chunk_text
+
+LINES = [
+    "# Leave Policy", "## Eligibility", "Section 4.2", "Purpose", "SCOPE", "Definitions:",
+    "Employees accrue paid time off at a rate of 1.5 days per month of service.",
+    "Requests must be submitted through the HR portal at least two weeks in advance.",
+    "Managers approve or decline within five business days.", "", "", "Overview", "========",
+    "Details", "-------", "  Indented note with trailing spaces   ",
+]
+
+
+def _per_line_chunk(text, mode, min_heading_gap=1, max_chunk_len=None):
+    # headings_chunk() before the single-pass rewrite
+    lines = text.splitlines()
+    chunks = []
+    chunk_starts = []
+    for i, line in enumerate(lines):
+        is_heading = False
+        if mode == 'markdown_atx' and re.match(r'^#{1,6}\s+.+', line):
+            is_heading = True
+        elif mode == 'setext' and i+1 < len(lines) and re.match(r'^(=+|-+)$', lines[i+1]):
+            is_heading = True
+        elif mode == 'heuristic':
+            if re.match(r'^#{1,6}\s+.+', line):
+                is_heading = True
+            elif i+1 < len(lines) and re.match(r'^(=+|-+)$', lines[i+1]):
+                is_heading = True
+            elif len(line) <= 80 and line.endswith(':'):
+                is_heading = True
+            elif len(line) <= 60 and line.isupper() and (i+1 == len(lines) or lines[i+1].strip() == ''):
+                is_heading = True
+            elif re.match(r'^(Section|Policy|Purpose|Scope)', line) and (i+1 == len(lines) or lines[i+1].strip() == ''):
+                is_heading = True
+        if is_heading:
+            chunk_starts.append(i)
+    if chunk_starts and chunk_starts[0] != 0:
+        chunk_starts = [0] + chunk_starts
+    chunk_starts.append(len(lines))
+    for idx in range(len(chunk_starts)-1):
+        start, end = chunk_starts[idx], chunk_starts[idx+1]
+        chunk = '\n'.join(lines[start:end]).strip()
+        if chunk:
+            chunks.append(chunk)
+    if min_heading_gap > 1 and len(chunks) > 1:
+        merged = []
+        buf = chunks[0]
+        for c in chunks[1:]:
+            if len(buf.split()) < min_heading_gap:
+                buf += '\n' + c
+            else:
+                merged.append(buf)
+                buf = c
+        merged.append(buf)
+        chunks = merged
+    if max_chunk_len:
+        wrapped = []
+        for chunk in chunks:
+            words = chunk.split()
+            while len(words) > max_chunk_len:
+                wrapped.append(' '.join(words[:max_chunk_len]))
+                words = words[max_chunk_len:]
+            wrapped.append(' '.join(words))
+        chunks = wrapped
+    return chunks
+
+
+def _timed(fn, *args):
+    t0 = time.perf_counter()
+    out = fn(*args)
+    return out, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lines", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--modes", nargs="+", default=["markdown_atx", "setext", "heuristic"])
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    for n in args.lines:
+        text = "\n".join(rng.choice(LINES) for _ in range(n)) + "\n"
+        for mode in args.modes:
+            for gap, max_len in [(1, None), (20, 200)]:
+                old, t_old = _timed(_per_line_chunk, text, mode, gap, max_len)
+                new, t_new = _timed(headings_chunk_text, text, mode, gap, max_len)
+                print(json.dumps({"lines": n, "mode": mode, "min_heading_gap": gap, "max_chunk_len": max_len,
+                                  "chunks": len(new), "per_line_s": round(t_old, 3), "single_pass_s": round(t_new, 3),
+                                  "speedup": round(t_old / max(t_new, 1e-9), 1), "identical": old == new}))
+
+
+if __name__ == "__main__":
+    main()
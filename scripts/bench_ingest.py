@@ -0,0 +1,87 @@
+"""
+Compare sequential parse/clean (parse_file/clean_text in a loop) with the
+process-pool batch API on the Step 1 policies, writing into a temp dir.
+
+  python scripts/bench_ingest.py --workers 4 --repeat 5
+
+--repeat N copies the corpus N times so the pool has enough work to amortize
+its start-up cost.
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import ingest_utils
+
+
+def _corpus(src_dir, dst_dir, repeat):
+    os.makedirs(dst_dir)
+    paths = []
+    for r in range(repeat):
+        for fname in sorted(os.listdir(src_dir)):
+            src = os.path.join(src_dir, fname)
+            if os.path.isfile(src):
+                base, ext = os.path.splitext(fname)
+                dst = os.path.join(dst_dir, f"{base}-{r}{ext}")
+                shutil.copyfile(src, dst)
+                paths.append(dst)
+    return paths
+
+
+def _throughput(name, n_docs, n_bytes, elapsed):
+    return {"path": name, "docs": n_docs, "elapsed_ms": int(elapsed * 1000),
+            "docs_per_s": round(n_docs / elapsed, 2), "mb_per_s": round(n_bytes / elapsed / 1e6, 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--src", default=os.path.join("steps", "step1", "data-Policies"))
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="bench_ingest_")
+    try:
+        # Keep logs/stats of the benchmark out of the repo
+        ingest_utils.PARSE_LOG = os.path.join(tmp, "parse.jsonl")
+        ingest_utils.CLEAN_LOG = os.path.join(tmp, "clean.jsonl")
+        ingest_utils.PARSED_STATS_CSV = os.path.join(tmp, "parsed_stats.csv")
+        paths = _corpus(args.src, os.path.join(tmp, "src"), args.repeat)
+        n_bytes = sum(os.path.getsize(p) for p in paths)
+        out = []
+
+        t0 = time.perf_counter()
+        seq = []
+        for p in paths:
+            res, log = ingest_utils._parse_doc(p, os.path.join(tmp, "raw_seq"))
+            ingest_utils._record_parse([log], [res])
+            seq.append(res)
+        out.append(_throughput("parse sequential", len(paths), n_bytes, time.perf_counter() - t0))
+
+        batch = ingest_utils.parse_batch(paths, workers=args.workers, out_dir=os.path.join(tmp, "raw_batch"))
+        out.append(_throughput(f"parse batch x{args.workers}", batch["docs"], n_bytes, batch["elapsed_ms"] / 1000))
+        assert [r["status"] for r in batch["results"]] == [r["status"] for r in seq]
+
+        raw = [r["parsed_raw_path"] for r in batch["results"] if r["status"] != "error"]
+        raw_bytes = sum(os.path.getsize(p) for p in raw)
+        t0 = time.perf_counter()
+        for p in raw:
+            res, log = ingest_utils._clean_doc(p, os.path.join(tmp, "clean_seq"))
+            ingest_utils._record_clean([log], [res])
+        out.append(_throughput("clean sequential", len(raw), raw_bytes, time.perf_counter() - t0))
+        batch = ingest_utils.clean_batch(raw, workers=args.workers, out_dir=os.path.join(tmp, "clean_batch"))
+        out.append(_throughput(f"clean batch x{args.workers}", batch["docs"], raw_bytes, batch["elapsed_ms"] / 1000))
+        for row in out:
+            print(json.dumps(row))
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
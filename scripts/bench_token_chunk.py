@@ -0,0 +1,87 @@
+"""
+Benchmark Step 4 token windows: the old whole-document token list against the
+block-bounded token_chunk() and streaming iter_token_chunks(), on a synthetic
+multi-MB document. Reports wall time and tracemalloc peak, and checks all three
+produce identical chunks.
+
+  python scripts/bench_token_chunk.py --mb 20 --window 700 --overlap 150
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from steps.step4.services_chunk import iter_token_chunks, token_chunk
+
+WORDS = ("employees accrue paid time off at a rate of days per month managers approve requests "
+         "through the HR portal policy section scope purpose").split()
+
+
+def _token_list_chunk(doc_path, window_size, overlap, tokenization):
+    # token_chunk() before the block-bounded rewrite
+    with open(doc_path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    tokens = text.split() if tokenization == 'whitespace_approx' else list(text)
+    chunks = []
+    i = 0
+    while i < len(tokens):
+        chunk = ' '.join(tokens[i:i+window_size])
+        if chunk:
+            chunks.append(chunk)
+        i += window_size - overlap
+    return chunks
+
+
+def _count(chunks):
+    # Consume without keeping, so peak memory reflects the chunker itself
+    n = 0
+    for _ in chunks:
+        n += 1
+    return n
+
+
+def _measure(name, fn):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    out = fn()
+    elapsed = time.perf_counter() - t0
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return out, {"path": name, "elapsed_s": round(elapsed, 2), "peak_mem_mb": round(peak / 1e6, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mb", type=float, default=20)
+    parser.add_argument("--window", type=int, default=700)
+    parser.add_argument("--overlap", type=int, default=150)
+    parser.add_argument("--tokenization", default="whitespace_approx")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory(prefix="bench_token_") as tmp:
+        path = os.path.join(tmp, "doc.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            written = 0
+            while written < args.mb * 1e6:
+                line = " ".join(rng.choice(WORDS) for _ in range(12)) + ("\n\n" if rng.random() < 0.1 else "\n")
+                f.write(line)
+                written += len(line)
+        w, o, t = args.window, args.overlap, args.tokenization
+        ref, row_old = _measure("token list", lambda: _token_list_chunk(path, w, o, t))
+        new, row_new = _measure("block-bounded list", lambda: token_chunk(path, w, o, t))
+        n_stream, row_stream = _measure("streaming (not kept)", lambda: _count(iter_token_chunks(path, w, o, t)))
+        identical = new == ref and list(iter_token_chunks(path, w, o, t)) == ref
+    for row in (row_old, row_new, row_stream):
+        print(json.dumps(dict(row, chunks=len(ref) if row is not row_stream else n_stream)))
+    print(json.dumps({"identical": identical}))
+
+
+if __name__ == "__main__":
+    main()
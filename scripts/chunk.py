@@ -7,13 +7,15 @@ Simple Markdown chunker with no external deps.
 - Prefers to break on blank lines or headings
 - Prints a brief report and sample chunks
 """
+from bisect import bisect_right
 from pathlib import Path
 import re
-from typing import List
+from typing import Iterator, List
 
 CORPUS_DIR = Path("data/policies")
 
-def split_with_overlap(text: str, max_chars: int = 600, overlap: int = 100) -> List[str]:
+def iter_split_with_overlap(text: str, max_chars: int = 600, overlap: int = 100) -> Iterator[str]:
+    """Lazy version of split_with_overlap(): yields the same chunks one at a time."""
     # Normalize line endings
     text = text.replace("\r\n", "\n").replace("\r", "\n")
     # Candidate split points: blank lines or headings
@@ -23,23 +25,21 @@ def split_with_overlap(text: str, max_chars: int = 600, overlap: int = 100) -> L
     boundaries.append(len(text))
     boundaries = sorted(set(boundaries))
 
-    chunks = []
     i = 0
     while i < len(text):
         target_end = min(i + max_chars, len(text))
 
-        # Find the last boundary before or at target_end (but after i)
-        cut = None
-        for b in boundaries:
-            if i < b <= target_end:
-                cut = b
+        # Last boundary before or at target_end (but after i); boundaries are
+        # sorted, so bisect instead of scanning them all for every chunk
+        k = bisect_right(boundaries, target_end) - 1
+        cut = boundaries[k] if k >= 0 and boundaries[k] > i else None
         if cut is None or cut - i < max_chars * 0.3:
             # Fallback: hard cut
             cut = target_end
 
         chunk = text[i:cut].strip()
         if chunk:
-            chunks.append(chunk)
+            yield chunk
 
         if cut >= len(text):
             break
@@ -51,7 +51,8 @@ def split_with_overlap(text: str, max_chars: int = 600, overlap: int = 100) -> L
         if i >= cut:
             i = cut
 
-    return chunks
+def split_with_overlap(text: str, max_chars: int = 600, overlap: int = 100) -> List[str]:
+    return list(iter_split_with_overlap(text, max_chars=max_chars, overlap=overlap))
 
 def chunk_file(path: Path, max_chars: int = 600, overlap: int = 100) -> List[str]:
     text = path.read_text(encoding="utf-8", errors="replace")
@@ -0,0 +1,46 @@
+"""
+Convert Step 5 embedding DBs from meta.json to the columnar meta.bin.
+
+  python scripts/convert_meta.py                     # every DB under steps/step5/Embeddings
+  python scripts/convert_meta.py path/to/db --keep-json
+
+Segment folders (segments/seg-*) are converted too. Each file is verified
+row-by-row against the JSON before the JSON is removed.
+"""
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.meta_store import convert_folder
+
+EMBED_ROOT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'steps', 'step5', 'Embeddings')
+
+
+def _meta_folders(db):
+    yield db
+    seg_root = os.path.join(db, 'segments')
+    if os.path.isdir(seg_root):
+        for name in sorted(os.listdir(seg_root)):
+            yield os.path.join(seg_root, name)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('dbs', nargs='*', help='DB folders (default: all under steps/step5/Embeddings)')
+    parser.add_argument('--keep-json', action='store_true', help='keep meta.json next to meta.bin')
+    args = parser.parse_args()
+    dbs = args.dbs or [os.path.join(EMBED_ROOT, d) for d in sorted(os.listdir(EMBED_ROOT))
+                       if os.path.isdir(os.path.join(EMBED_ROOT, d))]
+    for db in dbs:
+        for folder in _meta_folders(db):
+            res = convert_folder(folder, keep_json=args.keep_json)
+            if res is None:
+                continue
+            rows, json_bytes, bin_bytes = res
+            print(f"[convert_meta] {folder}: {rows} rows, meta.json {json_bytes} B -> meta.bin {bin_bytes} B")
+
+
+if __name__ == '__main__':
+    main()
@@ -51,11 +51,11 @@ def retrieve(query: str, topk: int = 4) -> list:
             pass
     else:  # keyword (default)
         try:
-            from scripts.search_jsonl import search as kw_search, load_index
+            from scripts.search_jsonl import search as kw_search, get_index
             index_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "index", "policies.jsonl")
             from pathlib import Path
-            recs = load_index(Path(index_path))
-            hits = kw_search(recs, query, topk=topk)
+            recs, bm25 = get_index(Path(index_path))
+            hits = kw_search(recs, query, topk=topk, bm25=bm25)
             for h in hits:
                 t = h.get("text") or h.get("chunk") or h.get("content") or h.get("snippet")
                 if t is not None and str(t).strip():
@@ -91,32 +91,24 @@ def build_prompt(question: str, chunks: list) -> str:
     return "\n".join(lines)
 
 # --- Synthesis ---
-def synthesize(question: str, chunks: list):
-    from scripts.llm_client import generate_answer, is_configured, LLMNotConfigured
+def _postprocess(answer: str, chunks: list) -> str:
+    import re
+    # If answer has no [S#] and we had sources, append [S1]
+    if chunks and not re.search(r"\[S\d+\]", answer):
+        answer = answer.rstrip() + " [S1]"
+    # Trim to ~1200 chars, preserve citations
+    if len(answer) > 1200:
+        # Try to trim at a sentence boundary if possible
+        trimmed = answer[:1200]
+        last_period = trimmed.rfind('.')
+        if last_period > 900:
+            answer = trimmed[:last_period+1]
+        else:
+            answer = trimmed
+    return answer
+
+def _extractive_answer(chunks: list):
     import re
-    prompt = build_prompt(question, chunks)
-    if is_configured():
-        t0 = time.time()
-        try:
-            out = generate_answer(prompt)
-            llm_ms = int((time.time() - t0) * 1000)
-            answer = out["text"]
-            # If answer has no [S#] and we had sources, append [S1]
-            if chunks and not re.search(r"\[S\d+\]", answer):
-                answer = answer.rstrip() + " [S1]"
-            # Trim to ~1200 chars, preserve citations
-            if len(answer) > 1200:
-                # Try to trim at a sentence boundary if possible
-                trimmed = answer[:1200]
-                last_period = trimmed.rfind('.')
-                if last_period > 900:
-                    answer = trimmed[:last_period+1]
-                else:
-                    answer = trimmed
-            return answer, {"model": out["model"], "tokens": out["tokens"], "llm_ms": llm_ms}
-        except Exception as ex:
-            pass
-    # fallback: extractive summary
     snippets = [c["text"].strip().replace("\n", " ") for c in chunks[:3] if c.get("text") and str(c["text"]).strip()]
     if snippets:
         # Try to join into 3–5 sentences
@@ -129,12 +121,88 @@ def synthesize(question: str, chunks: list):
         answer = "No relevant policy excerpts found. (LLM disabled; extractive summary)"
     return answer, {"model": "disabled", "tokens": 0, "llm_ms": 0}
 
-# --- Main run ---
-def run(question: str, topk: int = 4):
-    t0 = time.time()
-    chunks = retrieve(question, topk=topk)
-    retrieval_ms = int((time.time() - t0) * 1000)
+def synthesize(question: str, chunks: list):
+    from scripts.llm_client import generate_answer, is_configured, LLMNotConfigured
+    prompt = build_prompt(question, chunks)
+    if is_configured():
+        t0 = time.time()
+        try:
+            out = generate_answer(prompt)
+            llm_ms = int((time.time() - t0) * 1000)
+            answer = _postprocess(out["text"], chunks)
+            return answer, {"model": out["model"], "tokens": out["tokens"], "llm_ms": llm_ms}
+        except Exception as ex:
+            pass
+    # fallback: extractive summary
+    return _extractive_answer(chunks)
+
+async def synthesize_async(question: str, chunks: list):
+    """synthesize() for the ASGI path: the LLM call awaits instead of blocking a worker."""
+    from scripts.llm_client import generate_answer_async, is_configured
+    prompt = build_prompt(question, chunks)
+    if is_configured():
+        t0 = time.time()
+        try:
+            out = await generate_answer_async(prompt)
+            llm_ms = int((time.time() - t0) * 1000)
+            answer = _postprocess(out["text"], chunks)
+            return answer, {"model": out["model"], "tokens": out["tokens"], "llm_ms": llm_ms}
+        except Exception:
+            pass
+    return _extractive_answer(chunks)
+
+# --- Answer cache ---
+def _index_generation() -> str:
+    # Changes whenever the keyword/vector index files are rebuilt
+    base = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "index")
+    sig = []
+    for name in ("policies.jsonl", "policies.npy"):
+        try:
+            st = os.stat(os.path.join(base, name))
+            sig.append(f"{st.st_mtime_ns}:{st.st_size}")
+        except OSError:
+            sig.append("-")
+    return os.getenv("RETRIEVAL_MODE", "keyword").lower() + "|" + "|".join(sig)
+
+def _cache_args(question: str, chunks: list):
+    from scripts.llm_client import RAG_MODEL
+    return ("ask", question, [[c["doc_id"], c["chunk_id"]] for c in chunks], RAG_MODEL, "default", _index_generation())
+
+def synthesize_cached(question: str, chunks: list):
+    """synthesize() behind the shared answer cache; only real LLM answers are cached."""
+    from scripts.llm_client import is_configured
+    from services.answer_cache import get_answer_cache
+    if not is_configured():
+        return synthesize(question, chunks)
+    cache = get_answer_cache()
+    cache_args = _cache_args(question, chunks)
+    cached, tier = cache.get(*cache_args)
+    if cached is not None:
+        answer, meta = cached
+        return answer, dict(meta, llm_ms=0, cache=tier)
     answer, meta = synthesize(question, chunks)
+    if meta.get("model") != "disabled":
+        cache.put(*cache_args, (answer, meta))
+    return answer, meta
+
+async def synthesize_cached_async(question: str, chunks: list):
+    from scripts.llm_client import is_configured
+    from services.answer_cache import get_answer_cache
+    if not is_configured():
+        return await synthesize_async(question, chunks)
+    cache = get_answer_cache()
+    cache_args = _cache_args(question, chunks)
+    cached, tier = cache.get(*cache_args)
+    if cached is not None:
+        answer, meta = cached
+        return answer, dict(meta, llm_ms=0, cache=tier)
+    answer, meta = await synthesize_async(question, chunks)
+    if meta.get("model") != "disabled":
+        cache.put(*cache_args, (answer, meta))
+    return answer, meta
+
+# --- Main run ---
+def _run_result(question: str, chunks: list, retrieval_ms: int, answer: str, meta: dict):
     # Build source_labels: {"S1":{doc_id,chunk_id}, ...} in same order as sources
     source_labels = {f"S{i+1}": {"doc_id": c["doc_id"], "chunk_id": c["chunk_id"]} for i, c in enumerate(chunks)}
     out = {
@@ -149,9 +217,30 @@ def run(question: str, topk: int = 4):
         "llm_ms": meta.get("llm_ms", 0),
         "model": meta.get("model", ""),
         "tokens": meta.get("tokens", 0),
+        "cache": meta.get("cache"),
     }
     return out
 
+def run(question: str, topk: int = 4):
+    t0 = time.time()
+    chunks = retrieve(question, topk=topk)
+    retrieval_ms = int((time.time() - t0) * 1000)
+    answer, meta = synthesize_cached(question, chunks)
+    return _run_result(question, chunks, retrieval_ms, answer, meta)
+
+async def run_async(question: str, topk: int = 4, executor=None):
+    """
+    run() for the ASGI app. Retrieval (BM25 / NumPy / FAISS) is CPU-bound and runs
+    on executor (default: the loop's thread pool); the LLM call is awaited.
+    """
+    import asyncio
+    loop = asyncio.get_running_loop()
+    t0 = time.time()
+    chunks = await loop.run_in_executor(executor, retrieve, question, topk)
+    retrieval_ms = int((time.time() - t0) * 1000)
+    answer, meta = await synthesize_cached_async(question, chunks)
+    return _run_result(question, chunks, retrieval_ms, answer, meta)
+
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--q", "--question", dest="question", required=True)
@@ -54,7 +54,8 @@ def main():
                     continue
             else:
                 text = p.read_text(encoding="utf-8", errors="replace")
-            chunks = chunk.split_with_overlap(text, max_chars=600, overlap=100)
+            # Chunks are written as they are produced, never held all at once
+            chunks = chunk.iter_split_with_overlap(text, max_chars=600, overlap=100)
             for i, ch in enumerate(chunks, start=1):
                 rec = {
                     "id": f"{p.stem}::chunk-{i}",
@@ -70,5 +71,9 @@ def main():
 
     print(f"Wrote {written} chunk record(s) to {INDEX_PATH}")
 
+    import search_jsonl  # type: ignore
+    bm25_out = search_jsonl.save_bm25(search_jsonl.build_bm25(search_jsonl.load_index(INDEX_PATH)), INDEX_PATH)
+    print(f"Wrote BM25 inverted index to {bm25_out}")
+
 if __name__ == "__main__":
     main()
@@ -1,7 +1,9 @@
 import os
 import httpx
+from services import http_pool
 
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+GROQ_BASE_URL = os.getenv("LLM_GROQ_BASE_URL", "https://api.groq.com/openai/v1").rstrip("/")
 RAG_MODEL = os.getenv("RAG_MODEL", "llama-3.1-8b-instruct")
 RAG_MAX_TOKENS = int(os.getenv("RAG_MAX_TOKENS", "512"))
 
@@ -11,16 +13,11 @@ class LLMNotConfigured(Exception):
 def is_configured() -> bool:
     return bool(GROQ_API_KEY)
 
-def generate_answer(prompt: str) -> dict:
-    """
-    Returns {"text": str, "model": str, "tokens": int}.
-    Raises LLMNotConfigured if no API key is present.
-    System prompt enforces grounded, citation-first behavior (actual citations will be passed in the user prompt by the caller in later steps).
-    """
+def _request(prompt: str):
     if not GROQ_API_KEY:
         raise LLMNotConfigured("No GROQ_API_KEY in environment.")
 
-    url = "https://api.groq.com/openai/v1/chat/completions"
+    url = f"{GROQ_BASE_URL}/chat/completions"
     headers = {"Authorization": f"Bearer {GROQ_API_KEY}"}
     body = {
         "model": RAG_MODEL,
@@ -38,12 +35,28 @@ def generate_answer(prompt: str) -> dict:
             {"role": "user", "content": prompt}
         ]
     }
+    return url, headers, body
 
-    with httpx.Client(timeout=30) as client:
-        r = client.post(url, headers=headers, json=body)
-        r.raise_for_status()
-        data = r.json()
-
+def _parse(data: dict) -> dict:
     text = data["choices"][0]["message"]["content"]
     usage = data.get("usage", {})
     return {"text": text, "model": RAG_MODEL, "tokens": usage.get("total_tokens", 0)}
+
+def generate_answer(prompt: str) -> dict:
+    """
+    Returns {"text": str, "model": str, "tokens": int}.
+    Raises LLMNotConfigured if no API key is present.
+    System prompt enforces grounded, citation-first behavior (actual citations will be passed in the user prompt by the caller in later steps).
+    """
+    url, headers, body = _request(prompt)
+    # Shared keep-alive client for Groq (see services/http_pool)
+    r = http_pool.post("groq", url, headers=headers, json=body, timeout=30)
+    r.raise_for_status()
+    return _parse(r.json())
+
+async def generate_answer_async(prompt: str) -> dict:
+    """Async twin of generate_answer() for the ASGI serving path."""
+    url, headers, body = _request(prompt)
+    r = await http_pool.apost("groq", url, headers=headers, json=body, timeout=30)
+    r.raise_for_status()
+    return _parse(r.json())
@@ -2,16 +2,35 @@
 """
 Keyword search over JSONL index (no external deps).
 
+Scoring is BM25 over an inverted index (token -> postings of [row, tf]) that is
+persisted next to the JSONL as <name>.bm25.json and rebuilt when the JSONL
+content changes.
+
 Usage:
   python scripts/search_jsonl.py "pto policy" --topk 3
 """
 from pathlib import Path
+from collections import Counter
 import argparse
+import hashlib
 import json
+import math
+import os
 import re
-from typing import List, Dict
+import threading
+from typing import List, Dict, Tuple
 
 INDEX_PATH = Path("data/index/policies.jsonl")
+BM25_VERSION = 1
+BM25_K1 = 1.5
+BM25_B = 0.75
+TOKEN_RE = re.compile(r"\w+")
+
+# In-process cache: abs path -> ((mtime_ns, size), recs, bm25)
+_index_cache: Dict[str, Tuple] = {}
+_index_cache_lock = threading.Lock()
+# abs path -> ((mtime_ns, size), sha256); one tuple assigned per entry
+_digest_cache: Dict[str, Tuple] = {}
 
 def load_index(path: Path) -> List[Dict]:
     recs = []
@@ -23,24 +42,122 @@ def load_index(path: Path) -> List[Dict]:
             recs.append(json.loads(line))
     return recs
 
-def score(text: str, terms: List[str]) -> int:
-    # Simple case-insensitive term frequency with word-boundaries
-    s = 0
-    for t in terms:
-        if not t:
+def tokenize(text: str) -> List[str]:
+    return TOKEN_RE.findall(text.lower())
+
+def build_bm25(recs: List[Dict]) -> Dict:
+    """Build the inverted index: postings[token] = [[row, tf], ...] plus doc lengths."""
+    postings: Dict[str, List[List[int]]] = {}
+    doc_len = []
+    for row, r in enumerate(recs):
+        counts = Counter(tokenize(r.get("text", "")))
+        doc_len.append(sum(counts.values()))
+        for tok, tf in counts.items():
+            postings.setdefault(tok, []).append([row, tf])
+    n_docs = len(recs)
+    return {
+        "version": BM25_VERSION,
+        "n_docs": n_docs,
+        "avgdl": (sum(doc_len) / n_docs) if n_docs else 0.0,
+        "doc_len": doc_len,
+        "postings": postings,
+    }
+
+def bm25_path(index_path: Path) -> Path:
+    return index_path.with_suffix(".bm25.json")
+
+def _source_digest(index_path: Path) -> str:
+    """SHA-256 of the JSONL, re-hashed only when its mtime or size changes."""
+    key = os.path.abspath(index_path)
+    st = os.stat(key)
+    sig = (st.st_mtime_ns, st.st_size)
+    hit = _digest_cache.get(key)
+    if hit is not None and hit[0] == sig:
+        return hit[1]
+    h = hashlib.sha256()
+    with open(key, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    _digest_cache[key] = (sig, h.hexdigest())
+    return h.hexdigest()
+
+def save_bm25(bm25: Dict, index_path: Path) -> Path:
+    out = bm25_path(index_path)
+    payload = dict(bm25, source_sha256=_source_digest(index_path))
+    tmp = out.with_suffix(out.suffix + ".tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False, separators=(",", ":"))
+    tmp.replace(out)
+    return out
+
+def load_bm25(index_path: Path, recs: List[Dict] = None) -> Dict:
+    """Load the persisted BM25 index for index_path, rebuilding it if missing or stale."""
+    path = bm25_path(index_path)
+    if path.exists():
+        try:
+            with path.open("r", encoding="utf-8") as f:
+                bm25 = json.load(f)
+            if bm25.get("version") == BM25_VERSION and bm25.get("source_sha256") == _source_digest(index_path):
+                return bm25
+        except (OSError, ValueError):
+            pass
+    if recs is None:
+        recs = load_index(index_path)
+    bm25 = build_bm25(recs)
+    try:
+        save_bm25(bm25, index_path)
+    except OSError:
+        pass  # read-only deploys still get an in-memory index
+    return bm25
+
+def get_index(path: Path) -> Tuple[List[Dict], Dict]:
+    """
+    Return (recs, bm25) for path from the in-process cache. The JSONL is only
+    re-read and re-parsed when its mtime or size changes.
+    """
+    key = os.path.abspath(path)
+    st = os.stat(key)
+    sig = (st.st_mtime_ns, st.st_size)
+    hit = _index_cache.get(key)
+    if hit is not None and hit[0] == sig:
+        return hit[1], hit[2]
+    with _index_cache_lock:
+        hit = _index_cache.get(key)
+        if hit is not None and hit[0] == sig:
+            return hit[1], hit[2]
+        recs = load_index(Path(key))
+        bm25 = load_bm25(Path(key), recs)
+        _index_cache[key] = (sig, recs, bm25)
+    return recs, bm25
+
+def clear_index_cache():
+    with _index_cache_lock:
+        _index_cache.clear()
+        _digest_cache.clear()
+
+def bm25_scores(bm25: Dict, query: str) -> Dict[int, float]:
+    n_docs = bm25["n_docs"]
+    avgdl = bm25["avgdl"] or 1.0
+    doc_len = bm25["doc_len"]
+    scores: Dict[int, float] = {}
+    for tok in set(tokenize(query)):
+        plist = bm25["postings"].get(tok)
+        if not plist:
             continue
-        s += len(re.findall(rf"\b{re.escape(t)}\b", text, flags=re.I))
-    return s
-
-def search(recs: List[Dict], query: str, topk: int = 3) -> List[Dict]:
-    terms = [t.strip() for t in query.split() if t.strip()]
-    scored = []
-    for r in recs:
-        sc = score(r["text"], terms)
-        if sc > 0:
-            scored.append((sc, r))
-    scored.sort(key=lambda x: x[0], reverse=True)
-    return [r for _, r in scored[:topk]]
+        df = len(plist)
+        idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+        for row, tf in plist:
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * doc_len[row] / avgdl)
+            scores[row] = scores.get(row, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+    return scores
+
+def search(recs: List[Dict], query: str, topk: int = 3, bm25: Dict = None) -> List[Dict]:
+    """Return the topk records (with a BM25 "score" field) matching any query token."""
+    if bm25 is None:
+        bm25 = build_bm25(recs)
+    scores = bm25_scores(bm25, query)
+    top = sorted(scores.items(), key=lambda x: (-x[1], x[0]))[:topk]
+    return [dict(recs[row], score=round(sc, 4)) for row, sc in top]
 
 def main():
     ap = argparse.ArgumentParser()
@@ -53,7 +170,7 @@ def main():
         raise SystemExit(1)
 
     recs = load_index(INDEX_PATH)
-    hits = search(recs, args.query, topk=args.topk)
+    hits = search(recs, args.query, topk=args.topk, bm25=load_bm25(INDEX_PATH, recs))
 
     if not hits:
         print("No results.")
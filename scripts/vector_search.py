@@ -1,12 +1,20 @@
-import argparse, json, sys
+import argparse, json, os, sys, threading
 from pathlib import Path
 import numpy as np
-from sentence_transformers import SentenceTransformer
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from services.encoder_registry import encode_queries
 
 INDEX_JSONL = Path("data/index/policies.jsonl")
 EMB_NPY = Path("data/index/policies.npy")
 META_JSON = Path("data/index/meta.json")
 
+# Resident index, reloaded only when one of the three files changes:
+# (sig, mat, meta, offsets) where offsets[i] is the byte offset in the JSONL of
+# the record for embedding row i (-1 if missing). Replaced as one tuple, so a
+# reader never pairs a new matrix with old meta or offsets.
+_resident = None
+_resident_lock = threading.Lock()
+
 def read_jsonl(path: Path):
     with path.open("r", encoding="utf-8") as f:
         for line in f:
@@ -14,45 +22,106 @@ def read_jsonl(path: Path):
             if line:
                 yield json.loads(line)
 
+def _signature():
+    sig = []
+    for p in (EMB_NPY, META_JSON, INDEX_JSONL):
+        st = p.stat()
+        sig.append((st.st_mtime_ns, st.st_size))
+    return tuple(sig)
+
+def _row_offsets(id_map):
+    # One pass over the JSONL: record id -> byte offset, then align to embedding rows
+    by_id = {}
+    with INDEX_JSONL.open("rb") as f:
+        offset = 0
+        for line in f:
+            if line.strip():
+                rid = json.loads(line).get("id")
+                by_id.setdefault(rid, offset)
+            offset += len(line)
+    return np.array([by_id.get(m.get("id"), -1) for m in id_map], dtype=np.int64)
+
+def index_ready():
+    return EMB_NPY.exists() and META_JSON.exists() and INDEX_JSONL.exists()
+
 def load_index():
-    if not (EMB_NPY.exists() and META_JSON.exists() and INDEX_JSONL.exists()):
+    if not index_ready():
         print("[ERR] Missing index files. Run scripts/index_jsonl.py and scripts/embed_index.py first.", file=sys.stderr)
         sys.exit(1)
-    mat = np.load(EMB_NPY)               # [N, D], L2-normalized rows
-    meta = json.load(open(META_JSON, "r", encoding="utf-8"))
-    recs = list(read_jsonl(INDEX_JSONL)) # original chunks to preview text
-    return mat, meta, recs
+    global _resident
+    sig = _signature()
+    resident = _resident
+    if resident is None or resident[0] != sig:
+        with _resident_lock:
+            resident = _resident
+            if resident is None or resident[0] != sig:
+                mat = np.load(EMB_NPY, mmap_mode="r")   # [N, D], L2-normalized rows
+                with META_JSON.open("r", encoding="utf-8") as f:
+                    meta = json.load(f)
+                offsets = _row_offsets(meta["id_map"])
+                resident = (sig, mat, meta, offsets)
+                _resident = resident
+    return resident[1:]
+
+def hydrate(rows, offsets):
+    """Fetch the JSONL records for embedding rows by byte offset (O(k) reads)."""
+    out = {}
+    with INDEX_JSONL.open("rb") as f:
+        for i in rows:
+            off = int(offsets[i])
+            if off < 0:
+                out[i] = None
+                continue
+            f.seek(off)
+            out[i] = json.loads(f.readline())
+    return out
 
 def l2_normalize(vec: np.ndarray) -> np.ndarray:
     n = np.linalg.norm(vec) + 1e-12
     return (vec / n).astype(np.float32)
 
+def top_rows(scores: np.ndarray, topk: int) -> np.ndarray:
+    topk = min(topk, scores.shape[0])
+    if topk <= 0:
+        return np.zeros(0, dtype=np.int64)
+    idx = np.argpartition(-scores, topk - 1)[:topk]
+    return idx[np.argsort(-scores[idx])]
+
 def search(query:str, topk:int):
-    mat, meta, recs = load_index()
-    model = SentenceTransformer(meta["model_name"], device="cpu")
-    q = model.encode([query], convert_to_numpy=True, normalize_embeddings=False)[0].astype(np.float32)
-    q = l2_normalize(q)
+    return search_batch([query], topk)[0]
+
+def search_batch(queries, topk:int):
+    """
+    Retrieve for many queries at once: one encode() batch, one [Q, D] x [D, N]
+    matrix product, then per-query top-k. Returns one hit list per query.
+    """
+    mat, meta, offsets = load_index()
+    if not queries:
+        return []
+    Q = encode_queries(queries, meta["model_name"], device="cpu")
+    Q = (Q / (np.linalg.norm(Q, axis=1, keepdims=True) + 1e-12)).astype(np.float32)
     # cosine because both sides L2-normalized
-    scores = mat @ q
-    # argpartition is faster than full sort for large N; N is small so either is fine
-    idx = np.argsort(-scores)[:topk]
+    scores = Q @ np.asarray(mat).T
+    top = [top_rows(row, topk) for row in scores]
+    recs = hydrate(sorted({int(i) for idx in top for i in idx}), offsets)
     id_map = meta["id_map"]
-    hits = []
-    for i in idx:
-        m = id_map[i]
-        # find the original record by id (small corpora -> linear scan OK)
-        # r["id"] is like "doc::chunk-#"
-        r = next((r for r in recs if r.get("id")==m["id"]), None)
-        preview = (r.get("text","")[:160].replace("\n"," ") + "…") if r else ""
-        hits.append({
-            "rank": len(hits)+1,
-            "score": float(scores[i]),
-            "doc_id": m.get("doc_id"),
-            "chunk_id": m.get("chunk_id"),
-            "id": m.get("id"),
-            "preview": preview
-        })
-    return hits
+    out = []
+    for qi, idx in enumerate(top):
+        hits = []
+        for i in idx:
+            m = id_map[i]
+            r = recs[int(i)]
+            preview = (r.get("text","")[:160].replace("\n"," ") + "…") if r else ""
+            hits.append({
+                "rank": len(hits)+1,
+                "score": float(scores[qi, i]),
+                "doc_id": m.get("doc_id"),
+                "chunk_id": m.get("chunk_id"),
+                "id": m.get("id"),
+                "preview": preview
+            })
+        out.append(hits)
+    return out
 
 def main():
     ap = argparse.ArgumentParser()
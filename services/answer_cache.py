@@ -0,0 +1,150 @@
+"""
+LRU/TTL cache of LLM answers for /steps/7/ask and /ask.
+
+Exact tier: keyed by (normalized question, retrieved chunk ids, provider,
+answer_len, artifact generation). Optional semantic tier: when a query
+embedding is supplied, a cached answer for a question with cosine similarity
+>= ANSWER_CACHE_SIM (same namespace/provider/answer_len/generation, and the
+same top-k chunk ids in any order) is reused, so a similar question whose
+retrieval found other evidence never gets an answer cited from stale chunks.
+Entries of a namespace are dropped as soon as a new artifact generation is
+seen, so rebuilding the embedding DB invalidates them.
+
+Environment:
+  ANSWER_CACHE_SIZE  max entries (default 512, 0 disables the cache)
+  ANSWER_CACHE_TTL   seconds an entry stays valid (default 3600)
+  ANSWER_CACHE_SIM   cosine threshold for the semantic tier (unset = off)
+"""
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+def normalize_question(question: str) -> str:
+    q = re.sub(r"[^\w\s]", " ", (question or "").lower())
+    return " ".join(q.split())
+
+
+class AnswerCache:
+    def __init__(self, max_entries=512, ttl_sec=3600, sim_threshold=None):
+        self.max_entries = max_entries
+        self.ttl_sec = ttl_sec
+        self.sim_threshold = sim_threshold
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._lock = threading.Lock()
+        self._stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    @staticmethod
+    def make_key(namespace, question, chunk_ids, provider, answer_len, generation):
+        ids = tuple(f"{d}#{c}" for d, c in chunk_ids)
+        return (namespace, normalize_question(question), ids, provider, answer_len, generation)
+
+    def _check_generation(self, namespace, generation):
+        # Caller holds the lock. A new generation for a namespace purges its old entries.
+        if self._generations.get(namespace) == generation:
+            return
+        if namespace in self._generations:
+            stale = [k for k in self._entries if k[0] == namespace]
+            for k in stale:
+                del self._entries[k]
+            self._stats["invalidations"] += len(stale)
+        self._generations[namespace] = generation
+
+    def _expired(self, entry, now):
+        return self.ttl_sec and now - entry["ts"] > self.ttl_sec
+
+    def get(self, namespace, question, chunk_ids, provider, answer_len, generation, q_vec=None):
+        """Return (value, tier) where tier is 'exact' or 'semantic', or (None, None) on a miss."""
+        if not self.enabled:
+            return None, None
+        key = self.make_key(namespace, question, chunk_ids, provider, answer_len, generation)
+        now = time.time()
+        with self._lock:
+            self._check_generation(namespace, generation)
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry, now):
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._stats["exact_hits"] += 1
+                return entry["value"], "exact"
+            if self.sim_threshold is not None and q_vec is not None:
+                hit = self._semantic_lookup(key, q_vec, now)
+                if hit is not None:
+                    self._entries.move_to_end(hit)
+                    self._stats["semantic_hits"] += 1
+                    return self._entries[hit]["value"], "semantic"
+            self._stats["misses"] += 1
+        return None, None
+
+    def _semantic_lookup(self, key, q_vec, now):
+        namespace, _, ids, provider, answer_len, generation = key
+        ids = set(ids)
+        cands = [
+            (k, e["q_vec"]) for k, e in self._entries.items()
+            if e["q_vec"] is not None and k[0] == namespace and k[3] == provider
+            and k[4] == answer_len and k[5] == generation and set(k[2]) == ids and not self._expired(e, now)
+        ]
+        if not cands:
+            return None
+        q = np.asarray(q_vec, dtype=np.float32)
+        q = q / (np.linalg.norm(q) + 1e-9)
+        sims = np.stack([v for _, v in cands]) @ q
+        best = int(np.argmax(sims))
+        if sims[best] >= self.sim_threshold:
+            return cands[best][0]
+        return None
+
+    def put(self, namespace, question, chunk_ids, provider, answer_len, generation, value, q_vec=None):
+        if not self.enabled:
+            return
+        key = self.make_key(namespace, question, chunk_ids, provider, answer_len, generation)
+        if q_vec is not None:
+            q_vec = np.asarray(q_vec, dtype=np.float32)
+            q_vec = q_vec / (np.linalg.norm(q_vec) + 1e-9)
+        with self._lock:
+            self._check_generation(namespace, generation)
+            self._entries[key] = {"value": value, "ts": time.time(), "q_vec": q_vec}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._generations.clear()
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, entries=len(self._entries), max_entries=self.max_entries,
+                        ttl_sec=self.ttl_sec, sim_threshold=self.sim_threshold)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_answer_cache() -> AnswerCache:
+    """Process-wide cache configured from the environment on first use."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                sim = os.environ.get("ANSWER_CACHE_SIM", "").strip()
+                _cache = AnswerCache(
+                    max_entries=int(os.environ.get("ANSWER_CACHE_SIZE", 512)),
+                    ttl_sec=float(os.environ.get("ANSWER_CACHE_TTL", 3600)),
+                    sim_threshold=float(sim) if sim else None,
+                )
+    return _cache
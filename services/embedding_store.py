@@ -0,0 +1,209 @@
+"""
+Resident, memory-mapped view of a Step 5 embedding DB folder ({method}__{model}).
+
+vectors.npy is opened with mmap_mode='r' so gunicorn workers share the page
+cache, metadata is read once (meta.bin is itself memory-mapped, see
+services/meta_store), and both are only reloaded when the folder's
+generation (file mtimes/sizes plus config hash) changes. Each generation is
+one StoreSnapshot (vectors, meta, config and search index together), swapped
+in with a single assignment, so a reader never pairs new vectors with old
+meta. The search index (the persisted faiss.index, or an L2-normalized
+matrix) is built at most once per generation. Folders in the segment layout (services/segment_store) are
+read as one snapshot of their manifest.
+"""
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+
+from services.meta_store import read_meta
+from services.segment_store import MANIFEST, is_segmented, load_snapshot
+
+ARTIFACT_FILES = ('vectors.npy', 'meta.bin', 'meta.json', 'config.json', 'faiss.index', MANIFEST)
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def vectors_sha256(vectors):
+    """
+    Digest of a float32 vector matrix. save_artifacts() stores it in config.json
+    as faiss_vectors_sha256 next to faiss.index, so the index is only reused for
+    the exact vectors it was built from.
+    """
+    return hashlib.sha256(np.ascontiguousarray(vectors, dtype=np.float32).data).hexdigest()
+
+
+def _stat_signature(folder):
+    sig = []
+    for name in ARTIFACT_FILES:
+        try:
+            st = os.stat(os.path.join(folder, name))
+            sig.append((name, st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            sig.append((name, None, None))
+    return tuple(sig)
+
+
+class StoreSnapshot:
+    """
+    One generation of a DB folder: vectors, meta, config and the search index
+    built from them. Never modified after load; a refresh builds a new one.
+    """
+
+    def __init__(self, folder, signature, generation, vectors, meta, config, segmented):
+        self.folder = folder
+        self.signature = signature
+        self.generation = generation
+        self.vectors = vectors
+        self.meta = meta
+        self.config = config
+        self.segmented = segmented
+        self._normalized = None
+        self._index = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, folder, retries=3):
+        for _ in range(retries):
+            snapshot = cls._read(folder)
+            # A writer replaced files while we read them: vectors and meta may not match
+            if snapshot.signature == _stat_signature(folder):
+                break
+        return snapshot
+
+    @classmethod
+    def _read(cls, folder):
+        signature = _stat_signature(folder)
+        segmented = is_segmented(folder)
+        if segmented:
+            vectors, meta, manifest = load_snapshot(folder)
+        else:
+            vectors = np.load(os.path.join(folder, 'vectors.npy'), mmap_mode='r')
+            meta = read_meta(folder)
+        config_bytes = b''
+        config_path = os.path.join(folder, 'config.json')
+        if os.path.exists(config_path):
+            with open(config_path, 'rb') as f:
+                config_bytes = f.read()
+        config = json.loads(config_bytes) if config_bytes else {}
+        h = hashlib.sha256(repr(signature).encode('utf-8'))
+        h.update(config_bytes)
+        if segmented:
+            h.update(str(manifest['generation']).encode('ascii'))
+        return cls(folder, signature, h.hexdigest()[:16], vectors, meta, config, segmented)
+
+    @property
+    def normalized(self):
+        """L2-normalized float32 copy of the vectors, computed once per generation."""
+        if self._normalized is None:
+            vecs = np.asarray(self.vectors, dtype=np.float32)
+            self._normalized = np.ascontiguousarray(
+                vecs / (np.linalg.norm(vecs, axis=1, keepdims=True) + 1e-9), dtype=np.float32)
+        return self._normalized
+
+    def get_index(self):
+        """
+        Return a FAISS inner-product index over the normalized vectors, or None
+        when faiss is not installed. The persisted faiss.index is reused when
+        config.json records the digest of these exact vectors (shape alone
+        cannot tell a stale index from a current one); otherwise one is built
+        in memory once.
+        """
+        if self._index is not None:
+            return self._index
+        try:
+            import faiss
+        except ImportError:
+            return None
+        with self._lock:
+            if self._index is None:
+                n, dim = self.vectors.shape if self.vectors.ndim == 2 else (0, 0)
+                index = None
+                index_path = os.path.join(self.folder, 'faiss.index')
+                expected = self.config.get('faiss_vectors_sha256')
+                if (not self.segmented and expected and os.path.exists(index_path)
+                        and vectors_sha256(self.vectors) == expected):
+                    try:
+                        index = faiss.read_index(index_path)
+                        if index.ntotal != n or index.d != dim:
+                            index = None
+                    except Exception:
+                        index = None
+                if index is None:
+                    index = faiss.IndexFlatIP(dim)
+                    if n:
+                        index.add(self.normalized)
+                self._index = index
+        return self._index
+
+    def search(self, queries, topk):
+        """
+        Cosine search for one or more query vectors.
+        Returns (scores, indices), each shaped [n_queries, k] with k <= topk.
+        """
+        q = np.asarray(queries, dtype=np.float32)
+        if q.ndim == 1:
+            q = q[None, :]
+        q = np.ascontiguousarray(q / (np.linalg.norm(q, axis=1, keepdims=True) + 1e-9), dtype=np.float32)
+        n = self.vectors.shape[0]
+        topk = min(int(topk), n)
+        if topk <= 0:
+            return np.zeros((q.shape[0], 0), dtype=np.float32), np.zeros((q.shape[0], 0), dtype=np.int64)
+        index = self.get_index()
+        if index is not None:
+            return index.search(q, topk)
+        scores = q @ self.normalized.T
+        part = np.argpartition(-scores, topk - 1, axis=1)[:, :topk]
+        part_scores = np.take_along_axis(scores, part, axis=1)
+        order = np.argsort(-part_scores, axis=1)
+        return np.take_along_axis(part_scores, order, axis=1), np.take_along_axis(part, order, axis=1)
+
+
+class EmbeddingStore:
+    """Holder of a folder's current StoreSnapshot, swapped in with a single assignment."""
+
+    def __init__(self, folder):
+        self.folder = os.path.abspath(folder)
+        self.snapshot = None
+        self._lock = threading.Lock()
+
+    def is_stale(self):
+        snapshot = self.snapshot
+        return snapshot is None or snapshot.signature != _stat_signature(self.folder)
+
+    def load(self):
+        snapshot = StoreSnapshot.load(self.folder)
+        self.snapshot = snapshot
+        return snapshot
+
+    def refresh(self):
+        """Current snapshot, reloaded first if the folder generation changed."""
+        snapshot = self.snapshot
+        if snapshot is not None and snapshot.signature == _stat_signature(self.folder):
+            return snapshot
+        with self._lock:
+            if self.is_stale():
+                self.load()
+            return self.snapshot
+
+
+def get_store(folder):
+    """
+    Return the current StoreSnapshot for folder, reloading it only when its
+    generation changed. Hold on to the returned object for a whole request:
+    its vectors, meta and index always belong together.
+    """
+    key = os.path.abspath(folder)
+    store = _stores.get(key)
+    if store is None:
+        with _stores_lock:
+            store = _stores.setdefault(key, EmbeddingStore(key))
+    return store.refresh()
+
+
+def evict_store(folder):
+    with _stores_lock:
+        _stores.pop(os.path.abspath(folder), None)
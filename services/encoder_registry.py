@@ -0,0 +1,102 @@
+"""
+Process-wide registry of query encoders.
+
+Loading a SentenceTransformer costs seconds, so every query-embedding call site
+goes through get_encoder() and each model is loaded at most once per worker.
+"""
+import os
+import threading
+import time
+
+import numpy as np
+
+DEFAULT_MODEL = "all-MiniLM-L6-v2"
+
+_encoders = {}
+_locks = {}
+_registry_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "load_ms": {}}
+
+
+def _canonical_name(model_name: str) -> str:
+    # "sentence-transformers/all-MiniLM-L6-v2" and "all-MiniLM-L6-v2" are the same model
+    prefix = "sentence-transformers/"
+    if model_name.startswith(prefix):
+        return model_name[len(prefix):]
+    return model_name
+
+
+def get_encoder(model_name: str = DEFAULT_MODEL, device: str = None):
+    """Return the shared SentenceTransformer for model_name, loading it on first use."""
+    key = (_canonical_name(model_name), device)
+    model = _encoders.get(key)
+    if model is not None:
+        with _registry_lock:
+            _stats["hits"] += 1
+        return model
+    with _registry_lock:
+        lock = _locks.setdefault(key, threading.Lock())
+    # Per-model lock: concurrent first requests wait for a single load
+    with lock:
+        model = _encoders.get(key)
+        if model is not None:
+            with _registry_lock:
+                _stats["hits"] += 1
+            return model
+        from sentence_transformers import SentenceTransformer
+        t0 = time.time()
+        if device:
+            model = SentenceTransformer(key[0], device=device)
+        else:
+            model = SentenceTransformer(key[0])
+        load_ms = int((time.time() - t0) * 1000)
+        _encoders[key] = model
+        with _registry_lock:
+            _stats["misses"] += 1
+            _stats["load_ms"][key[0] if not device else f"{key[0]}@{device}"] = load_ms
+    return model
+
+
+def encode_queries(queries, model_name: str = DEFAULT_MODEL, device: str = None) -> np.ndarray:
+    """Encode a list of queries in one batch; returns a float32 [N, D] matrix."""
+    model = get_encoder(model_name, device=device)
+    vecs = model.encode(list(queries), convert_to_numpy=True)
+    return np.asarray(vecs, dtype=np.float32)
+
+
+def encode_query(query: str, model_name: str = DEFAULT_MODEL, device: str = None) -> np.ndarray:
+    return encode_queries([query], model_name, device=device)[0]
+
+
+def warm_encoders(model_names=None, logger=None):
+    """Pre-load encoders at app start. Failures are logged, never raised."""
+    if model_names is None:
+        raw = os.environ.get("PREWARM_ENCODERS", "")
+        model_names = [m.strip() for m in raw.split(",") if m.strip()]
+    for name in model_names:
+        try:
+            get_encoder(name)
+            if logger:
+                logger.info("encoder registry: pre-warmed %s", name)
+        except Exception as e:
+            if logger:
+                logger.warning("encoder registry: pre-warm of %s failed: %s", name, e)
+
+
+def encoder_stats() -> dict:
+    with _registry_lock:
+        return {
+            "loaded": sorted(k[0] if not k[1] else f"{k[0]}@{k[1]}" for k in _encoders),
+            "hits": _stats["hits"],
+            "misses": _stats["misses"],
+            "load_ms": dict(_stats["load_ms"]),
+        }
+
+
+def clear_encoders():
+    with _registry_lock:
+        _encoders.clear()
+        _locks.clear()
+        _stats["hits"] = 0
+        _stats["misses"] = 0
+        _stats["load_ms"] = {}
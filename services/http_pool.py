@@ -0,0 +1,196 @@
+"""
+Pooled, keep-alive HTTP clients for LLM providers.
+
+One httpx.Client per provider is shared by every request in the worker, so
+TCP+TLS handshakes are paid once per connection instead of once per question.
+HTTP/2 is used when the h2 package is installed.
+
+Environment:
+  LLM_POOL_MAX_CONNECTIONS   max connections per provider (default 20)
+  LLM_POOL_MAX_KEEPALIVE     idle keep-alive connections kept (default 10)
+  LLM_POOL_KEEPALIVE_EXPIRY  seconds an idle connection is kept (default 60)
+  LLM_ASYNC_MAX_CONNECTIONS  max connections per provider for the ASGI path (default 256)
+  LLM_HTTP2                  set to 0 to force HTTP/1.1
+"""
+import asyncio
+import os
+import socket
+import threading
+import weakref
+from contextlib import contextmanager
+
+import httpx
+
+_clients = {}
+_stats = {}
+_lock = threading.Lock()
+
+
+def http2_available() -> bool:
+    if os.environ.get("LLM_HTTP2", "1").strip().lower() in ("0", "false", "no", "off"):
+        return False
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _limits(max_connections=None):
+    if max_connections is None:
+        max_connections = int(os.environ.get("LLM_POOL_MAX_CONNECTIONS", 20))
+    return httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=int(os.environ.get("LLM_POOL_MAX_KEEPALIVE", 10)),
+        keepalive_expiry=float(os.environ.get("LLM_POOL_KEEPALIVE_EXPIRY", 60)),
+    )
+
+
+def get_client(provider: str) -> httpx.Client:
+    """Return the shared client for provider, creating it on first use."""
+    client = _clients.get(provider)
+    if client is not None:
+        return client
+    with _lock:
+        client = _clients.get(provider)
+        if client is None:
+            client = httpx.Client(
+                http2=http2_available(),
+                limits=_limits(),
+                timeout=httpx.Timeout(15.0, connect=5.0),
+            )
+            _clients[provider] = client
+            _provider_stats(provider)
+    return client
+
+
+def _provider_stats(provider):
+    """Counters for provider, created if missing (close_clients() may have cleared them); call under _lock."""
+    return _stats.setdefault(provider, {"requests": 0, "connections_opened": 0, "http_versions": {}})
+
+
+def _tracer(provider):
+    def trace(event_name, info):
+        if event_name == "connection.connect_tcp.complete":
+            with _lock:
+                _provider_stats(provider)["connections_opened"] += 1
+    return trace
+
+
+def _count_response(provider, response):
+    version = response.extensions.get("http_version", b"").decode("ascii", "replace") or "unknown"
+    with _lock:
+        s = _provider_stats(provider)
+        s["requests"] += 1
+        s["http_versions"][version] = s["http_versions"].get(version, 0) + 1
+
+
+def post(provider: str, url: str, **kwargs) -> httpx.Response:
+    """POST through the provider's pooled client, recording connection reuse."""
+    client = get_client(provider)
+    extensions = dict(kwargs.pop("extensions", None) or {})
+    extensions["trace"] = _tracer(provider)
+    response = client.post(url, extensions=extensions, **kwargs)
+    _count_response(provider, response)
+    return response
+
+
+@contextmanager
+def stream(provider: str, url: str, **kwargs):
+    """Streaming POST through the provider's pooled client (response body read lazily)."""
+    client = get_client(provider)
+    extensions = dict(kwargs.pop("extensions", None) or {})
+    extensions["trace"] = _tracer(provider)
+    with client.stream("POST", url, extensions=extensions, **kwargs) as response:
+        _count_response(provider, response)
+        yield response
+
+
+def abort_response(response):
+    """
+    Interrupt a read on a streamed response from another thread. An HTTP/1.1
+    connection belongs to this response alone, so its socket is shut down and
+    the blocked read fails at once (the pool then discards the connection).
+    HTTP/2 multiplexes other requests on the same socket, so only this
+    response's stream is closed.
+    """
+    if response.extensions.get("http_version") in (b"HTTP/1.1", b"HTTP/1.0"):
+        network_stream = response.extensions.get("network_stream")
+        sock = network_stream.get_extra_info("socket") if network_stream is not None else None
+        if sock is not None:
+            try:
+                # Plain socket shutdown, also for TLS sockets: the reading thread owns the SSL object
+                socket.socket.shutdown(sock, socket.SHUT_RDWR)
+            except OSError:
+                pass
+            return
+    try:
+        response.close()
+    except Exception:
+        pass
+
+
+# Async clients are bound to an event loop, so each loop gets its own set. They
+# are held in a WeakKeyDictionary on the loop: a finished loop (and a reused id()
+# of it) never maps to a stale client. One loop multiplexes every in-flight
+# request, hence the larger connection cap.
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_client(provider: str) -> httpx.AsyncClient:
+    loop = asyncio.get_running_loop()
+    with _lock:
+        clients = _async_clients.setdefault(loop, {})
+        client = clients.get(provider)
+        if client is None:
+            client = httpx.AsyncClient(
+                http2=http2_available(),
+                limits=_limits(int(os.environ.get("LLM_ASYNC_MAX_CONNECTIONS", 256))),
+                timeout=httpx.Timeout(15.0, connect=5.0),
+            )
+            clients[provider] = client
+            _provider_stats(provider)
+    return client
+
+
+def _async_tracer(provider):
+    async def trace(event_name, info):
+        if event_name == "connection.connect_tcp.complete":
+            with _lock:
+                _provider_stats(provider)["connections_opened"] += 1
+    return trace
+
+
+async def apost(provider: str, url: str, **kwargs) -> httpx.Response:
+    """Async POST through the provider's pooled AsyncClient for the running loop."""
+    client = get_async_client(provider)
+    extensions = dict(kwargs.pop("extensions", None) or {})
+    extensions["trace"] = _async_tracer(provider)
+    response = await client.post(url, extensions=extensions, **kwargs)
+    _count_response(provider, response)
+    return response
+
+
+async def aclose_clients():
+    """Close the running loop's async clients (call before the loop shuts down)."""
+    with _lock:
+        clients = _async_clients.pop(asyncio.get_running_loop(), {})
+    for client in clients.values():
+        await client.aclose()
+
+
+def pool_stats() -> dict:
+    with _lock:
+        out = {}
+        for provider, s in _stats.items():
+            out[provider] = dict(s, http_versions=dict(s["http_versions"]),
+                                 reused=max(0, s["requests"] - s["connections_opened"]))
+        return out
+
+
+def close_clients():
+    with _lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
+        _stats.clear()
@@ -3,13 +3,24 @@ import os
 import re
 import json
 import csv
+import hashlib
+import threading
 import unicodedata
+from concurrent.futures import as_completed
+from contextlib import contextmanager
 from datetime import datetime
 from pdfminer.high_level import extract_text
 from bs4 import BeautifulSoup
 from html import unescape
 from typing import List
 
+from services.proc_pool import default_workers, process_pool
+
+try:
+    import fcntl
+except ImportError:  # Windows: in-process lock only
+    fcntl = None
+
 POLICIES_DIR = os.path.join("steps", "step1", "data-Policies")
 PARSED_RAW_DIR = os.path.join("steps", "step2", "Parse-Results")
 PARSED_DIR = os.path.join("steps", "step3", "Clean-Results")
@@ -24,43 +35,41 @@ def slugify(filename: str) -> str:
     return slug
 
 # 2. Parse file to raw text
-def parse_file(src_path: str) -> dict:
-    t0 = datetime.utcnow()
-    ext = os.path.splitext(src_path)[1].lower()
+def _extract_text(src_path: str, ext: str, page_numbers=None) -> str:
+    if ext == ".pdf":
+        return extract_text(src_path, page_numbers=page_numbers)
+    if ext in {".html", ".htm"}:
+        with open(src_path, "r", encoding="utf-8", errors="ignore") as f:
+            soup = BeautifulSoup(f.read(), "lxml")
+            for tag in soup(["script", "style"]): tag.decompose()
+            text = soup.get_text(separator="\n")
+            return unescape(text)
+    with open(src_path, "r", encoding="utf-8", errors="ignore") as f:
+        return f.read()
+
+def _finish_parse(src_path: str, ext: str, text: str, status: str, error, t0, out_dir=None, write=True, work_ms=0):
+    """
+    Write the parsed text and build (result, log_entry) for one document.
+    ms_elapsed is the time since t0 plus work_ms already spent on the document
+    elsewhere (page-range workers).
+    """
     doc_id = slugify(src_path)
-    out_path = os.path.join(PARSED_RAW_DIR, f"{doc_id}.txt")
-    os.makedirs(PARSED_RAW_DIR, exist_ok=True)
-    status = "ok"
-    error = None
-    text = ""
+    out_dir = out_dir or PARSED_RAW_DIR
+    out_path = os.path.join(out_dir, f"{doc_id}.txt")
+    os.makedirs(out_dir, exist_ok=True)
     bytes_in = 0
     try:
-        if ext == ".pdf":
-            text = extract_text(src_path)
-            if not text.strip():
-                status = "no_text"
-        elif ext in {".html", ".htm"}:
-            with open(src_path, "r", encoding="utf-8", errors="ignore") as f:
-                soup = BeautifulSoup(f.read(), "lxml")
-                for tag in soup(["script", "style"]): tag.decompose()
-                text = soup.get_text(separator="\n")
-                text = unescape(text)
-        elif ext in {".md", ".txt"}:
-            with open(src_path, "r", encoding="utf-8", errors="ignore") as f:
-                text = f.read()
-        else:
-            status = "error"
-            error = f"Unsupported file type: {ext}"
-        bytes_in = os.path.getsize(src_path)
-        # Normalize newlines
-        text = text.replace("\r\n", "\n").replace("\r", "\n")
-        # Write output
-        with open(out_path, "w", encoding="utf-8") as f:
-            f.write(text)
+        if write:
+            bytes_in = os.path.getsize(src_path)
+            # Normalize newlines
+            text = text.replace("\r\n", "\n").replace("\r", "\n")
+            # Write output
+            with open(out_path, "w", encoding="utf-8") as f:
+                f.write(text)
     except Exception as e:
         status = "error"
         error = str(e)
-    ms_elapsed = int((datetime.utcnow() - t0).total_seconds() * 1000)
+    ms_elapsed = _ms_since(t0) + work_ms
     chars_out = len(text)
     log_entry = {
         "ts": datetime.utcnow().isoformat(),
@@ -72,11 +81,7 @@ def parse_file(src_path: str) -> dict:
         "status": status,
         "error": error
     }
-    os.makedirs(os.path.dirname(PARSE_LOG), exist_ok=True)
-    with open(PARSE_LOG, "a", encoding="utf-8") as logf:
-        logf.write(json.dumps(log_entry) + "\n")
-    update_parsed_stats(doc_id, ext, bytes_in, chars_out, None, status, datetime.utcnow().isoformat(), error)
-    return {
+    result = {
         "status": status,
         "doc_id": doc_id,
         "ext": ext,
@@ -85,38 +90,118 @@ def parse_file(src_path: str) -> dict:
         "parsed_raw_path": out_path,
         "error": error
     }
+    return result, log_entry
+
+def _ms_since(t0) -> int:
+    return int((datetime.utcnow() - t0).total_seconds() * 1000)
+
+def _parse_doc(src_path: str, out_dir=None, t0=None):
+    """Parse one document and write its output; no log or stats side effects."""
+    t0 = t0 or datetime.utcnow()
+    ext = os.path.splitext(src_path)[1].lower()
+    status = "ok"
+    error = None
+    text = ""
+    try:
+        if ext in {".pdf", ".html", ".htm", ".md", ".txt"}:
+            text = _extract_text(src_path, ext)
+            if ext == ".pdf" and not text.strip():
+                status = "no_text"
+        else:
+            status = "error"
+            error = f"Unsupported file type: {ext}"
+    except Exception as e:
+        # Extraction failed: nothing is written, as before
+        return _finish_parse(src_path, ext, "", "error", str(e), t0, out_dir, write=False)
+    return _finish_parse(src_path, ext, text, status, error, t0, out_dir)
+
+def _record_parse(log_entries, results):
+    os.makedirs(os.path.dirname(PARSE_LOG), exist_ok=True)
+    with open(PARSE_LOG, "a", encoding="utf-8") as logf:
+        logf.write("".join(json.dumps(e) + "\n" for e in log_entries))
+    now = datetime.utcnow().isoformat()
+    upsert_parsed_stats([stats_update(res["doc_id"], res["ext"], res["bytes_in"], res["chars_out"], None, res["status"], now, res["error"])
+                         for res in results])
+
+def parse_file(src_path: str, force: bool = False) -> dict:
+    return parse_batch([src_path], workers=1, force=force)["results"][0]
 
 # 3. Clean parsed text
-def clean_text(parsed_raw_path: str) -> dict:
+CLEAN_BLOCK_CHARS = 1 << 20
+
+def _newline_blocks(f, block_chars=CLEAN_BLOCK_CHARS):
+    """
+    Read a text file in blocks of whole lines (~block_chars each). A block only
+    ends after a complete run of newlines, so the next one starts with content
+    and no newline run or line is ever split across blocks.
+    """
+    carry = []
+    while True:
+        lines = carry + f.readlines(block_chars)
+        carry = []
+        if not lines:
+            return
+        if lines[-1].endswith("\n"):
+            # Pull in the rest of a trailing run of empty lines
+            for line in f:
+                if line != "\n":
+                    carry = [line]
+                    break
+                lines.append(line)
+        yield "".join(lines)
+
+def _clean_block(block: str) -> str:
+    # Collapse 3+ newlines to max 2
+    block = re.sub(r"\n{3,}", "\n\n", block)
+    # Convert tabs to spaces
+    block = block.replace("\t", " ")
+    # Trim trailing spaces per line
+    block = "\n".join([line.rstrip() for line in block.splitlines()])
+    # Normalize Unicode (smart quotes, dashes, etc.)
+    block = unicodedata.normalize("NFKC", block)
+    # Decode HTML entities (if any)
+    return unescape(block)
+
+def clean_blocks(f, block_chars=CLEAN_BLOCK_CHARS):
+    """
+    Clean a text file in bounded-size blocks. "\n".join() of the yielded blocks
+    is byte-identical to cleaning the whole text at once: blocks split at line
+    boundaries outside newline runs, and none of the rules (incl. NFKC and
+    entity decoding) can match across a "\n".
+    """
+    for block in _newline_blocks(f, block_chars):
+        yield _clean_block(block)
+
+def _clean_doc(parsed_raw_path: str, out_dir=None):
+    """Clean one parsed document and write its output; no log or stats side effects."""
     t0 = datetime.utcnow()
     doc_id = slugify(parsed_raw_path)
-    cleaned_path = os.path.join(PARSED_DIR, f"{doc_id}.txt")
-    os.makedirs(PARSED_DIR, exist_ok=True)
+    out_dir = out_dir or PARSED_DIR
+    cleaned_path = os.path.join(out_dir, f"{doc_id}.txt")
+    os.makedirs(out_dir, exist_ok=True)
     status = "ok"
     error = None
     chars_in = 0
     chars_out = 0
+    tmp_path = cleaned_path + ".tmp"
     try:
-        with open(parsed_raw_path, "r", encoding="utf-8") as f:
-            text = f.read()
-        chars_in = len(text)
-        # Collapse 3+ newlines to max 2
-        text = re.sub(r"\n{3,}", "\n\n", text)
-        # Convert tabs to spaces
-        text = text.replace("\t", " ")
-        # Trim trailing spaces per line
-        text = "\n".join([line.rstrip() for line in text.splitlines()])
-        # Normalize Unicode (smart quotes, dashes, etc.)
-        text = unicodedata.normalize("NFKC", text)
-        # Decode HTML entities (if any)
-        text = unescape(text)
-        # Write output
-        with open(cleaned_path, "w", encoding="utf-8") as f:
-            f.write(text)
-        chars_out = len(text)
+        with open(parsed_raw_path, "r", encoding="utf-8") as src, open(tmp_path, "w", encoding="utf-8") as dst:
+            # One ~1 MB block in memory at a time instead of the whole file
+            for i, raw in enumerate(_newline_blocks(src)):
+                chars_in += len(raw)
+                block = _clean_block(raw)
+                if i:
+                    dst.write("\n")
+                    chars_out += 1
+                dst.write(block)
+                chars_out += len(block)
+        os.replace(tmp_path, cleaned_path)
     except Exception as e:
         status = "error"
         error = str(e)
+        chars_out = 0
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
     ms_elapsed = int((datetime.utcnow() - t0).total_seconds() * 1000)
     log_entry = {
         "ts": datetime.utcnow().isoformat(),
@@ -127,11 +212,7 @@ def clean_text(parsed_raw_path: str) -> dict:
         "status": status,
         "error": error
     }
-    os.makedirs(os.path.dirname(CLEAN_LOG), exist_ok=True)
-    with open(CLEAN_LOG, "a", encoding="utf-8") as logf:
-        logf.write(json.dumps(log_entry) + "\n")
-    update_parsed_stats(doc_id, None, None, chars_out, None, status, datetime.utcnow().isoformat(), error, chars_in=chars_in)
-    return {
+    result = {
         "status": status,
         "doc_id": doc_id,
         "chars_in": chars_in,
@@ -139,42 +220,75 @@ def clean_text(parsed_raw_path: str) -> dict:
         "cleaned_path": cleaned_path,
         "error": error
     }
+    return result, log_entry
+
+def _record_clean(log_entries, results):
+    os.makedirs(os.path.dirname(CLEAN_LOG), exist_ok=True)
+    with open(CLEAN_LOG, "a", encoding="utf-8") as logf:
+        logf.write("".join(json.dumps(e) + "\n" for e in log_entries))
+    now = datetime.utcnow().isoformat()
+    upsert_parsed_stats([stats_update(res["doc_id"], None, None, res["chars_out"], None, res["status"], now, res["error"], chars_in=res["chars_in"])
+                         for res in results])
+
+def clean_text(parsed_raw_path: str, force: bool = False) -> dict:
+    return clean_batch([parsed_raw_path], workers=1, force=force)["results"][0]
 
 # 4. Update parsed stats CSV
+STATS_FIELDS = ["doc_id","ext","bytes_in","chars_raw","chars_clean","status","last_parsed_iso","error","chars_in"]
+_file_tlock = threading.Lock()
+
+@contextmanager
+def _file_lock(path):
+    """Serializes read-modify-write of path across threads and gunicorn workers."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with _file_tlock:
+        if fcntl is None:
+            yield
+            return
+        with open(path + ".lock", "a") as fh:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+def stats_update(doc_id, ext, bytes_in, chars_raw, chars_clean, status, last_parsed_iso, error, chars_in=None) -> dict:
+    """One row update for upsert_parsed_stats(); None fields keep the stored value."""
+    return {"doc_id": doc_id, "ext": ext, "bytes_in": bytes_in, "chars_raw": chars_raw,
+            "chars_clean": chars_clean, "status": status, "last_parsed_iso": last_parsed_iso,
+            "error": error, "chars_in": chars_in}
+
+def upsert_parsed_stats(updates: List[dict]):
+    """
+    Apply many stats_update() rows with a single read and a single atomic
+    rewrite of the CSV (temp file + os.replace), under a file lock.
+    """
+    if not updates:
+        return
+    with _file_lock(PARSED_STATS_CSV):
+        stats = get_parsed_stats()
+        by_id = {row["doc_id"]: row for row in stats}
+        for u in updates:
+            row = by_id.get(u["doc_id"])
+            if row is None:
+                row = by_id[u["doc_id"]] = dict(u)
+                stats.append(row)
+                continue
+            for key in ("ext", "bytes_in", "chars_raw", "chars_clean", "chars_in"):
+                if u[key] is not None:
+                    row[key] = u[key]
+            row.update({"status": u["status"], "last_parsed_iso": u["last_parsed_iso"], "error": u["error"]})
+        tmp = PARSED_STATS_CSV + ".tmp"
+        with open(tmp, "w", encoding="utf-8", newline='') as csvf:
+            writer = csv.DictWriter(csvf, fieldnames=STATS_FIELDS)
+            writer.writeheader()
+            writer.writerows(stats)
+            csvf.flush()
+            os.fsync(csvf.fileno())
+        os.replace(tmp, PARSED_STATS_CSV)
+
 def update_parsed_stats(doc_id, ext, bytes_in, chars_raw, chars_clean, status, last_parsed_iso, error, chars_in=None):
-    os.makedirs(os.path.dirname(PARSED_STATS_CSV), exist_ok=True)
-    stats = get_parsed_stats()
-    found = False
-    for row in stats:
-        if row["doc_id"] == doc_id:
-            row.update({
-                "ext": ext if ext is not None else row.get("ext"),
-                "bytes_in": bytes_in if bytes_in is not None else row.get("bytes_in"),
-                "chars_raw": chars_raw if chars_raw is not None else row.get("chars_raw"),
-                "chars_clean": chars_clean if chars_clean is not None else row.get("chars_clean"),
-                "status": status,
-                "last_parsed_iso": last_parsed_iso,
-                "error": error
-            })
-            if chars_in is not None:
-                row["chars_in"] = chars_in
-            found = True
-    if not found:
-        stats.append({
-            "doc_id": doc_id,
-            "ext": ext,
-            "bytes_in": bytes_in,
-            "chars_raw": chars_raw,
-            "chars_clean": chars_clean,
-            "status": status,
-            "last_parsed_iso": last_parsed_iso,
-            "error": error,
-            "chars_in": chars_in
-        })
-    with open(PARSED_STATS_CSV, "w", encoding="utf-8", newline='') as csvf:
-        writer = csv.DictWriter(csvf, fieldnames=["doc_id","ext","bytes_in","chars_raw","chars_clean","status","last_parsed_iso","error","chars_in"])
-        writer.writeheader()
-        writer.writerows(stats)
+    upsert_parsed_stats([stats_update(doc_id, ext, bytes_in, chars_raw, chars_clean, status, last_parsed_iso, error, chars_in)])
 
 # 5. Get parsed stats for table
 def get_parsed_stats() -> List[dict]:
@@ -185,3 +299,200 @@ def get_parsed_stats() -> List[dict]:
             for row in reader:
                 stats.append(row)
     return stats
+
+# 6. Batch ingestion (process pool, page-parallel PDFs)
+def _pdf_page_count(src_path: str) -> int:
+    from pdfminer.pdfpage import PDFPage
+    with open(src_path, "rb") as f:
+        return sum(1 for _ in PDFPage.get_pages(f))
+
+def _pdf_doc_task(src_path: str, pages_per_task: int, out_dir=None):
+    """
+    Runs in a pool worker: count the PDF's pages and parse it whole if it fits
+    one task. Returns (n_pages, ms spent, (result, log_entry) or None when the
+    caller should split it into page ranges).
+    """
+    t0 = datetime.utcnow()
+    try:
+        n_pages = _pdf_page_count(src_path)
+    except Exception:
+        n_pages = 0  # let _parse_doc report the error
+    if n_pages > pages_per_task:
+        return n_pages, _ms_since(t0), None
+    return n_pages, 0, _parse_doc(src_path, out_dir, t0)
+
+def _pdf_pages_task(src_path: str, page_numbers):
+    # Runs in a pool worker; errors are returned, not raised, so one bad range
+    # only fails its own document. Returns (text, error, ms).
+    t0 = datetime.utcnow()
+    try:
+        return extract_text(src_path, page_numbers=page_numbers), None, _ms_since(t0)
+    except Exception as e:
+        return "", str(e), _ms_since(t0)
+
+def _batch_summary(results, n_bytes, t0, workers, time_saved_ms=0):
+    elapsed = max((datetime.utcnow() - t0).total_seconds(), 1e-9)
+    skipped = sum(1 for r in results if r.get("skipped"))
+    return {
+        "results": results,
+        "docs": len(results),
+        "processed": len(results) - skipped,
+        "skipped": skipped,
+        "time_saved_ms": time_saved_ms,
+        "bytes_in": n_bytes,
+        "elapsed_ms": int(elapsed * 1000),
+        "docs_per_s": round(len(results) / elapsed, 2),
+        "mb_per_s": round(n_bytes / elapsed / 1e6, 3),
+        "workers": workers,
+    }
+
+def _run_parse(src_paths, workers, pages_per_task, out_dir):
+    # A lone PDF still goes to the pool: its page ranges are what runs in parallel
+    if workers <= 1 or (len(src_paths) <= 1 and not any(p.lower().endswith(".pdf") for p in src_paths)):
+        return [_parse_doc(p, out_dir) for p in src_paths]
+    pairs = [None] * len(src_paths)
+    with process_pool(workers) as pool:
+        whole, pdfs, split = {}, {}, {}
+        for i, p in enumerate(src_paths):
+            if p.lower().endswith(".pdf"):
+                pdfs[pool.submit(_pdf_doc_task, p, pages_per_task, out_dir)] = i
+            else:
+                whole[i] = pool.submit(_parse_doc, p, out_dir)
+        # Page counts come back from the workers; long PDFs are fanned out as they arrive
+        for fut in as_completed(pdfs):
+            i = pdfs[fut]
+            n_pages, count_ms, pair = fut.result()
+            if pair is not None:
+                pairs[i] = pair
+                continue
+            split[i] = count_ms, [pool.submit(_pdf_pages_task, src_paths[i], list(range(s, min(s + pages_per_task, n_pages))))
+                                  for s in range(0, n_pages, pages_per_task)]
+        for i, fut in whole.items():
+            pairs[i] = fut.result()
+        for i, (count_ms, futs) in split.items():
+            parts = [f.result() for f in futs]
+            errors = [e for _, e, _ in parts if e]
+            # The document's own worker time, not time since the batch started
+            work_ms = count_ms + sum(ms for _, _, ms in parts)
+            p = src_paths[i]
+            if errors:
+                pairs[i] = _finish_parse(p, ".pdf", "", "error", errors[0], datetime.utcnow(), out_dir, write=False,
+                                         work_ms=work_ms)
+            else:
+                text = "".join(t for t, _, _ in parts)
+                pairs[i] = _finish_parse(p, ".pdf", text, "ok" if text.strip() else "no_text", None, datetime.utcnow(),
+                                         out_dir, work_ms=work_ms)
+    return pairs
+
+def parse_batch(src_paths: List[str], workers: int = None, pdf_pages_per_task: int = None, out_dir: str = None,
+                force: bool = False) -> dict:
+    """
+    Parse many documents across a process pool. PDFs longer than
+    pdf_pages_per_task (env INGEST_PDF_PAGES_PER_TASK, default 8) are split into
+    page ranges extracted in parallel and re-joined in page order. Log entries
+    are appended in one write and parsed stats are updated from this process
+    only. Sources whose bytes are unchanged since their last successful parse
+    are skipped (see section 7) unless force is set. Returns per-doc results
+    (input order) plus throughput and skip figures.
+    """
+    t0 = datetime.utcnow()
+    src_paths = list(src_paths)
+    workers = workers or default_workers("INGEST_WORKERS")
+    pages_per_task = pdf_pages_per_task or int(os.environ.get("INGEST_PDF_PAGES_PER_TASK", 8))
+    n_bytes = sum(os.path.getsize(p) for p in src_paths if os.path.exists(p))
+    results, todo, hashes, saved = _split_unchanged("parse", src_paths, out_dir or PARSED_RAW_DIR, force)
+    pairs = _run_parse([src_paths[i] for i in todo], workers, pages_per_task, out_dir)
+    _record_parse([e for _, e in pairs], [r for r, _ in pairs])
+    _remember("parse", out_dir or PARSED_RAW_DIR, [(src_paths[i], hashes[i], pair) for i, pair in zip(todo, pairs)])
+    for i, (res, _) in zip(todo, pairs):
+        results[i] = dict(res, skipped=False)
+    return _batch_summary(results, n_bytes, t0, workers, saved)
+
+def clean_batch(parsed_raw_paths: List[str], workers: int = None, out_dir: str = None, force: bool = False) -> dict:
+    """clean_text() for many files across a process pool; same aggregation and skipping as parse_batch()."""
+    t0 = datetime.utcnow()
+    paths = list(parsed_raw_paths)
+    workers = workers or default_workers("INGEST_WORKERS")
+    n_bytes = sum(os.path.getsize(p) for p in paths if os.path.exists(p))
+    results, todo, hashes, saved = _split_unchanged("clean", paths, out_dir or PARSED_DIR, force)
+    todo_paths = [paths[i] for i in todo]
+    if workers <= 1 or len(todo_paths) <= 1:
+        pairs = [_clean_doc(p, out_dir) for p in todo_paths]
+    else:
+        with process_pool(workers) as pool:
+            pairs = list(pool.map(_clean_doc, todo_paths, [out_dir] * len(todo_paths)))
+    _record_clean([e for _, e in pairs], [r for r, _ in pairs])
+    _remember("clean", out_dir or PARSED_DIR, [(paths[i], hashes[i], pair) for i, pair in zip(todo, pairs)])
+    for i, (res, _) in zip(todo, pairs):
+        results[i] = dict(res, skipped=False)
+    return _batch_summary(results, n_bytes, t0, workers, saved)
+
+# 7. Content-addressed skip of unchanged inputs
+# Each stage keeps <out_dir>.manifest.json next to (not inside, so listings of the
+# output dir stay clean) its output dir: input path -> sha256 of its bytes, the
+# result of the run that produced the output and how long it took. Bump a
+# stage's version when its output for the same input changes.
+STAGE_VERSIONS = {"parse": 1, "clean": 1}
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def stage_manifest_path(out_dir: str) -> str:
+    return os.path.normpath(out_dir) + ".manifest.json"
+
+def load_stage_manifest(stage: str, out_dir: str) -> dict:
+    try:
+        with open(stage_manifest_path(out_dir), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, ValueError):
+        manifest = None
+    if not manifest or manifest.get("stage") != stage or manifest.get("version") != STAGE_VERSIONS[stage]:
+        return {"stage": stage, "version": STAGE_VERSIONS[stage], "docs": {}}
+    return manifest
+
+def _split_unchanged(stage, paths, out_dir, force):
+    """
+    Returns (results, todo, hashes, time_saved_ms): results holds the previous
+    result (skipped=True) for every unchanged input and None elsewhere, todo the
+    indexes still to process.
+    """
+    docs = {} if force else load_stage_manifest(stage, out_dir)["docs"]
+    results, todo, hashes, saved = [None] * len(paths), [], {}, 0
+    for i, p in enumerate(paths):
+        try:
+            hashes[i] = file_sha256(p)
+        except OSError:
+            hashes[i] = None
+        entry = docs.get(os.path.normpath(p))
+        out_path = entry and entry["result"].get("cleaned_path" if stage == "clean" else "parsed_raw_path")
+        if (entry and hashes[i] is not None and entry["sha256"] == hashes[i] and out_path and os.path.exists(out_path)
+                and os.path.getsize(out_path) == entry["out_bytes"]):
+            results[i] = dict(entry["result"], skipped=True)
+            saved += entry["ms_elapsed"]
+        else:
+            todo.append(i)
+    return results, todo, hashes, saved
+
+def _remember(stage, out_dir, done):
+    """Record (path, sha256, (result, log_entry)) of successful runs in the stage manifest."""
+    entries = {}
+    for path, sha, (res, log_entry) in done:
+        out_path = res.get("cleaned_path" if stage == "clean" else "parsed_raw_path")
+        if sha is None or res["status"] == "error" or not os.path.exists(out_path):
+            continue
+        entries[os.path.normpath(path)] = {"sha256": sha, "out_bytes": os.path.getsize(out_path),
+                                           "ms_elapsed": log_entry["ms_elapsed"], "result": res}
+    if not entries:
+        return
+    path = stage_manifest_path(out_dir)
+    with _file_lock(path):
+        manifest = load_stage_manifest(stage, out_dir)
+        manifest["docs"].update(entries)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp, path)
@@ -0,0 +1,262 @@
+"""
+Columnar, memory-mapped chunk metadata (meta.bin) for Step 5 embedding DBs.
+
+File layout (all sections 8-byte aligned):
+
+    b"RAGMETA1" | uint32 header length | header JSON | column sections...
+
+Each meta key becomes one column:
+  int    every row has an int           -> int64[n]
+  blob   mostly-unique str values (text, text_hash)
+                                         -> uint64 offsets[n + 1] + UTF-8 blob, plus
+                                            uint8 nulls[n] (BLOB_NULL / BLOB_ABSENT)
+                                            when some rows hold None or lack the key
+  dict   anything else (doc_id, method, params, ...)
+                                         -> uint32 codes[n] into a JSON value list
+                                            in the header; ABSENT marks a missing key
+A vector_index equal to the row number is not stored, just re-derived.
+
+MetaTable reads rows lazily from the mmap and behaves like the list of dicts
+that json.load(meta.json) used to return (len, indexing, slicing, iteration).
+"""
+import json
+import os
+
+import numpy as np
+
+MAGIC = b"RAGMETA1"
+META_BIN = 'meta.bin'
+META_JSON = 'meta.json'
+ABSENT = 0xFFFFFFFF
+BLOB_NULL = 1     # nulls[i] of a blob column: the value is None
+BLOB_ABSENT = 2   # nulls[i] of a blob column: the row has no such key
+
+
+def _align(n):
+    return (n + 7) & ~7
+
+
+def _is_int(v):
+    return isinstance(v, int) and not isinstance(v, bool)
+
+
+class _Missing:
+    pass
+
+
+def _plan_columns(rows):
+    names = []
+    seen = set()
+    for row in rows:
+        for k in row:
+            if k not in seen:
+                seen.add(k)
+                names.append(k)
+    n = len(rows)
+    plan = []
+    for name in names:
+        values = [row.get(name, _Missing) for row in rows]
+        if name == 'vector_index' and all(v == i for i, v in enumerate(values)):
+            plan.append((name, 'rownum', None))
+        elif all(_is_int(v) for v in values):
+            plan.append((name, 'int', values))
+        elif (all(isinstance(v, str) or v is None or v is _Missing for v in values)
+              and len(set(v for v in values if isinstance(v, str))) > n // 2):
+            plan.append((name, 'blob', values))
+        else:
+            plan.append((name, 'dict', values))
+    return plan
+
+
+def write_meta(path, rows):
+    """Write rows (list of dicts) to path as meta.bin, atomically."""
+    n = len(rows)
+    sections = []
+    columns = []
+    for name, kind, values in _plan_columns(rows):
+        col = {'name': name, 'kind': kind}
+        if kind == 'int':
+            sections.append((col, [np.asarray(values, dtype=np.int64).tobytes()]))
+        elif kind == 'blob':
+            encoded = [v.encode('utf-8') if isinstance(v, str) else b'' for v in values]
+            offsets = np.zeros(n + 1, dtype=np.uint64)
+            offsets[1:] = np.cumsum([len(b) for b in encoded], dtype=np.uint64)
+            parts = [offsets.tobytes(), b''.join(encoded)]
+            if not all(isinstance(v, str) for v in values):
+                nulls = np.array([BLOB_ABSENT if v is _Missing else BLOB_NULL if v is None else 0
+                                  for v in values], dtype=np.uint8)
+                parts.append(nulls.tobytes())
+            sections.append((col, parts))
+        elif kind == 'dict':
+            table, index, codes = [], {}, np.empty(n, dtype=np.uint32)
+            for i, v in enumerate(values):
+                if v is _Missing:
+                    codes[i] = ABSENT
+                    continue
+                key = json.dumps(v, sort_keys=True)
+                code = index.get(key)
+                if code is None:
+                    code = index[key] = len(table)
+                    table.append(v)
+                codes[i] = code
+            col['values'] = table
+            sections.append((col, [codes.tobytes()]))
+        columns.append(col)
+    # Header offsets depend on the header size, so lay out sections relative to 0 first
+    rel = 0
+    for col, parts in sections:
+        col['parts'] = []
+        for part in parts:
+            col['parts'].append([rel, len(part)])
+            rel = _align(rel + len(part))
+    header = {'version': 1, 'n': n, 'columns': columns}
+    header_bytes = json.dumps(header, ensure_ascii=False).encode('utf-8')
+    data_start = _align(len(MAGIC) + 4 + len(header_bytes))
+    header['data_start'] = data_start
+    header_bytes = json.dumps(header, ensure_ascii=False).encode('utf-8')
+    while _align(len(MAGIC) + 4 + len(header_bytes)) != data_start:
+        data_start = _align(len(MAGIC) + 4 + len(header_bytes))
+        header['data_start'] = data_start
+        header_bytes = json.dumps(header, ensure_ascii=False).encode('utf-8')
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(MAGIC)
+        f.write(np.uint32(len(header_bytes)).tobytes())
+        f.write(header_bytes)
+        f.write(b'\0' * (data_start - f.tell()))
+        for _, parts in sections:
+            for part in parts:
+                f.write(part)
+                f.write(b'\0' * (_align(len(part)) - len(part)))
+    os.replace(tmp, path)
+
+
+class MetaTable:
+    """Read-only, lazily decoded view of a meta.bin file."""
+
+    def __init__(self, path):
+        self.path = path
+        self._mm = np.memmap(path, dtype=np.uint8, mode='r')
+        if bytes(self._mm[:len(MAGIC)]) != MAGIC:
+            raise ValueError(f"{path}: not a meta.bin file")
+        hlen = int(np.frombuffer(self._mm, dtype=np.uint32, count=1, offset=len(MAGIC))[0])
+        start = len(MAGIC) + 4
+        self.header = json.loads(bytes(self._mm[start:start + hlen]).decode('utf-8'))
+        self._n = self.header['n']
+        base = self.header['data_start']
+        self._columns = []
+        for col in self.header['columns']:
+            kind = col['kind']
+            if kind == 'int':
+                (off, _), = col['parts']
+                data = np.frombuffer(self._mm, dtype=np.int64, count=self._n, offset=base + off)
+            elif kind == 'blob':
+                (off, _), (blob_off, blob_len) = col['parts'][:2]
+                nulls = None
+                if len(col['parts']) > 2:
+                    nulls = np.frombuffer(self._mm, dtype=np.uint8, count=self._n, offset=base + col['parts'][2][0])
+                data = (np.frombuffer(self._mm, dtype=np.uint64, count=self._n + 1, offset=base + off),
+                        base + blob_off, nulls)
+            elif kind == 'dict':
+                (off, _), = col['parts']
+                data = (np.frombuffer(self._mm, dtype=np.uint32, count=self._n, offset=base + off),
+                        col['values'])
+            else:
+                data = None
+            self._columns.append((col['name'], kind, data))
+
+    def __len__(self):
+        return self._n
+
+    def _value(self, kind, data, i):
+        if kind == 'rownum':
+            return i
+        if kind == 'int':
+            return int(data[i])
+        if kind == 'blob':
+            offsets, base, nulls = data
+            if nulls is not None and nulls[i]:
+                return None if nulls[i] == BLOB_NULL else _Missing
+            return bytes(self._mm[base + int(offsets[i]):base + int(offsets[i + 1])]).decode('utf-8')
+        codes, values = data
+        code = int(codes[i])
+        if code == ABSENT:
+            return _Missing
+        v = values[code]
+        # Hand out copies of shared dict/list values so callers can mutate rows
+        return json.loads(json.dumps(v)) if isinstance(v, (dict, list)) else v
+
+    def row(self, i):
+        row = {}
+        for name, kind, data in self._columns:
+            v = self._value(kind, data, i)
+            if v is not _Missing:
+                row[name] = v
+        return row
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self.row(j) for j in range(*i.indices(self._n))]
+        i = int(i)
+        if i < 0:
+            i += self._n
+        if not 0 <= i < self._n:
+            raise IndexError('meta row out of range')
+        return self.row(i)
+
+    def __iter__(self):
+        for i in range(self._n):
+            yield self.row(i)
+
+    def get(self, i, key, default=None):
+        """One field of one row without decoding the others."""
+        for name, kind, data in self._columns:
+            if name == key:
+                v = self._value(kind, data, int(i))
+                return default if v is _Missing else v
+        return default
+
+    def column(self, key):
+        return [self.get(i, key) for i in range(self._n)]
+
+    def tolist(self):
+        return list(self)
+
+
+def meta_path(folder):
+    """Path of the metadata file in folder (meta.bin preferred), or None."""
+    for name in (META_BIN, META_JSON):
+        p = os.path.join(folder, name)
+        if os.path.exists(p):
+            return p
+    return None
+
+
+def read_meta(folder):
+    """MetaTable for meta.bin, else the list from meta.json. Raises FileNotFoundError."""
+    p = meta_path(folder)
+    if p is None:
+        raise FileNotFoundError(os.path.join(folder, META_BIN))
+    if p.endswith('.bin'):
+        return MetaTable(p)
+    with open(p, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def convert_folder(folder, keep_json=False):
+    """Convert folder/meta.json to meta.bin; returns (rows, json_bytes, bin_bytes) or None."""
+    src = os.path.join(folder, META_JSON)
+    if not os.path.exists(src):
+        return None
+    with open(src, 'r', encoding='utf-8') as f:
+        rows = json.load(f)
+    dst = os.path.join(folder, META_BIN)
+    write_meta(dst, rows)
+    table = MetaTable(dst)
+    if len(table) != len(rows) or any(a != b for a, b in zip(table, rows)):
+        os.remove(dst)
+        raise ValueError(f"{folder}: meta.bin round-trip mismatch; kept meta.json")
+    json_bytes = os.path.getsize(src)
+    if not keep_json:
+        os.remove(src)
+    return len(rows), json_bytes, os.path.getsize(dst)
@@ -0,0 +1,20 @@
+"""
+Process pools for CPU-bound batch work (ingestion, chunking).
+
+Workers are started with forkserver (spawn where unavailable) rather than
+fork: the web process has threads (HTTP pools, executors) and forking a
+multi-threaded process can deadlock the child.
+"""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+
+def default_workers(env_var):
+    """Worker count from env_var, else the CPU count."""
+    return int(os.environ.get(env_var, 0)) or os.cpu_count() or 1
+
+
+def process_pool(workers):
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(method))
@@ -0,0 +1,321 @@
+"""
+Segment layout for a Step 5 embedding DB folder.
+
+    <db>/manifest.json                 live segment list, tombstones, generation
+    <db>/segments/seg-000001/vectors.npy
+    <db>/segments/seg-000001/meta.bin   (columnar, see services/meta_store)
+
+Segments are written once and never modified. Adding documents writes a new
+segment (rows of the same doc_ids in older segments are tombstoned), removing
+documents only appends tombstones, and compaction rewrites the live rows into
+a single segment. Every change ends with an atomic replace of manifest.json,
+so a reader that loads the manifest once sees a consistent snapshot.
+
+A folder without manifest.json is the flat layout written by save_artifacts()
+(vectors.npy + meta.bin, or meta.json for older DBs); it is converted into a
+first segment on the first add/remove.
+
+Environment:
+  EMBED_COMPACT_RATIO   compact when tombstoned/total rows exceeds this (default 0.3)
+  EMBED_MAX_SEGMENTS    compact when there are more segments than this (default 8)
+"""
+import json
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+
+from services.meta_store import META_BIN, META_JSON, MetaTable, meta_path, read_meta, write_meta
+
+try:
+    import fcntl
+except ImportError:  # Windows: in-process lock only
+    fcntl = None
+
+MANIFEST = 'manifest.json'
+SEGMENTS_DIR = 'segments'
+
+_locks = {}
+_locks_lock = threading.Lock()
+
+
+def is_segmented(folder):
+    return os.path.exists(os.path.join(folder, MANIFEST))
+
+
+def db_ready(folder):
+    """True when folder holds a readable DB in either layout."""
+    folder = str(folder)
+    if is_segmented(folder):
+        return True
+    return os.path.exists(os.path.join(folder, 'vectors.npy')) and meta_path(folder) is not None
+
+
+def read_manifest(folder):
+    try:
+        with open(os.path.join(folder, MANIFEST), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _write_manifest(folder, manifest):
+    manifest['generation'] = manifest.get('generation', 0) + 1
+    manifest['updated_iso'] = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+    tmp = os.path.join(folder, MANIFEST + '.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, os.path.join(folder, MANIFEST))
+
+
+class _FolderLock:
+    """Serializes writers of one DB folder (threads and, where fcntl exists, processes)."""
+
+    def __init__(self, folder):
+        key = os.path.abspath(folder)
+        with _locks_lock:
+            self._tlock = _locks.setdefault(key, threading.Lock())
+        self._path = os.path.join(key, '.lock')
+        self._fh = None
+
+    def __enter__(self):
+        self._tlock.acquire()
+        if fcntl is not None:
+            os.makedirs(os.path.dirname(self._path), exist_ok=True)
+            self._fh = open(self._path, 'a')
+            fcntl.flock(self._fh, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if self._fh is not None:
+            fcntl.flock(self._fh, fcntl.LOCK_UN)
+            self._fh.close()
+            self._fh = None
+        self._tlock.release()
+
+
+def _segment_path(folder, name):
+    return os.path.join(folder, SEGMENTS_DIR, name)
+
+
+def _read_segment_meta(folder, name):
+    return read_meta(_segment_path(folder, name))
+
+
+def _doc_id_column(meta):
+    if isinstance(meta, MetaTable):
+        return meta.column('doc_id')
+    return [m.get('doc_id') for m in meta]
+
+
+def _write_segment(folder, manifest, vectors, meta_rows):
+    """Write an immutable segment (temp dir, then rename) and return its manifest entry."""
+    name = f"seg-{manifest['next_segment']:06d}"
+    manifest['next_segment'] += 1
+    final = _segment_path(folder, name)
+    tmp = final + '.tmp'
+    if os.path.exists(tmp):
+        shutil.rmtree(tmp)
+    os.makedirs(tmp)
+    vectors = np.asarray(vectors, dtype=np.float32)
+    np.save(os.path.join(tmp, 'vectors.npy'), vectors)
+    # vector_index == row number costs nothing in meta.bin and lets readers use the table as-is
+    write_meta(os.path.join(tmp, META_BIN), [dict(m, vector_index=i) for i, m in enumerate(meta_rows)])
+    os.rename(tmp, final)
+    return {'name': name, 'rows': len(meta_rows),
+            'doc_ids': sorted({m.get('doc_id') for m in meta_rows if m.get('doc_id') is not None})}
+
+
+def _new_manifest(model=None, dim=None):
+    return {'format': 'segments-v1', 'generation': 0, 'model': model, 'dim': dim,
+            'next_segment': 1, 'segments': [], 'tombstones': {}}
+
+
+def _convert_flat(folder):
+    """Turn the flat vectors.npy + meta into the first segment; returns the manifest."""
+    manifest = _new_manifest()
+    config_path = os.path.join(folder, 'config.json')
+    if os.path.exists(config_path):
+        with open(config_path, 'r', encoding='utf-8') as f:
+            manifest['model'] = json.load(f).get('model')
+    vectors_path = os.path.join(folder, 'vectors.npy')
+    if os.path.exists(vectors_path) and meta_path(folder) is not None:
+        vectors = np.load(vectors_path)
+        meta_rows = list(read_meta(folder))
+        if len(meta_rows):
+            manifest['dim'] = int(vectors.shape[1])
+            manifest['segments'].append(_write_segment(folder, manifest, vectors, meta_rows))
+    _write_manifest(folder, manifest)
+    # The manifest now wins for readers; the flat copies are no longer needed
+    for name in ('vectors.npy', META_BIN, META_JSON, 'faiss.index'):
+        try:
+            os.remove(os.path.join(folder, name))
+        except FileNotFoundError:
+            pass
+    return manifest
+
+
+def _load_manifest_for_write(folder):
+    os.makedirs(os.path.join(folder, SEGMENTS_DIR), exist_ok=True)
+    return read_manifest(folder) or _convert_flat(folder)
+
+
+def _tombstone_docs(folder, manifest, doc_ids):
+    """Tombstone live rows of doc_ids in existing segments; returns the number of rows."""
+    n = 0
+    for seg in manifest['segments']:
+        if not doc_ids.intersection(seg.get('doc_ids', [])):
+            continue
+        dead = set(manifest['tombstones'].get(seg['name'], []))
+        for i, doc_id in enumerate(_doc_id_column(_read_segment_meta(folder, seg['name']))):
+            if doc_id in doc_ids and i not in dead:
+                dead.add(i)
+                n += 1
+        manifest['tombstones'][seg['name']] = sorted(dead)
+    return n
+
+
+def _live_rows(manifest):
+    dead = sum(len(v) for v in manifest['tombstones'].values())
+    return sum(s['rows'] for s in manifest['segments']) - dead, dead
+
+
+def needs_compaction(manifest):
+    live, dead = _live_rows(manifest)
+    ratio = float(os.environ.get('EMBED_COMPACT_RATIO', 0.3))
+    max_segments = int(os.environ.get('EMBED_MAX_SEGMENTS', 8))
+    return (dead and dead > ratio * (live + dead)) or len(manifest['segments']) > max_segments
+
+
+def add_documents(folder, vectors, meta_rows, model=None, auto_compact=True):
+    """
+    Append chunks as a new segment. Rows of the same doc_ids already in the DB
+    are tombstoned, so re-adding a document replaces it.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.shape[0] != len(meta_rows):
+        raise ValueError(f"Mismatch: vectors rows ({vectors.shape[0]}) != meta rows ({len(meta_rows)})")
+    with _FolderLock(folder):
+        manifest = _load_manifest_for_write(folder)
+        if model and manifest.get('model') and manifest['model'] != model:
+            raise ValueError(f"DB was built with {manifest['model']}, not {model}; rebuild it instead")
+        if len(meta_rows) and manifest.get('dim') not in (None, vectors.shape[1]):
+            raise ValueError(f"Vector dim {vectors.shape[1]} does not match DB dim {manifest['dim']}")
+        replaced = _tombstone_docs(folder, manifest, {m.get('doc_id') for m in meta_rows})
+        segment = None
+        if len(meta_rows):
+            segment = _write_segment(folder, manifest, vectors, meta_rows)
+            manifest['segments'].append(segment)
+            manifest['dim'] = int(vectors.shape[1])
+        manifest['model'] = manifest.get('model') or model
+        _write_manifest(folder, manifest)
+        summary = {'added': len(meta_rows), 'replaced': replaced,
+                   'segment': segment['name'] if segment else None, 'compacted': False}
+        if auto_compact and needs_compaction(manifest):
+            _compact_locked(folder, manifest)
+            summary['compacted'] = True
+    return summary
+
+
+def remove_documents(folder, doc_ids, auto_compact=True):
+    """Tombstone every live row of doc_ids; nothing is rewritten."""
+    with _FolderLock(folder):
+        manifest = _load_manifest_for_write(folder)
+        removed = _tombstone_docs(folder, manifest, set(doc_ids))
+        if removed:
+            _write_manifest(folder, manifest)
+        summary = {'removed': removed, 'compacted': False}
+        if removed and auto_compact and needs_compaction(manifest):
+            _compact_locked(folder, manifest)
+            summary['compacted'] = True
+    return summary
+
+
+def _compact_locked(folder, manifest):
+    vectors, meta_rows = _materialize(folder, manifest)
+    old = [s['name'] for s in manifest['segments']]
+    manifest['segments'] = []
+    manifest['tombstones'] = {}
+    if len(meta_rows):
+        manifest['segments'].append(_write_segment(folder, manifest, vectors, meta_rows))
+    _write_manifest(folder, manifest)
+    # Readers holding the previous snapshot keep their open mmaps; new readers
+    # follow the new manifest (load_snapshot retries if a segment vanishes).
+    for name in old:
+        shutil.rmtree(_segment_path(folder, name), ignore_errors=True)
+    return {'segments_merged': len(old), 'rows': len(meta_rows)}
+
+
+def compact(folder):
+    """Rewrite the live rows into a single segment and drop the old ones."""
+    with _FolderLock(folder):
+        manifest = read_manifest(folder)
+        if manifest is None:
+            return {'segments_merged': 0, 'rows': None}
+        return _compact_locked(folder, manifest)
+
+
+def _materialize(folder, manifest):
+    """Live (vectors, meta_rows) of a manifest, segment order preserved."""
+    parts, metas = [], []
+    for seg in manifest['segments']:
+        path = _segment_path(folder, seg['name'])
+        vecs = np.load(os.path.join(path, 'vectors.npy'), mmap_mode='r')
+        meta = _read_segment_meta(folder, seg['name'])
+        dead = manifest['tombstones'].get(seg['name'])
+        if dead:
+            keep = np.ones(len(meta), dtype=bool)
+            keep[dead] = False
+            vecs = vecs[keep]
+            meta = [meta[i] for i in np.flatnonzero(keep)]
+        parts.append(vecs)
+        metas.append(meta)
+    if not parts:
+        return np.zeros((0, manifest.get('dim') or 0), dtype=np.float32), []
+    if len(parts) == 1:
+        # Single untouched segment stays memory-mapped (vectors and meta.bin)
+        return parts[0], metas[0]
+    return np.concatenate(parts), [m for meta in metas for m in meta]
+
+
+def load_snapshot(folder, retries=3):
+    """
+    Return (vectors, meta_rows, manifest) for the current manifest. meta rows
+    get a vector_index matching their row in the returned matrix.
+    """
+    for attempt in range(retries):
+        manifest = read_manifest(folder)
+        if manifest is None:
+            raise FileNotFoundError(os.path.join(folder, MANIFEST))
+        try:
+            vectors, meta_rows = _materialize(folder, manifest)
+            break
+        except FileNotFoundError:
+            # A compaction replaced the manifest between our reads; take the new one
+            if attempt == retries - 1:
+                raise
+    if not isinstance(meta_rows, MetaTable):
+        meta_rows = [dict(m, vector_index=i) for i, m in enumerate(meta_rows)]
+    return vectors, meta_rows, manifest
+
+
+def drop_segments(folder):
+    """Remove the segment layout (used when a full rebuild writes flat artifacts)."""
+    try:
+        os.remove(os.path.join(folder, MANIFEST))
+    except FileNotFoundError:
+        pass
+    shutil.rmtree(os.path.join(folder, SEGMENTS_DIR), ignore_errors=True)
+
+
+def segment_stats(folder):
+    manifest = read_manifest(folder)
+    if manifest is None:
+        return None
+    live, dead = _live_rows(manifest)
+    return {'segments': len(manifest['segments']), 'live_rows': live, 'tombstoned_rows': dead,
+            'generation': manifest['generation']}
@@ -113,7 +113,9 @@ document.addEventListener('DOMContentLoaded', function() {
         parseResults.textContent = 'No files parsed.';
         return;
       }
-  parseResults.innerHTML = '<b>Parse Results:</b><ul>' + results.map(r => `<li>${r.doc_id} → ${r.parsed_raw_path}</li>`).join('') + '</ul>';
+      const t = data.throughput || {};
+      const summary = t.docs !== undefined ? `<div>${t.processed} parsed, ${t.skipped} unchanged (skipped, ~${(t.time_saved_ms / 1000).toFixed(1)} s saved)</div>` : '';
+  parseResults.innerHTML = '<b>Parse Results:</b>' + summary + '<ul>' + results.map(r => `<li>${r.doc_id} → ${r.parsed_raw_path}${r.skipped ? ' (unchanged)' : ''}</li>`).join('') + '</ul>';
     });
   }
 
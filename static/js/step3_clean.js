@@ -42,9 +42,16 @@ document.addEventListener('DOMContentLoaded', function() {
       .then(data => {
         let html = '';
         if (data.results && data.results.length > 0) {
-          html += '<h3>Clean Results</h3><ul>';
+          const t = data.throughput || {};
+          html += '<h3>Clean Results</h3>';
+          if (t.docs !== undefined) {
+            html += `<p>${t.processed} cleaned, ${t.skipped} unchanged (skipped, ~${(t.time_saved_ms / 1000).toFixed(1)} s saved)</p>`;
+          }
+          html += '<ul>';
           data.results.forEach(r => {
-            html += `<li>File <b>${r.doc_id}</b> cleaned and saved in <code>${r.cleaned_path}</code></li>`;
+            html += r.skipped
+              ? `<li>File <b>${r.doc_id}</b> unchanged, kept <code>${r.cleaned_path}</code></li>`
+              : `<li>File <b>${r.doc_id}</b> cleaned and saved in <code>${r.cleaned_path}</code></li>`;
           });
           html += '</ul>';
         } else {
@@ -0,0 +1,64 @@
+// step7_stream.js: Streams an answer from /steps/7/ask/stream (Server-Sent Events over fetch)
+
+document.addEventListener('DOMContentLoaded', () => {
+  const btn = document.getElementById('btn-stream');
+  if (!btn) return;
+  const form = btn.closest('form');
+  const card = document.getElementById('stream-card');
+  const answerEl = document.getElementById('stream-answer');
+  const citesEl = document.getElementById('stream-citations');
+  const statusEl = document.getElementById('stream-status');
+
+  function handle(event, data) {
+    if (event === 'token') {
+      answerEl.textContent += data.text;
+    } else if (event === 'citation') {
+      const span = document.createElement('span');
+      span.className = 'badge bg-secondary me-1';
+      span.textContent = data.citation;
+      citesEl.appendChild(span);
+    } else if (event === 'done') {
+      statusEl.textContent = `Done in ${data.elapsed_ms} ms (first token after ${data.ttft_ms} ms)` + (data.cached ? ` [cache: ${data.cached}]` : '');
+    } else if (event === 'error') {
+      statusEl.textContent = 'Error: ' + data.error;
+    }
+  }
+
+  btn.addEventListener('click', async (e) => {
+    e.preventDefault();
+    if (!form.reportValidity()) return;
+    card.classList.remove('d-none');
+    answerEl.textContent = '';
+    citesEl.innerHTML = '';
+    statusEl.textContent = 'Waiting for first token...';
+    const resp = await fetch(btn.dataset.url, {
+      method: 'POST',
+      body: new FormData(form),
+      headers: { 'Accept': 'text/event-stream' },
+    });
+    if (!resp.ok || !resp.body) {
+      const data = await resp.json().catch(() => ({ error: resp.statusText }));
+      statusEl.textContent = 'Error: ' + data.error;
+      return;
+    }
+    const reader = resp.body.getReader();
+    const decoder = new TextDecoder();
+    let buf = '';
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buf += decoder.decode(value, { stream: true });
+      let sep;
+      while ((sep = buf.indexOf('\n\n')) >= 0) {
+        const raw = buf.slice(0, sep);
+        buf = buf.slice(sep + 2);
+        let event = 'message', data = '';
+        raw.split('\n').forEach(line => {
+          if (line.startsWith('event:')) event = line.slice(6).trim();
+          else if (line.startsWith('data:')) data += line.slice(5).trim();
+        });
+        if (data) handle(event, JSON.parse(data));
+      }
+    }
+  });
+});
@@ -5,7 +5,7 @@ Step 2 API: List files from step 1, parse all, save results in data/parsed_raw,
 import os
 import json
 from flask import Blueprint, request, jsonify
-from services.ingest_utils import slugify, parse_file, get_parsed_stats
+from services.ingest_utils import slugify, parse_batch, get_parsed_stats
 
 STEP1_DATA = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'step1', 'data-Policies')
 
@@ -29,10 +29,11 @@ def api_list_files():
 
 @step2_bp.route('/parse', methods=['POST'])
 def api_parse():
-    results = []
-    for fname in os.listdir(STEP1_DATA):
-        fpath = os.path.join(STEP1_DATA, fname)
-        if os.path.isfile(fpath):
-            res = parse_file(fpath)
-            results.append(res)
-    return jsonify({'results': results, 'stats': get_parsed_stats()})
+    paths = [os.path.join(STEP1_DATA, fname) for fname in os.listdir(STEP1_DATA)]
+    # Documents are parsed across a process pool (PDFs page-parallel)
+    # Unchanged inputs are skipped unless the client asks for force
+    body = request.get_json(silent=True) or {}
+    force = bool(body.get('force')) or request.args.get('force') in ('1', 'true')
+    batch = parse_batch([p for p in paths if os.path.isfile(p)], force=force)
+    results = batch.pop('results')
+    return jsonify({'results': results, 'stats': get_parsed_stats(), 'throughput': batch})
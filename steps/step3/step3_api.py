@@ -5,7 +5,7 @@ Step 3 API: List files from parsed_raw, clean all, save results in data/parsed,
 import os
 import json
 from flask import Blueprint, request, jsonify
-from services.ingest_utils import slugify, clean_text, get_parsed_stats
+from services.ingest_utils import slugify, clean_batch, get_parsed_stats
 
 PARSED_RAW_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'step2', 'Parse-Results')
 
@@ -29,10 +29,10 @@ def api_list_files():
 
 @step3_bp.route('/clean', methods=['POST'])
 def api_clean():
-    results = []
-    for fname in os.listdir(PARSED_RAW_DIR):
-        fpath = os.path.join(PARSED_RAW_DIR, fname)
-        if os.path.isfile(fpath):
-            res = clean_text(fpath)
-            results.append(res)
-    return jsonify({'results': results, 'stats': get_parsed_stats()})
+    paths = [os.path.join(PARSED_RAW_DIR, fname) for fname in os.listdir(PARSED_RAW_DIR)]
+    # Unchanged inputs are skipped unless the client asks for force
+    body = request.get_json(silent=True) or {}
+    force = bool(body.get('force')) or request.args.get('force') in ('1', 'true')
+    batch = clean_batch([p for p in paths if os.path.isfile(p)], force=force)
+    results = batch.pop('results')
+    return jsonify({'results': results, 'stats': get_parsed_stats(), 'throughput': batch})
@@ -0,0 +1,247 @@
+"""
+Background "chunk all" jobs for Step 4.
+
+start_job() returns at once with a job id. A supervisor thread fans the
+documents out over a process pool (CHUNK_WORKERS, default CPU count), one task
+per document, and records progress as results come back. Outputs are written
+atomically by the workers (write_jsonl); chunk.jsonl log lines are written by
+the supervisor only, LOG_BATCH documents per append.
+
+Status lives in memory and is mirrored to logs/jobs/<job_id>.json, so a status
+request that lands on another gunicorn worker still sees the job. The owning
+process refreshes heartbeat_ts every HEARTBEAT_SEC; a running job whose owner
+died is reported as failed. Only one job runs at a time across workers, so a
+burst of requests never forks more than one pool.
+"""
+import glob
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import as_completed
+from datetime import datetime
+
+try:
+	import fcntl
+except ImportError:  # Windows: in-process check only
+	fcntl = None
+
+from services.proc_pool import default_workers, process_pool
+from .services_chunk import (CHUNKED_HEADING_DIR, CHUNKED_TOKEN_DIR, STEP3_CLEAN_DIR, headings_chunk, iter_token_chunks,
+							 log_entry, write_jsonl, write_logs)
+
+JOBS_DIR = os.path.join(os.path.dirname(__file__), 'logs', 'jobs')
+MAX_JOBS_KEPT = 50
+LOG_BATCH = 64
+HEARTBEAT_SEC = 5
+STALE_SEC = 30
+
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+
+class JobRunning(Exception):
+	"""start_job() was called while another chunking job is still running."""
+
+	def __init__(self, job_id):
+		super().__init__(f"Chunking job {job_id} is still running")
+		self.job_id = job_id
+
+
+def chunk_doc(method, doc_id, doc_path, out_path, params):
+	"""Chunk one document and write its JSONL (runs in a pool worker)."""
+	t0 = time.time()
+	try:
+		if method == 'heading':
+			chunks = headings_chunk(doc_path, params['mode'], params['min_heading_gap'], params['max_chunk_len'])
+		else:
+			# Streamed straight into the JSONL, one window of tokens in memory
+			chunks = iter_token_chunks(doc_path, params['window_size'], params['overlap'], params['tokenization'])
+		n_chunks = write_jsonl(chunks, out_path, doc_id, method, params)
+		return {'doc_id': doc_id, 'n_chunks': n_chunks, 'ms_elapsed': int((time.time() - t0) * 1000),
+				'status': 'ok', 'error': None}
+	except Exception as e:
+		return {'doc_id': doc_id, 'n_chunks': 0, 'ms_elapsed': int((time.time() - t0) * 1000),
+				'status': 'error', 'error': str(e)}
+
+
+def _status_path(job_id):
+	return os.path.join(JOBS_DIR, f'{job_id}.json')
+
+
+def _publish(job):
+	"""Snapshot job into the status file (atomic replace). Caller holds _jobs_lock."""
+	elapsed = max((job['finished_ts'] or time.time()) - job['started_ts'], 1e-9)
+	job['elapsed_ms'] = int(elapsed * 1000)
+	job['docs_per_s'] = round(job['docs_done'] / elapsed, 2)
+	job['chunks_per_s'] = round(job['chunks'] / elapsed, 1)
+	job['heartbeat_ts'] = time.time()
+	os.makedirs(JOBS_DIR, exist_ok=True)
+	tmp = _status_path(job['job_id']) + '.tmp'
+	with open(tmp, 'w', encoding='utf-8') as f:
+		json.dump(job, f)
+	os.replace(tmp, _status_path(job['job_id']))
+
+
+def _owner_alive(job):
+	if time.time() - job.get('heartbeat_ts', job['started_ts']) > STALE_SEC:
+		return False
+	try:
+		os.kill(job['pid'], 0)
+	except ProcessLookupError:
+		return False
+	except (PermissionError, KeyError, TypeError):
+		pass
+	return True
+
+
+def _read_status_file(path):
+	"""Status dict from a file; a running job whose owner died is reported as failed."""
+	try:
+		with open(path, 'r', encoding='utf-8') as f:
+			job = json.load(f)
+	except (FileNotFoundError, ValueError):
+		return None
+	if job.get('state') == 'running' and not _owner_alive(job):
+		job.update({'state': 'failed',
+					'error': f"owner process {job.get('pid')} stopped (no heartbeat for over {STALE_SEC}s)"})
+	return job
+
+
+def _running_job_id():
+	with _jobs_lock:
+		for job in _jobs.values():
+			if job['state'] == 'running':
+				return job['job_id']
+	# Jobs owned by other worker processes
+	for path in glob.glob(os.path.join(JOBS_DIR, '*.json')):
+		job = _read_status_file(path)
+		if job and job['state'] == 'running':
+			return job['job_id']
+	return None
+
+
+def _prune_status_files():
+	paths = sorted(glob.glob(os.path.join(JOBS_DIR, '*.json')), key=os.path.getmtime)
+	for path in paths[:-MAX_JOBS_KEPT]:
+		try:
+			os.remove(path)
+		except FileNotFoundError:
+			pass
+
+
+class _StartLock:
+	"""Serializes the running-job check and job start across worker processes."""
+
+	def __enter__(self):
+		os.makedirs(JOBS_DIR, exist_ok=True)
+		self._fh = open(os.path.join(JOBS_DIR, '.start.lock'), 'a')
+		if fcntl is not None:
+			fcntl.flock(self._fh, fcntl.LOCK_EX)
+		return self
+
+	def __exit__(self, *exc):
+		if fcntl is not None:
+			fcntl.flock(self._fh, fcntl.LOCK_UN)
+		self._fh.close()
+
+
+def _heartbeat(job_id, stop):
+	while not stop.wait(HEARTBEAT_SEC):
+		with _jobs_lock:
+			_publish(_jobs[job_id])
+
+
+def _run(job_id, method, docs, params, workers):
+	logs = []
+	stop = threading.Event()
+	threading.Thread(target=_heartbeat, args=(job_id, stop), daemon=True, name=f'chunk-job-{job_id}-heartbeat').start()
+
+	def record(res):
+		logs.append(log_entry(res['doc_id'], method, res['n_chunks'], res['ms_elapsed'], params, res['status'], res['error']))
+		if len(logs) >= LOG_BATCH:
+			write_logs(logs)
+			logs.clear()
+		with _jobs_lock:
+			job = _jobs[job_id]
+			job['docs_done'] += 1
+			job['chunks'] += res['n_chunks']
+			job['docs_failed'] += res['status'] != 'ok'
+			job['results'].append(res)
+			_publish(job)
+
+	try:
+		if workers <= 1 or len(docs) <= 1:
+			for doc in docs:
+				record(chunk_doc(method, *doc, params))
+		else:
+			with process_pool(workers) as pool:
+				futures = [pool.submit(chunk_doc, method, *doc, params) for doc in docs]
+				for fut in as_completed(futures):
+					record(fut.result())
+		state, error = 'done', None
+	except Exception as e:
+		state, error = 'failed', str(e)
+	try:
+		write_logs(logs)
+	except OSError as e:
+		state, error = 'failed', f'chunk log: {e}'
+	stop.set()
+	with _jobs_lock:
+		job = _jobs[job_id]
+		job.update({'state': state, 'error': error, 'finished_ts': time.time(),
+					'finished_iso': datetime.utcnow().isoformat()})
+		_publish(job)
+
+
+def start_job(method, doc_ids, params, files, workers=None):
+	"""
+	Start chunking doc_ids (method 'heading' or 'token') in the background.
+	files is list_clean_files(); unknown doc_ids are reported as skipped.
+	Returns the initial status dict. Raises JobRunning while another job
+	(in any worker process) is still running.
+	"""
+	if method not in ('heading', 'token'):
+		raise ValueError(f"Unknown chunking method: {method}")
+	by_id = {f['doc_id']: f for f in files}
+	# Paths are resolved here, not in the workers, so they follow this process's settings
+	out_dir = CHUNKED_HEADING_DIR if method == 'heading' else CHUNKED_TOKEN_DIR
+	docs = [(d, os.path.join(STEP3_CLEAN_DIR, by_id[d]['filename']), os.path.join(out_dir, f'{d}.jsonl'))
+			for d in doc_ids if d in by_id]
+	workers = min(workers or default_workers('CHUNK_WORKERS'), max(len(docs), 1))
+	job_id = uuid.uuid4().hex[:12]
+	job = {
+		'job_id': job_id, 'method': method, 'params': params, 'state': 'running', 'error': None,
+		'workers': workers, 'docs_total': len(docs), 'docs_done': 0, 'docs_failed': 0, 'chunks': 0,
+		'skipped_doc_ids': [d for d in doc_ids if d not in by_id], 'results': [],
+		'pid': os.getpid(), 'started_ts': time.time(), 'started_iso': datetime.utcnow().isoformat(),
+		'finished_ts': None, 'finished_iso': None,
+	}
+	with _StartLock():
+		running = _running_job_id()
+		if running:
+			raise JobRunning(running)
+		with _jobs_lock:
+			_jobs[job_id] = job
+			for old in sorted(_jobs, key=lambda k: _jobs[k]['started_ts'])[:-MAX_JOBS_KEPT]:
+				if _jobs[old]['state'] != 'running':
+					del _jobs[old]
+			_publish(job)
+			snapshot = json.loads(json.dumps(job))
+	_prune_status_files()
+	threading.Thread(target=_run, args=(job_id, method, docs, params, workers), daemon=True,
+					 name=f'chunk-job-{job_id}').start()
+	return snapshot
+
+
+def job_status(job_id):
+	"""Current status dict of a job, or None if unknown."""
+	with _jobs_lock:
+		job = _jobs.get(job_id)
+		if job is not None:
+			return json.loads(json.dumps(job))
+	# Started by another worker process
+	if not job_id or not all(c in '0123456789abcdef' for c in job_id):
+		return None
+	return _read_status_file(_status_path(job_id))
@@ -1,12 +1,17 @@
 import os
 import re
 import json
+import tempfile
 from datetime import datetime
+from json.encoder import encode_basestring
+
+from .token_index import WORDPIECE, wordpiece_windows
 
 STEP3_CLEAN_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'step3', 'Clean-Results')
 CHUNKED_HEADING_DIR = os.path.join(os.path.dirname(__file__), 'Chunked-by-Heading')
 CHUNKED_TOKEN_DIR = os.path.join(os.path.dirname(__file__), 'Chunked-by-Token')
 CHUNK_LOG = os.path.join(os.path.dirname(__file__), 'logs', 'chunk.jsonl')
+WRITE_BATCH = 1024   # JSONL rows joined per write() call
 
 def slugify(filename: str) -> str:
 	base = os.path.splitext(os.path.basename(filename))[0]
@@ -27,97 +32,190 @@ def list_clean_files():
 	return files
 
 
+# One compiled pass per mode over "\n" + text. Each match is the "\n" before
+# a heading line (so m.start() is the line's offset in text) and the rules sit
+# in a lookahead, so no line is consumed before it is tested; the literal "\n"
+# prefix also lets the regex engine skip straight from line to line. Line
+# rules (same as the old per-line checks):
+#   atx        "#".."######", whitespace, then text
+#   setext     the next line is all "=" or all "-"
+#   colon      <= 80 chars ending in ":"
+#   lead word  starts with Section/Policy/Purpose/Scope; next line blank or none
+#   caps       <= 60 chars, upper case (checked in Python), next line blank or none
+# Possessive quantifiers keep the length limits from backtracking.
+_ATX = r'#{1,6}[^\S\n]+.'
+_SETEXT = r'.*\n(?:=+|-+)$'
+_NEXT_BLANK = r'(?:\n[^\S\n]*$|\Z)'
+_HEADING_RES = {
+	'markdown_atx': re.compile(rf'\n(?={_ATX})', re.M),
+	'setext': re.compile(rf'\n(?={_SETEXT})', re.M),
+	'heuristic': re.compile(
+		rf'\n(?={_ATX}|{_SETEXT}|(?=.{{0,80}}+$).*:$|(?:Section|Policy|Purpose|Scope).*{_NEXT_BLANK}'
+		rf'|(?P<caps>.{{1,60}}+){_NEXT_BLANK})', re.M),
+}
+# Line breaks str.splitlines() knows besides "\n"
+_OTHER_BREAKS = re.compile('[\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029]')
+
+
+def heading_offsets(text, mode):
+	"""
+	Start offsets of heading lines in text, whose lines must be separated by
+	"\n" only (see headings_chunk_text).
+	"""
+	pattern = _HEADING_RES.get(mode)
+	if pattern is None:
+		return []
+	has_caps = 'caps' in pattern.groupindex
+	offsets = []
+	for m in pattern.finditer('\n' + text):
+		if not has_caps or m.group('caps') is None or m.group('caps').isupper():
+			offsets.append(m.start())
+	return offsets
+
+
 def headings_chunk(doc_path, mode, min_heading_gap=1, max_chunk_len=None):
 	"""
 	Chunk text by headings. Returns list of chunk dicts.
 	"""
 	with open(doc_path, 'r', encoding='utf-8') as f:
 		text = f.read()
-	lines = text.splitlines()
+	return headings_chunk_text(text, mode, min_heading_gap, max_chunk_len)
+
+
+def headings_chunk_text(text, mode, min_heading_gap=1, max_chunk_len=None):
+	# Same lines as text.splitlines(), but kept as one string
+	if _OTHER_BREAKS.search(text):
+		text = '\n'.join(text.splitlines())
+	elif text.endswith('\n'):
+		text = text[:-1]
 	chunks = []
-	chunk_lines = []
-	chunk_starts = []
-	# Identify headings
-	for i, line in enumerate(lines):
-		is_heading = False
-		if mode == 'markdown_atx' and re.match(r'^#{1,6}\s+.+', line):
-			is_heading = True
-		elif mode == 'setext' and i+1 < len(lines) and re.match(r'^(=+|-+)$', lines[i+1]):
-			is_heading = True
-		elif mode == 'heuristic':
-			if re.match(r'^#{1,6}\s+.+', line):
-				is_heading = True
-			elif i+1 < len(lines) and re.match(r'^(=+|-+)$', lines[i+1]):
-				is_heading = True
-			elif len(line) <= 80 and line.endswith(':'):
-				is_heading = True
-			elif len(line) <= 60 and line.isupper() and (i+1 == len(lines) or lines[i+1].strip() == ''):
-				is_heading = True
-			elif re.match(r'^(Section|Policy|Purpose|Scope)', line) and (i+1 == len(lines) or lines[i+1].strip() == ''):
-				is_heading = True
-		if is_heading:
-			chunk_starts.append(i)
+	chunk_starts = heading_offsets(text, mode)
 	# Add start and end
 	if chunk_starts and chunk_starts[0] != 0:
 		chunk_starts = [0] + chunk_starts
-	chunk_starts.append(len(lines))
-	# Build chunks
+	chunk_starts.append(len(text))
+	# Build chunks straight from slices (a trailing "\n" goes with strip())
 	for idx in range(len(chunk_starts)-1):
-		start, end = chunk_starts[idx], chunk_starts[idx+1]
-		chunk = '\n'.join(lines[start:end]).strip()
+		chunk = text[chunk_starts[idx]:chunk_starts[idx+1]].strip()
 		if chunk:
 			chunks.append(chunk)
 	# Merge tiny chunks if min_heading_gap > 1
 	if min_heading_gap > 1 and len(chunks) > 1:
 		merged = []
-		buf = chunks[0]
+		buf = [chunks[0]]
+		buf_words = len(chunks[0].split())
 		for c in chunks[1:]:
-			if len(buf.split()) < min_heading_gap:
-				buf += '\n' + c
+			if buf_words < min_heading_gap:
+				buf.append(c)
+				buf_words += len(c.split())
 			else:
-				merged.append(buf)
-				buf = c
-		merged.append(buf)
+				merged.append('\n'.join(buf))
+				buf, buf_words = [c], len(c.split())
+		merged.append('\n'.join(buf))
 		chunks = merged
 	# Soft-wrap oversized chunks
 	if max_chunk_len:
 		wrapped = []
 		for chunk in chunks:
 			words = chunk.split()
-			while len(words) > max_chunk_len:
-				wrapped.append(' '.join(words[:max_chunk_len]))
-				words = words[max_chunk_len:]
-			wrapped.append(' '.join(words))
+			for i in range(0, max(len(words), 1), max_chunk_len):
+				wrapped.append(' '.join(words[i:i+max_chunk_len]))
 		chunks = wrapped
 	return chunks
 
+TOKEN_BLOCK_CHARS = 1 << 16
+
+
+def _window_step(window_size, overlap):
+	step = window_size - overlap
+	if window_size < 1 or step < 1:
+		raise ValueError(f"window_size ({window_size}) must be >= 1 and greater than overlap ({overlap})")
+	return step
+
+
+def _token_blocks(f, tokenization):
+	"""Token lists of a text file, one per block read (a token cut by a block edge is carried over)."""
+	carry = ''
+	while True:
+		block = f.read(TOKEN_BLOCK_CHARS)
+		if not block:
+			break
+		if tokenization != 'whitespace_approx':
+			yield list(block)
+			continue
+		block = carry + block
+		tokens = block.split()
+		carry = tokens.pop() if tokens and not block[-1].isspace() else ''
+		yield tokens
+	if carry:
+		yield [carry]
+
+
+def iter_token_chunks(doc_path, window_size=700, overlap=150, tokenization='whitespace_approx'):
+	"""
+	Streaming token_chunk(): yields the same windows while holding at most one
+	window plus one block of tokens, never the whole document or its token list.
+	"""
+	step = _window_step(window_size, overlap)
+	if tokenization == WORDPIECE:
+		# Needs the whole text once; offsets come from the cached token index
+		with open(doc_path, 'r', encoding='utf-8') as f:
+			yield from wordpiece_windows(f.read(), window_size, overlap)
+		return
+	tokens = []   # tokens from the next window start on
+	skip = 0      # tokens still to drop before the next window (step > window_size)
+	with open(doc_path, 'r', encoding='utf-8') as f:
+		for block in _token_blocks(f, tokenization):
+			if skip:
+				dropped = min(skip, len(block))
+				block = block[dropped:]
+				skip -= dropped
+			tokens += block
+			i = 0
+			while len(tokens) - i >= window_size:
+				yield ' '.join(tokens[i:i+window_size])
+				i += step
+			skip += max(i - len(tokens), 0)
+			tokens = tokens[i:]
+	# Tail windows that run past the last token
+	for i in range(0, len(tokens), step):
+		yield ' '.join(tokens[i:i+window_size])
+
+
 def token_chunk(doc_path, window_size=700, overlap=150, tokenization='whitespace_approx'):
 	"""
 	Chunk text by token windows. Returns list of chunk dicts.
 	"""
-	with open(doc_path, 'r', encoding='utf-8') as f:
-		text = f.read()
-	tokens = text.split() if tokenization == 'whitespace_approx' else list(text)
-	chunks = []
-	i = 0
-	while i < len(tokens):
-		chunk = ' '.join(tokens[i:i+window_size])
-		if chunk:
-			chunks.append(chunk)
-		i += window_size - overlap
-	return chunks
+	return list(iter_token_chunks(doc_path, window_size, overlap, tokenization))
 
 def write_jsonl(chunks, out_path, doc_id, method, params):
-	with open(out_path, 'w', encoding='utf-8') as f:
-		for idx, chunk in enumerate(chunks):
-			rec = {
-				'doc_id': doc_id,
-				'chunk_id': idx,
-				'method': method,
-				'params': params,
-				'text': chunk
-			}
-			f.write(json.dumps(rec, ensure_ascii=False) + '\n')
+	# Write next to the target and rename, so readers (Step 5) never see a half-written file.
+	# mkstemp: the form handler and an in-process job may write the same doc at once
+	os.makedirs(os.path.dirname(out_path), exist_ok=True)
+	fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(out_path), prefix=os.path.basename(out_path) + '.', suffix='.tmp')
+	# Rows are byte-identical to json.dumps({'doc_id', 'chunk_id', 'method', 'params', 'text'},
+	# ensure_ascii=False); everything but chunk_id and text is serialized once per document
+	head = '{"doc_id": ' + json.dumps(doc_id, ensure_ascii=False) + ', "chunk_id": '
+	mid = (', "method": ' + json.dumps(method, ensure_ascii=False)
+		   + ', "params": ' + json.dumps(params, ensure_ascii=False) + ', "text": ')
+	n = 0
+	try:
+		with open(fd, 'w', encoding='utf-8', buffering=1 << 20) as f:
+			batch = []
+			for idx, chunk in enumerate(chunks):
+				text = encode_basestring(chunk) if isinstance(chunk, str) else json.dumps(chunk, ensure_ascii=False)
+				batch.append(f'{head}{idx}{mid}{text}}}\n')
+				if len(batch) >= WRITE_BATCH:
+					f.write(''.join(batch))
+					batch.clear()
+				n += 1
+			f.write(''.join(batch))
+		os.chmod(tmp_path, 0o644)   # mkstemp creates 0600
+		os.replace(tmp_path, out_path)
+	finally:
+		if os.path.exists(tmp_path):
+			os.remove(tmp_path)
+	return n
 
 def read_first_chunks(jsonl_path, n=3):
 	chunks = []
@@ -132,8 +230,8 @@ def read_first_chunks(jsonl_path, n=3):
 					continue
 	return chunks
 
-def write_log(doc_id, method, n_chunks, ms_elapsed, params, status='ok', error=None):
-	log_entry = {
+def log_entry(doc_id, method, n_chunks, ms_elapsed, params, status='ok', error=None):
+	return {
 		'ts': datetime.utcnow().isoformat(),
 		'doc_id': doc_id,
 		'method': method,
@@ -143,5 +241,13 @@ def write_log(doc_id, method, n_chunks, ms_elapsed, params, status='ok', error=N
 		'status': status,
 		'error': error
 	}
+
+def write_logs(entries):
+	"""Append log_entry() dicts to chunk.jsonl with one open and one write."""
+	if not entries:
+		return
 	with open(CHUNK_LOG, 'a', encoding='utf-8') as f:
-		f.write(json.dumps(log_entry) + '\n')
\ No newline at end of file
+		f.write(''.join(json.dumps(e) + '\n' for e in entries))
+
+def write_log(doc_id, method, n_chunks, ms_elapsed, params, status='ok', error=None):
+	write_logs([log_entry(doc_id, method, n_chunks, ms_elapsed, params, status, error)])
@@ -1,6 +1,7 @@
 import os
-from flask import Blueprint, render_template, request, redirect, url_for, flash
-from .services_chunk import list_clean_files, slugify, headings_chunk, token_chunk, write_jsonl, read_first_chunks, write_log
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
+from .services_chunk import list_clean_files, slugify, headings_chunk, token_chunk, write_jsonl, read_first_chunks, log_entry, write_logs
+from .chunk_jobs import JobRunning, start_job, job_status
 
 step4_bp = Blueprint('step4_bp', __name__, url_prefix='/steps/4')
 
@@ -18,6 +19,25 @@ def step4_page():
 	return render_template('steps/step_4.html', files=files, preview_headings_chunks=None, preview_token_chunks=None,
 						   chunked_headings_files=chunked_headings_files, chunked_token_files=chunked_token_files)
 
+def _heading_params(form):
+	max_chunk_len = form.get('max_chunk_len')
+	return {'mode': form.get('mode', 'markdown_atx'), 'min_heading_gap': int(form.get('min_heading_gap', 1)),
+			'max_chunk_len': int(max_chunk_len) if max_chunk_len else None}
+
+def _token_params(form):
+	return {'window_size': int(form.get('window_size', 700)), 'overlap': int(form.get('overlap', 150)),
+			'tokenization': form.get('tokenization', 'whitespace_approx')}
+
+def _requested_doc_ids(form, files):
+	if form.get('submit', 'selected') == 'all':
+		return [f['doc_id'] for f in files]
+	selected = form.get('selected_doc_ids') or ''
+	if isinstance(selected, str):
+		selected = selected.split(',')
+	elif not isinstance(selected, list) or not all(isinstance(d, str) for d in selected):
+		raise ValueError('selected_doc_ids must be a list of doc ids or a comma-separated string')
+	return [d for d in selected if d]
+
 @step4_bp.route('/chunk_headings', methods=['POST'])
 def chunk_headings():
 	import time
@@ -36,9 +56,11 @@ def chunk_headings():
 			flash('No documents selected for chunking.', 'warning')
 			return redirect(url_for('step4_bp.step4_page'))
 	summary = []
+	logs = []
 	preview_chunks = None
+	files_by_id = {f['doc_id']: f for f in files}
 	for doc_id in doc_ids:
-		file_info = next((f for f in files if f['doc_id'] == doc_id), None)
+		file_info = files_by_id.get(doc_id)
 		if not file_info:
 			continue
 		doc_path = os.path.join(file_info['filename'])
@@ -50,11 +72,12 @@ def chunk_headings():
 			params = {'mode': mode, 'min_heading_gap': min_heading_gap, 'max_chunk_len': max_chunk_len}
 			write_jsonl(chunks, out_path, doc_id, 'heading', params)
 			ms_elapsed = int((time.time() - t0) * 1000)
-			write_log(doc_id, 'heading', len(chunks), ms_elapsed, params)
+			logs.append(log_entry(doc_id, 'heading', len(chunks), ms_elapsed, params))
 			summary.append(f'{doc_id}: {len(chunks)} chunks')
 			preview_chunks = read_first_chunks(out_path, n=3)
 		except Exception as e:
 			flash(f'Error chunking {doc_id}: {e}', 'danger')
+	write_logs(logs)
 	flash(f'Chunked {len(doc_ids)} docs. ' + ', '.join(summary), 'success')
 	chunked_headings_files = []
 	headings_dir = os.path.join(os.path.dirname(__file__), 'Chunked-by-Heading')
@@ -80,9 +103,11 @@ def chunk_token():
 			flash('No documents selected for chunking.', 'warning')
 			return redirect(url_for('step4_bp.step4_page'))
 	summary = []
+	logs = []
 	preview_chunks = None
+	files_by_id = {f['doc_id']: f for f in files}
 	for doc_id in doc_ids:
-		file_info = next((f for f in files if f['doc_id'] == doc_id), None)
+		file_info = files_by_id.get(doc_id)
 		if not file_info:
 			continue
 		doc_path = os.path.join(file_info['filename'])
@@ -94,11 +119,12 @@ def chunk_token():
 			params = {'window_size': window_size, 'overlap': overlap, 'tokenization': tokenization}
 			write_jsonl(chunks, out_path, doc_id, 'token', params)
 			ms_elapsed = int((time.time() - t0) * 1000)
-			write_log(doc_id, 'token', len(chunks), ms_elapsed, params)
+			logs.append(log_entry(doc_id, 'token', len(chunks), ms_elapsed, params))
 			summary.append(f'{doc_id}: {len(chunks)} chunks')
 			preview_chunks = read_first_chunks(out_path, n=3)
 		except Exception as e:
 			flash(f'Error chunking {doc_id}: {e}', 'danger')
+	write_logs(logs)
 	flash(f'Chunked {len(doc_ids)} docs. ' + ', '.join(summary), 'success')
 	chunked_token_files = []
 	token_dir = os.path.join(os.path.dirname(__file__), 'Chunked-by-Token')
@@ -106,3 +132,34 @@ def chunk_token():
 		chunked_token_files = sorted([f for f in os.listdir(token_dir) if f.endswith('.jsonl')])
 	return render_template('steps/step_4.html', files=files, preview_headings_chunks=None, preview_token_chunks=preview_chunks,
 						   chunked_headings_files=[], chunked_token_files=chunked_token_files)
+
+@step4_bp.route('/jobs', methods=['POST'])
+def start_chunk_job():
+	"""
+	Start a background chunking job; poll GET /steps/4/jobs/<job_id> for progress.
+	Accepts the same fields as the two forms (JSON or form-encoded) plus
+	method=heading|token.
+	"""
+	form = request.get_json(silent=True) or request.form
+	method = form.get('method', 'heading')
+	files = list_clean_files()
+	try:
+		params = _heading_params(form) if method == 'heading' else _token_params(form)
+		doc_ids = _requested_doc_ids(form, files)
+		if not doc_ids:
+			return jsonify({'error': 'No documents selected for chunking.'}), 400
+		job = start_job(method, doc_ids, params, files)
+	except ValueError as e:
+		return jsonify({'error': str(e)}), 400
+	except JobRunning as e:
+		return jsonify({'error': str(e), 'job_id': e.job_id,
+						'status_url': url_for('step4_bp.chunk_job_status', job_id=e.job_id)}), 409
+	job['status_url'] = url_for('step4_bp.chunk_job_status', job_id=job['job_id'])
+	return jsonify(job), 202
+
+@step4_bp.route('/jobs/<job_id>', methods=['GET'])
+def chunk_job_status(job_id):
+	job = job_status(job_id)
+	if job is None:
+		return jsonify({'error': 'unknown job'}), 404
+	return jsonify(job)
@@ -0,0 +1,145 @@
+"""
+Wordpiece token windows for Step 4 (tokenization='minilm_wordpiece').
+
+Chunks are cut on exact token budgets of the MiniLM tokenizer, so nothing is
+truncated when Step 5 embeds them. The tokenizer is read from local files only
+(no network):
+
+  CHUNK_TOKENIZER   path to a tokenizer.json (or a model folder holding one);
+                    default: all-MiniLM-L6-v2 in the sentence-transformers /
+                    Hugging Face caches
+
+Token offsets of a document are computed once and cached in TOKEN_INDEX_DIR,
+keyed by the SHA-256 of the text and of tokenizer.json, so re-chunking with a
+different window or overlap never re-tokenizes.
+"""
+import glob
+import hashlib
+import os
+import threading
+
+import numpy as np
+
+WORDPIECE = 'minilm_wordpiece'
+MODEL_NAME = 'all-MiniLM-L6-v2'
+MODEL_MAX_TOKENS = 256   # max_seq_length of all-MiniLM-L6-v2, [CLS] and [SEP] included
+TOKEN_INDEX_DIR = os.path.join(os.path.dirname(__file__), 'Token-Index')
+
+_tokenizer = None
+_tokenizer_key = None
+_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0}
+
+
+def _candidate_paths():
+	env = os.environ.get('CHUNK_TOKENIZER')
+	if env:
+		return [os.path.join(env, 'tokenizer.json') if os.path.isdir(env) else env]
+	home = os.path.expanduser('~')
+	st_home = os.environ.get('SENTENCE_TRANSFORMERS_HOME', os.path.join(home, '.cache', 'torch', 'sentence_transformers'))
+	hf_hub = os.environ.get('HF_HUB_CACHE') or os.path.join(
+		os.environ.get('HF_HOME', os.path.join(home, '.cache', 'huggingface')), 'hub')
+	paths = [os.path.join(st_home, f'sentence-transformers_{MODEL_NAME}', 'tokenizer.json')]
+	for cache in (st_home, hf_hub):
+		paths += sorted(glob.glob(os.path.join(cache, f'models--sentence-transformers--{MODEL_NAME}',
+											   'snapshots', '*', 'tokenizer.json')))
+	return paths
+
+
+def get_tokenizer():
+	"""(Tokenizer, fingerprint) for the local MiniLM tokenizer.json, loaded once per process."""
+	global _tokenizer, _tokenizer_key
+	with _lock:
+		if _tokenizer is None:
+			path = next((p for p in _candidate_paths() if os.path.isfile(p)), None)
+			if path is None:
+				raise RuntimeError(f"No local tokenizer.json for {MODEL_NAME}; set CHUNK_TOKENIZER or run Step 5 "
+								   "with the MiniLM encoder once to download it")
+			try:
+				from tokenizers import Tokenizer
+			except ImportError:
+				raise RuntimeError("minilm_wordpiece chunking requires tokenizers (installed with sentence-transformers)")
+			with open(path, 'rb') as f:
+				_tokenizer_key = hashlib.sha256(f.read()).hexdigest()[:16]
+			tok = Tokenizer.from_file(path)
+			tok.no_truncation()
+			tok.no_padding()
+			_tokenizer = tok
+	return _tokenizer, _tokenizer_key
+
+
+def max_window():
+	"""Wordpieces that fit in one MiniLM input next to the special tokens."""
+	tok, _ = get_tokenizer()
+	specials = tok.post_processor.num_special_tokens_to_add(False) if tok.post_processor else 0
+	return MODEL_MAX_TOKENS - specials
+
+
+def _build_index(text):
+	tok, _ = get_tokenizer()
+	enc = tok.encode(text, add_special_tokens=False)
+	offsets = np.asarray(enc.offsets, dtype=np.int64).reshape(-1, 2)
+	word_ids = np.asarray(enc.word_ids, dtype=np.int64)
+	word_start = np.ones(len(word_ids), dtype=bool)
+	word_start[1:] = word_ids[1:] != word_ids[:-1]
+	return offsets[:, 0].copy(), offsets[:, 1].copy(), word_start
+
+
+def token_index(text):
+	"""
+	(starts, ends, word_start) arrays for text: character span of every
+	wordpiece and whether it begins a word. Cached on disk by content hash.
+	"""
+	_, tok_key = get_tokenizer()
+	key = hashlib.sha256(text.encode('utf-8')).hexdigest()
+	path = os.path.join(TOKEN_INDEX_DIR, f'{key}-{tok_key}.npz')
+	try:
+		with np.load(path) as z:
+			index = z['starts'], z['ends'], z['word_start']
+		with _lock:
+			_stats['hits'] += 1
+		return index
+	except (FileNotFoundError, KeyError, ValueError, OSError):
+		pass
+	with _lock:
+		_stats['misses'] += 1
+	index = _build_index(text)
+	os.makedirs(TOKEN_INDEX_DIR, exist_ok=True)
+	tmp = f'{path}.{os.getpid()}.tmp'
+	with open(tmp, 'wb') as f:
+		np.savez(f, starts=index[0], ends=index[1], word_start=index[2])
+	os.replace(tmp, path)
+	return index
+
+
+def index_stats():
+	return dict(_stats)
+
+
+def wordpiece_windows(text, window_size, overlap):
+	"""
+	Yield slices of text holding at most window_size wordpieces (capped at
+	max_window()), consecutive windows sharing up to overlap of them. Windows
+	start and end on word boundaries, so re-tokenizing a chunk gives exactly
+	the tokens counted here; only a word longer than a window is split.
+	"""
+	window_size = min(window_size, max_window())
+	if window_size < 1 or overlap >= window_size:
+		raise ValueError(f"overlap ({overlap}) must be smaller than the wordpiece window ({window_size})")
+	starts, ends, word_start = token_index(text)
+	n = len(starts)
+	pos = np.arange(n)
+	# First piece of each token's word, and the next word start at or after each token
+	first = np.maximum.accumulate(np.where(word_start, pos, 0))
+	nxt = np.append(np.minimum.accumulate(np.where(word_start, pos, n)[::-1])[::-1], n)
+	i = 0
+	while i < n:
+		end = min(i + window_size, n)
+		if end < n and first[end] > i:
+			end = int(first[end])
+		yield text[starts[i]:ends[end - 1]]
+		if end == n:
+			break
+		# Next window starts on a word boundary, giving up part of the overlap if needed
+		j = min(max(end - overlap, i + 1), n)
+		i = int(nxt[j]) if j > end else min(int(nxt[j]), end)
@@ -8,6 +8,8 @@ from datetime import datetime
 
 # Import slugify from Step 4 for consistency
 from steps.step4.services_chunk import slugify
+from services.embedding_store import vectors_sha256
+from services.meta_store import META_BIN, META_JSON, read_meta, write_meta
 
 def list_chunk_docs(input_dir):
     docs = []
@@ -27,6 +29,9 @@ def list_chunk_docs(input_dir):
             docs.append({'doc_id': doc_id, 'path': path, 'filename': fname, 'mtime': mtime, 'n_chunks': n_chunks})
     return docs
 
+def text_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
 def load_chunks_for_docs(docs):
     texts = []
     meta_rows = []
@@ -46,14 +51,15 @@ def load_chunks_for_docs(docs):
                     'method': rec.get('method'),
                     'params': rec.get('params'),
                     'source_hash': source_hash,
+                    'text_hash': text_hash(rec['text']),
                     'text': rec.get('text'),
                 }
                 meta_rows.append(meta)
     return texts, meta_rows
 
 def embed_minilm(texts):
-    from sentence_transformers import SentenceTransformer
-    model = SentenceTransformer('all-MiniLM-L6-v2')
+    from services.encoder_registry import get_encoder
+    model = get_encoder('all-MiniLM-L6-v2')
     vectors = model.encode(texts, convert_to_numpy=True, show_progress_bar=True)
     return np.array(vectors, dtype=np.float32)
 
@@ -75,6 +81,108 @@ def embed_openai(texts):
             vectors.append(item['embedding'])
     return np.array(vectors, dtype=np.float32)
 
+# --- Per-chunk embedding cache ---
+# embed_cache.npy holds one vector per distinct chunk text; embed_cache.json maps
+# sha256(text) -> row for the model that produced them. Rebuilds only encode
+# chunks whose text hash is not in the cache, and rewrite it with the hashes of
+# that build only, so edited or removed chunks do not accumulate.
+CACHE_VECTORS = 'embed_cache.npy'
+CACHE_INDEX = 'embed_cache.json'
+
+def _atomic_save_npy(path, arr):
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        np.save(f, arr)
+    os.replace(tmp, path)
+
+def _atomic_save_json(path, obj):
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(obj, f)
+    os.replace(tmp, path)
+
+def load_embed_cache(out_dir, model_name):
+    """
+    Return (hash -> row, vectors) for model_name. Falls back to seeding the cache
+    from existing flat artifacts (vectors.npy + meta) built with the same model.
+    """
+    index_path = os.path.join(out_dir, CACHE_INDEX)
+    vectors_path = os.path.join(out_dir, CACHE_VECTORS)
+    try:
+        with open(index_path, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        if index.get('model') == model_name:
+            vectors = np.load(vectors_path)
+            if vectors.shape[0] == len(index['hashes']):
+                return {h: i for i, h in enumerate(index['hashes'])}, vectors
+    except (OSError, ValueError, KeyError):
+        pass
+    try:
+        with open(os.path.join(out_dir, 'config.json'), 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        if config.get('model') != model_name:
+            return {}, None
+        meta_rows = read_meta(out_dir)
+        vectors = np.load(os.path.join(out_dir, 'vectors.npy'))
+    except (OSError, ValueError):
+        return {}, None
+    if vectors.ndim != 2 or vectors.shape[0] != len(meta_rows):
+        return {}, None
+    rows = {}
+    for i, meta in enumerate(meta_rows):
+        h = meta.get('text_hash') or (text_hash(meta['text']) if meta.get('text') is not None else None)
+        if h:
+            rows.setdefault(h, i)
+    return rows, vectors
+
+def embed_with_cache(out_dir, texts, model_name, embed_fn, prune=True):
+    """
+    Embed texts, re-using cached vectors for unchanged chunk texts.
+    Only new/changed texts are passed to embed_fn (once per distinct text).
+    With prune (full builds) the cache keeps only these texts; without it
+    (adding documents to an existing DB) new vectors are appended.
+    Returns (vectors, {'cached': n, 'encoded': m}).
+    """
+    hashes = [text_hash(t) for t in texts]
+    rows, cached = load_embed_cache(out_dir, model_name)
+    missing = {}
+    for h, t in zip(hashes, texts):
+        if h not in rows and h not in missing:
+            missing[h] = t
+    new_vectors = np.asarray(embed_fn(list(missing.values())), dtype=np.float32) if missing else None
+    if new_vectors is not None and cached is not None and cached.shape[1] != new_vectors.shape[1]:
+        # Stale cache with another dimension: encode everything afresh
+        rows, cached = {}, None
+        missing = dict(zip(hashes, texts))
+        new_vectors = np.asarray(embed_fn(list(missing.values())), dtype=np.float32)
+    parts = [p for p in (cached, new_vectors) if p is not None]
+    if not parts:
+        return np.zeros((0, 0), dtype=np.float32), {'cached': 0, 'encoded': 0}
+    pool = np.concatenate(parts).astype(np.float32, copy=False)
+    offset = cached.shape[0] if cached is not None else 0
+    for j, h in enumerate(missing):
+        rows[h] = offset + j
+    vectors = pool[[rows[h] for h in hashes]]
+    # Persist the cache, one row per distinct hash
+    os.makedirs(out_dir, exist_ok=True)
+    ordered = list(dict.fromkeys(hashes)) if prune else sorted(rows, key=rows.get)
+    _atomic_save_npy(os.path.join(out_dir, CACHE_VECTORS), pool[[rows[h] for h in ordered]])
+    _atomic_save_json(os.path.join(out_dir, CACHE_INDEX), {'model': model_name, 'hashes': ordered})
+    return vectors, {'cached': len(hashes) - sum(1 for h in hashes if h in missing), 'encoded': len(missing)}
+
+def _source_hashes(chunk_docs):
+    source_hashes = []
+    for doc in chunk_docs or []:
+        with open(doc['path'], 'rb') as fbin:
+            file_bytes = fbin.read()
+            source_hash = hashlib.sha256(file_bytes).hexdigest()
+        source_hashes.append({
+            'doc_id': doc['doc_id'],
+            'source_file': doc['filename'],
+            'source_hash': source_hash
+        })
+    return source_hashes
+
 def save_artifacts(out_dir, vectors, meta_rows, config_dict, chunk_docs=None):
     os.makedirs(out_dir, exist_ok=True)
     # Ensure float32
@@ -88,53 +196,117 @@ def save_artifacts(out_dir, vectors, meta_rows, config_dict, chunk_docs=None):
         meta['vector_index'] = i
         if meta.get('vector_index', i) != i:
             meta['vector_index'] = i
-    # Save vectors
-    np.save(os.path.join(out_dir, 'vectors.npy'), vectors)
-    # Save meta
-    with open(os.path.join(out_dir, 'meta.json'), 'w', encoding='utf-8') as f:
-        json.dump(meta_rows, f, indent=2, ensure_ascii=False)
+    # Save vectors (replace, never truncate: readers may have vectors.npy memory-mapped)
+    _atomic_save_npy(os.path.join(out_dir, 'vectors.npy'), vectors)
+    # Save meta as columnar meta.bin (memory-mapped by readers, see services/meta_store)
+    write_meta(os.path.join(out_dir, META_BIN), meta_rows)
+    if os.path.exists(os.path.join(out_dir, META_JSON)):
+        os.remove(os.path.join(out_dir, META_JSON))
     # Prepare source_hashes for config
-    source_hashes = []
-    if chunk_docs:
-        for doc in chunk_docs:
-            with open(doc['path'], 'rb') as fbin:
-                file_bytes = fbin.read()
-                source_hash = hashlib.sha256(file_bytes).hexdigest()
-            source_hashes.append({
-                'doc_id': doc['doc_id'],
-                'source_file': doc['filename'],
-                'source_hash': source_hash
-            })
+    source_hashes = _source_hashes(chunk_docs)
     # Save config
     config_dict = dict(config_dict)
     config_dict['source_hashes'] = source_hashes
     with open(os.path.join(out_dir, 'config.json'), 'w', encoding='utf-8') as f:
         json.dump(config_dict, f, indent=2, ensure_ascii=False)
+    # A full rebuild supersedes any segments (flat files are read once manifest.json is gone)
+    from services.segment_store import drop_segments
+    drop_segments(out_dir)
     # Save stats
     stats = {'n_chunks': n_chunks, 'dim': dim}
     with open(os.path.join(out_dir, 'stats.json'), 'w', encoding='utf-8') as f:
         json.dump(stats, f, indent=2)
     # Optional: FAISS
     faiss_status = False
+    index_path = os.path.join(out_dir, 'faiss.index')
     try:
         import faiss
         # L2-normalize vectors
         if n_chunks > 0 and dim > 0:
-            vecs_norm = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+            vecs_norm = vectors / (np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-9)
             index = faiss.IndexFlatIP(dim)
             index.add(vecs_norm)
-            faiss.write_index(index, os.path.join(out_dir, 'faiss.index'))
+            faiss.write_index(index, index_path + '.tmp')
+            os.replace(index_path + '.tmp', index_path)
             faiss_status = True
     except ImportError:
         faiss_status = False
+    if not faiss_status and os.path.exists(index_path):
+        # An index from an earlier build would describe other vectors
+        os.remove(index_path)
     # Record faiss status in config
     config_dict['faiss'] = faiss_status
+    config_dict.pop('faiss_vectors_sha256', None)
     if faiss_status:
         config_dict['metric'] = 'cosine (IP on L2-normalized vectors)'
+        config_dict['faiss_vectors_sha256'] = vectors_sha256(vectors)
     with open(os.path.join(out_dir, 'config.json'), 'w', encoding='utf-8') as f:
         json.dump(config_dict, f, indent=2, ensure_ascii=False)
     return faiss_status
 
+# --- In-place updates (segment layout, see services/segment_store) ---
+def _read_json(path, default):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+def _write_segment_summary(out_dir, config):
+    from services.segment_store import segment_stats, read_manifest
+    seg = segment_stats(out_dir)
+    manifest = read_manifest(out_dir) or {}
+    config['layout'] = 'segments'
+    config['faiss'] = False  # the index is built in memory per generation
+    config['metric'] = 'cosine (IP on L2-normalized vectors)'
+    with open(os.path.join(out_dir, 'config.json'), 'w', encoding='utf-8') as f:
+        json.dump(config, f, indent=2, ensure_ascii=False)
+    stats = _read_json(os.path.join(out_dir, 'stats.json'), {})
+    stats.update({'n_chunks': seg['live_rows'], 'dim': manifest.get('dim') or stats.get('dim', 0),
+                  'segments': seg['segments'], 'tombstoned_rows': seg['tombstoned_rows']})
+    with open(os.path.join(out_dir, 'stats.json'), 'w', encoding='utf-8') as f:
+        json.dump(stats, f, indent=2)
+    return stats
+
+def add_docs_to_db(out_dir, vectors, meta_rows, config_dict, chunk_docs):
+    """Add (or replace) documents as a new segment without rewriting existing data."""
+    from services.segment_store import add_documents
+    os.makedirs(out_dir, exist_ok=True)
+    summary = add_documents(out_dir, vectors, meta_rows, model=config_dict.get('model'))
+    config = _read_json(os.path.join(out_dir, 'config.json'), {})
+    added = {h['doc_id']: h for h in _source_hashes(chunk_docs)}
+    kept = [h for h in config.get('source_hashes', []) if h['doc_id'] not in added]
+    config.update(config_dict)
+    config['source_hashes'] = kept + list(added.values())
+    summary['stats'] = _write_segment_summary(out_dir, config)
+    return summary
+
+def remove_docs_from_db(out_dir, doc_ids):
+    """Tombstone documents; their rows disappear from the next reader snapshot."""
+    from services.segment_store import remove_documents
+    summary = remove_documents(out_dir, doc_ids)
+    config = _read_json(os.path.join(out_dir, 'config.json'), {})
+    config['source_hashes'] = [h for h in config.get('source_hashes', []) if h['doc_id'] not in set(doc_ids)]
+    summary['stats'] = _write_segment_summary(out_dir, config)
+    return summary
+
+def compact_db(out_dir):
+    from services.segment_store import compact
+    summary = compact(out_dir)
+    if summary['rows'] is not None:
+        summary['stats'] = _write_segment_summary(out_dir, _read_json(os.path.join(out_dir, 'config.json'), {}))
+    return summary
+
+def load_db_meta(out_dir):
+    """meta rows of a DB folder in either layout ([] if none)."""
+    from services.segment_store import is_segmented, load_snapshot
+    if is_segmented(out_dir):
+        return load_snapshot(out_dir)[1]
+    try:
+        return read_meta(out_dir)
+    except (OSError, ValueError):
+        return []
+
 def delete_db_folder(out_dir):
     if os.path.exists(out_dir):
         shutil.rmtree(out_dir)
@@ -1,11 +1,13 @@
 import os
 import json
 import shutil
+import hashlib
 import time
 from flask import Blueprint, render_template, request, redirect, url_for, flash
 from .services_embed import (
     list_chunk_docs, load_chunks_for_docs, embed_minilm, embed_openai,
-    save_artifacts, delete_db_folder
+    save_artifacts, delete_db_folder, embed_with_cache,
+    add_docs_to_db, remove_docs_from_db, compact_db, load_db_meta
 )
 
 step5_bp = Blueprint('step5_bp', __name__, url_prefix='/steps/5')
@@ -53,17 +55,14 @@ def step5_page():
     stats = None
     staleness_warning = False
     embed_subdir = get_embed_subdir(chunk_source, embed_method)
-    meta_path = os.path.join(embed_subdir, 'meta.json')
     config_path = os.path.join(embed_subdir, 'config.json')
     stats_path = os.path.join(embed_subdir, 'stats.json')
     # Load meta/config/stats
-    if os.path.exists(meta_path):
-        try:
-            with open(meta_path, 'r', encoding='utf-8') as f:
-                meta_rows = json.load(f)
-            preview = meta_rows[:3]
-        except Exception:
-            preview = None
+    try:
+        meta_rows = load_db_meta(embed_subdir)
+        preview = meta_rows[:3] if meta_rows else None
+    except Exception:
+        preview = None
     if os.path.exists(config_path):
         with open(config_path, 'r', encoding='utf-8') as f:
             config = json.load(f)
@@ -86,7 +85,7 @@ def step5_page():
                 except Exception:
                     continue
     if staleness_warning:
-        flash('This embedding DB is out of date with Step-4 chunks. Please Delete DB and re-embed.', 'warning')
+        flash('This embedding DB is out of date with Step-4 chunks. Add/Update the changed documents, or Delete DB and re-embed.', 'warning')
         # Log staleness
         log_entry = {
             'ts': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
@@ -127,16 +126,17 @@ def embed_route():
     t0 = time.time()
     try:
         if embed_method == 'minilm':
-            vectors = embed_minilm(texts)
-            model_name = EMBED_METHODS['minilm']['model']
+            embed_fn = embed_minilm
         elif embed_method == 'openai':
             if not EMBED_METHODS['openai']['enabled']:
                 raise RuntimeError('OpenAI embedding is not enabled (missing API key).')
-            vectors = embed_openai(texts)
-            model_name = EMBED_METHODS['openai']['model']
+            embed_fn = embed_openai
         else:
             raise RuntimeError(f'Unknown embedding method: {embed_method}')
+        model_name = EMBED_METHODS[embed_method]['model']
         out_dir = get_embed_subdir(chunk_source, embed_method)
+        # Only chunks whose text hash is not cached for this model are encoded
+        vectors, cache_stats = embed_with_cache(out_dir, texts, model_name, embed_fn)
         config_dict = {
             'chunk_source': chunk_source,
             'embed_method': embed_method,
@@ -145,7 +145,8 @@ def embed_route():
         }
         faiss_status = save_artifacts(out_dir, vectors, meta_rows, config_dict, chunk_docs=selected_docs)
         ms_elapsed = int((time.time() - t0) * 1000)
-        stats = {'n_chunks': len(texts), 'dim': vectors.shape[1], 'build_ms': ms_elapsed}
+        stats = {'n_chunks': len(texts), 'dim': vectors.shape[1], 'build_ms': ms_elapsed,
+                 'cached': cache_stats['cached'], 'encoded': cache_stats['encoded']}
         with open(os.path.join(out_dir, 'stats.json'), 'w', encoding='utf-8') as f:
             json.dump(stats, f)
         log_entry = {
@@ -155,12 +156,14 @@ def embed_route():
             'n_chunks': len(texts),
             'dim': vectors.shape[1],
             'ms_elapsed': ms_elapsed,
+            'cached': cache_stats['cached'],
+            'encoded': cache_stats['encoded'],
             'faiss': faiss_status,
             'status': 'ok'
         }
         with open(LOG_PATH, 'a', encoding='utf-8') as f:
             f.write(json.dumps(log_entry) + '\n')
-        flash(f'Embedded {len(texts)} chunks with {embed_method}.', 'success')
+        flash(f"Embedded {len(texts)} chunks with {embed_method} ({cache_stats['encoded']} encoded, {cache_stats['cached']} from cache).", 'success')
     except Exception as e:
         log_entry = {
             'ts': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
@@ -190,3 +193,84 @@ def delete_db_route():
     except Exception as e:
         flash(f'Error deleting DB: {e}', 'danger')
     return redirect(url_for('step5_bp.step5_page', chunk_source=chunk_source, embed_method=embed_method))
+
+def _log(entry):
+    entry = dict({'ts': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())}, **entry)
+    with open(LOG_PATH, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(entry) + '\n')
+
+def _selected_doc_ids():
+    return [d for d in request.form.get('selected_doc_ids', '').split(',') if d]
+
+@step5_bp.route('/add_docs', methods=['POST'])
+def add_docs_route():
+    """Embed the selected documents into a new segment; existing rows are not rewritten."""
+    chunk_source = request.form.get('chunk_source', 'headings')
+    embed_method = request.form.get('embed_method', 'minilm')
+    doc_ids = _selected_doc_ids()
+    if not doc_ids:
+        flash('No documents selected to add.', 'warning')
+        return redirect(url_for('step5_bp.step5_page', chunk_source=chunk_source, embed_method=embed_method))
+    docs = [d for d in list_chunk_docs(CHUNK_DIRS.get(chunk_source, CHUNK_DIRS['headings'])) if d['doc_id'] in doc_ids]
+    texts, meta_rows = load_chunks_for_docs(docs)
+    t0 = time.time()
+    try:
+        if embed_method not in EMBED_METHODS or not EMBED_METHODS[embed_method]['enabled']:
+            raise RuntimeError(f'Embedding method not available: {embed_method}')
+        embed_fn = embed_minilm if embed_method == 'minilm' else embed_openai
+        model_name = EMBED_METHODS[embed_method]['model']
+        out_dir = get_embed_subdir(chunk_source, embed_method)
+        # Other documents stay in the DB, so their cached vectors are kept
+        vectors, cache_stats = embed_with_cache(out_dir, texts, model_name, embed_fn, prune=False)
+        summary = add_docs_to_db(out_dir, vectors, meta_rows, {
+            'chunk_source': chunk_source,
+            'embed_method': embed_method,
+            'model': model_name,
+            'updated_iso': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        }, docs)
+        _log({'chunk_source': chunk_source, 'embed_method': embed_method, 'op': 'add', 'doc_ids': doc_ids,
+              'n_chunks': len(texts), 'replaced': summary['replaced'], 'encoded': cache_stats['encoded'],
+              'compacted': summary['compacted'], 'ms_elapsed': int((time.time() - t0) * 1000), 'status': 'ok'})
+        flash(f"Added {summary['added']} chunks from {len(docs)} document(s) "
+              f"({summary['replaced']} old rows replaced).", 'success')
+    except Exception as e:
+        _log({'chunk_source': chunk_source, 'embed_method': embed_method, 'op': 'add', 'doc_ids': doc_ids,
+              'status': 'error', 'error': str(e)})
+        flash(f'Error adding documents: {e}', 'danger')
+    return redirect(url_for('step5_bp.step5_page', chunk_source=chunk_source, embed_method=embed_method))
+
+@step5_bp.route('/remove_docs', methods=['POST'])
+def remove_docs_route():
+    """Tombstone the selected documents; vectors are dropped at the next compaction."""
+    chunk_source = request.form.get('chunk_source', 'headings')
+    embed_method = request.form.get('embed_method', 'minilm')
+    doc_ids = _selected_doc_ids()
+    out_dir = get_embed_subdir(chunk_source, embed_method)
+    if not doc_ids:
+        flash('No documents selected to remove.', 'warning')
+    else:
+        try:
+            summary = remove_docs_from_db(out_dir, doc_ids)
+            _log({'chunk_source': chunk_source, 'embed_method': embed_method, 'op': 'remove', 'doc_ids': doc_ids,
+                  'removed': summary['removed'], 'compacted': summary['compacted'], 'status': 'ok'})
+            flash(f"Removed {summary['removed']} chunks of {len(doc_ids)} document(s).", 'success')
+        except Exception as e:
+            flash(f'Error removing documents: {e}', 'danger')
+    return redirect(url_for('step5_bp.step5_page', chunk_source=chunk_source, embed_method=embed_method))
+
+@step5_bp.route('/compact', methods=['POST'])
+def compact_route():
+    chunk_source = request.form.get('chunk_source', 'headings')
+    embed_method = request.form.get('embed_method', 'minilm')
+    out_dir = get_embed_subdir(chunk_source, embed_method)
+    try:
+        summary = compact_db(out_dir)
+        if summary['rows'] is None:
+            flash('Nothing to compact: this DB has no segments.', 'info')
+        else:
+            _log({'chunk_source': chunk_source, 'embed_method': embed_method, 'op': 'compact',
+                  'segments_merged': summary['segments_merged'], 'rows': summary['rows'], 'status': 'ok'})
+            flash(f"Compacted {summary['segments_merged']} segment(s) into one ({summary['rows']} rows).", 'success')
+    except Exception as e:
+        flash(f'Error compacting DB: {e}', 'danger')
+    return redirect(url_for('step5_bp.step5_page', chunk_source=chunk_source, embed_method=embed_method))
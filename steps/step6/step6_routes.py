@@ -6,6 +6,9 @@ import io
 import csv
 from flask import Blueprint, render_template, request, redirect, url_for, flash, send_file, Response
 from werkzeug.utils import secure_filename
+from services.encoder_registry import encode_query
+from services.embedding_store import get_store
+from services.segment_store import db_ready
 
 step6_bp = Blueprint('step6_bp', __name__, url_prefix='/steps/6')
 
@@ -21,16 +24,13 @@ def download_csv():
     db_info = selected_db_obj
     if not db_info:
         return Response('Selected embedding DB not found.', status=404)
-    vectors_path = os.path.join(db_info['path'], 'vectors.npy')
-    meta_path = os.path.join(db_info['path'], 'meta.json')
     config_path = os.path.join(db_info['path'], 'config.json')
-    if not (os.path.exists(vectors_path) and os.path.exists(meta_path) and os.path.exists(config_path)):
+    if not (db_ready(db_info['path']) and os.path.exists(config_path)):
         return Response('Embedding DB is missing required files.', status=404)
-    vectors = np.load(vectors_path).astype(np.float32)
-    with open(meta_path, 'r') as f:
-        meta_rows = json.load(f)
-    with open(config_path, 'r') as f:
-        config = json.load(f)
+    store = get_store(db_info['path'])
+    vectors = store.vectors
+    meta_rows = store.meta
+    config = store.config
     dim = vectors.shape[1]
     n_chunks = vectors.shape[0]
     if topk > n_chunks:
@@ -38,28 +38,13 @@ def download_csv():
     # Embed query
     method = config.get('embed_method', 'minilm')
     if method == 'minilm':
-        from sentence_transformers import SentenceTransformer
-        model = SentenceTransformer('all-MiniLM-L6-v2')
-        q_vec = model.encode([query], convert_to_numpy=True)[0].astype(np.float32)
+        q_vec = encode_query(query, config.get('model', 'all-MiniLM-L6-v2'))
     else:
         return Response('Unknown embedding method.', status=400)
-    vecs_norm = vectors / (np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-9)
-    q_norm = q_vec / (np.linalg.norm(q_vec) + 1e-9)
-    try:
-        import faiss
-        if db_key not in faiss_indexes:
-            index = faiss.IndexFlatIP(dim)
-            index.add(vecs_norm)
-            faiss_indexes[db_key] = index
-        index = faiss_indexes[db_key]
-        D, I = index.search(np.expand_dims(q_norm, axis=0), topk)
-        scores = D[0]
-        indices = I[0]
-    except ImportError:
-        scores = np.dot(vecs_norm, q_norm)
-        indices = np.argpartition(scores, -topk)[-topk:]
-        indices = indices[np.argsort(scores[indices])[::-1]]
-        scores = scores[indices]
+    # Cached per-generation index (persisted faiss.index or pre-normalized matrix)
+    D, I = store.search(q_vec, topk)
+    scores = D[0]
+    indices = I[0]
     # Prepare CSV
     output = io.StringIO()
     writer = csv.writer(output)
@@ -118,9 +103,6 @@ def scan_embedding_dbs():
                 })
     return dbs
 
-# Global FAISS cache
-faiss_indexes = {}
-
 @step6_bp.route('', methods=['GET'])
 def step6_page():
     dbs = scan_embedding_dbs()
@@ -166,22 +148,19 @@ def search_route():
         flash('Selected embedding DB not found. Please choose another.', 'danger')
         return redirect(url_for('step6_bp.step6_page'))
     # Check required files
-    vectors_path = os.path.join(db_info['path'], 'vectors.npy')
-    meta_path = os.path.join(db_info['path'], 'meta.json')
     config_path = os.path.join(db_info['path'], 'config.json')
-    if not (os.path.exists(vectors_path) and os.path.exists(meta_path) and os.path.exists(config_path)):
+    if not (db_ready(db_info['path']) and os.path.exists(config_path)):
         flash('Embedding DB is missing required files. Please return to Step 5 and run Embed.', 'danger')
         return redirect(url_for('step6_bp.step6_page'))
     if not query:
         flash('Please enter a query to search.', 'warning')
         return redirect(url_for('step6_bp.step6_page'))
-    # Load vectors and meta
+    # Load vectors and meta (resident, memory-mapped store)
     t0 = time.time()
-    vectors = np.load(vectors_path).astype(np.float32)
-    with open(meta_path, 'r') as f:
-        meta_rows = json.load(f)
-    with open(config_path, 'r') as f:
-        config = json.load(f)
+    store = get_store(db_info['path'])
+    vectors = store.vectors
+    meta_rows = store.meta
+    config = store.config
     dim = vectors.shape[1]
     # Clamp topk to available chunks
     n_chunks = vectors.shape[0]
@@ -191,37 +170,18 @@ def search_route():
     method = config.get('embed_method', 'minilm')
     if method == 'minilm':
         try:
-            from sentence_transformers import SentenceTransformer
+            q_vec = encode_query(query, config.get('model', 'all-MiniLM-L6-v2'))
         except ImportError:
             flash('MiniLM embedding requires sentence-transformers. Please install: pip install sentence-transformers', 'danger')
             return redirect(url_for('step6_bp.step6_page'))
-        model = SentenceTransformer('all-MiniLM-L6-v2')
-        q_vec = model.encode([query], convert_to_numpy=True)[0].astype(np.float32)
     else:
         flash(f'Unknown embedding method: {method}', 'danger')
         return redirect(url_for('step6_bp.step6_page'))
-    # Normalize vectors
-    vecs_norm = vectors / (np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-9)
-    q_norm = q_vec / (np.linalg.norm(q_vec) + 1e-9)
-    # Try FAISS
-    faiss_used = False
-    try:
-        import faiss
-        if db_key not in faiss_indexes:
-            index = faiss.IndexFlatIP(dim)
-            index.add(vecs_norm)
-            faiss_indexes[db_key] = index
-        index = faiss_indexes[db_key]
-        D, I = index.search(np.expand_dims(q_norm, axis=0), topk)
-        scores = D[0]
-        indices = I[0]
-        faiss_used = True
-    except ImportError:
-        # NumPy fallback
-        scores = np.dot(vecs_norm, q_norm)
-        indices = np.argpartition(scores, -topk)[-topk:]
-        indices = indices[np.argsort(scores[indices])[::-1]]
-        scores = scores[indices]
+    # Search the cached per-generation index (FAISS if installed, else NumPy)
+    faiss_used = store.get_index() is not None
+    D, I = store.search(q_vec, topk)
+    scores = D[0]
+    indices = I[0]
     # Gather results
     for rank, (idx, score) in enumerate(zip(indices, scores), 1):
         meta = meta_rows[idx]
@@ -0,0 +1,118 @@
+"""
+Async JSON handler for POST /steps/7/ask, served by asgi.py.
+
+Mirrors the JSON branch of step7_routes.ask_route, but the provider call is
+awaited on the event loop (pooled httpx.AsyncClient) and the CPU-bound work
+(store refresh, query embedding, FAISS/NumPy search) runs on a bounded
+thread pool, so one process can hold many in-flight LLM calls.
+
+Environment:
+  RAG_ASYNC_THREADS  threads for retrieval work (default 8)
+"""
+import asyncio
+import json
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .services_rag import (load_store, embed_query, retrieve_chunks, build_prompt, validate_answer,
+                           embeddings_ready, call_provider_async, call_provider_hedged_async, cacheable_result, cached_result,
+                           ask_params)
+from .services_rag_exceptions import EmbeddingsMissing
+from services.answer_cache import get_answer_cache
+
+retrieval_executor = ThreadPoolExecutor(max_workers=int(os.getenv("RAG_ASYNC_THREADS", 8)),
+                                        thread_name_prefix="rag-retrieval")
+
+LOG_PATH = os.path.join(os.path.dirname(__file__), 'logs', 'ask.jsonl')
+
+
+def _retrieve(method, question, topk, min_score):
+    store = load_store(method)
+    q_vec = embed_query(question, {})
+    context_chunks, _ = retrieve_chunks(q_vec, store.vectors, store.meta, topk, min_score, store=store)
+    return store, q_vec, context_chunks
+
+
+def _append_log(entry):
+    with open(LOG_PATH, 'a') as f:
+        f.write(json.dumps(entry) + '\n')
+
+
+async def ask_json(data):
+    """Handle a /steps/7/ask request body (form or JSON dict). Returns (status, payload)."""
+    loop = asyncio.get_running_loop()
+    params = ask_params(data)
+    method = params['method']
+    hint = f"Missing vectors/meta under steps/step5/Embeddings/{method}__minilm/"
+    if not embeddings_ready(method):
+        return 503, {"ok": False,
+                     "error": "Embeddings not found on server. Please rebuild on deploy or via admin endpoint.",
+                     "hint": hint}
+    topk, min_score, answer_len = params['topk'], params['min_score'], params['answer_len']
+    provider, question = params['provider'], params['question']
+    if not question:
+        return 400, {"ok": False, "error": "Please enter a question."}
+    if params['provider_error']:
+        return 400, {"ok": False, "error": params['provider_error']}
+    try:
+        store, q_vec, context_chunks = await loop.run_in_executor(
+            retrieval_executor, _retrieve, method, question, topk, min_score)
+    except EmbeddingsMissing as e:
+        return 503, {"ok": False, "error": str(e), "hint": hint}
+    if not context_chunks:
+        return 404, {"ok": False, "error": "No evidence found with the current threshold; lower it and try again."}
+    prompt = build_prompt(context_chunks, question, answer_len)
+    used_ids = [[c['doc_id'], c['chunk_id']] for c in context_chunks]
+    answer_cache = get_answer_cache()
+    cache_args = (f'step7:{method}', question, used_ids, provider, answer_len, store.generation)
+    t0 = time.time()
+    result, cache_tier = answer_cache.get(*cache_args, q_vec=q_vec)
+    if result is not None:
+        result = cached_result(result, provider)
+    hedge_provider = params['hedge_provider']
+    if result is None:
+        if hedge_provider and hedge_provider != provider:
+            result = await call_provider_hedged_async(provider, prompt, answer_len, hedge_provider)
+        else:
+            result = dict(await call_provider_async(provider, prompt, answer_len), provider=provider, hedged=False)
+        if result.get('ok'):
+            answer_cache.put(*cache_args, cacheable_result(result), q_vec=q_vec)
+    latency = time.time() - t0
+    answer = result.get('answer') if result.get('ok') else None
+    citations = re.findall(r'([\w\-]+#[0-9]+)', answer) if answer else []
+    error = result.get('error') if not result.get('ok') else None
+    val_msg = validate_answer(answer, citations)
+    await loop.run_in_executor(retrieval_executor, _append_log, {
+        'timestamp': time.time(),
+        'question': question,
+        'provider': provider,
+        'method': method,
+        'topk': topk,
+        'min_score': min_score,
+        'answer_len': answer_len,
+        'latency': latency,
+        'citations': citations,
+        'used_ids': used_ids,
+        'status': 'ok' if not val_msg else 'no_citations',
+        'error': error,
+        'cache': cache_tier,
+        'hedged': bool(result.get('hedged')),
+        'provider_won': result.get('provider') if result.get('ok') else None,
+        'async': True
+    })
+    if latency > 25:
+        return 503, {"ok": False,
+                     "error": "Request exceeded 25s limit. Provider or server too slow. Limits are enforced on Render.",
+                     "elapsed_ms": int(latency * 1000)}
+    if not result.get('ok'):
+        return 502, {"ok": False, "error": error, "elapsed_ms": int(latency * 1000)}
+    return 200, {
+        "ok": True,
+        "answer": answer,
+        "citations": citations,
+        "elapsed_ms": int(latency * 1000),
+        "cached": cache_tier,
+        "provider": result.get('provider')
+    }
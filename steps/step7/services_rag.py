@@ -1,6 +1,7 @@
 from pathlib import Path
-import os, json, numpy as np
-import requests
+import os, json, re, threading, time, numpy as np
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
 # Portable project root and embeddings dir helpers
 def _project_root() -> Path:
@@ -16,25 +17,62 @@ def validate_answer(answer: str, citations: list) -> str:
     if not citations:
         return "No citations found in answer."
     return ""
+
+def ask_params(data):
+    """
+    Inputs of a /steps/7/ask request from a form or JSON dict, shared by the
+    Flask routes and the ASGI handler. min_score is None unless a number in
+    [-1, 1]; topk falls back to 5 and is at least 1. provider_error says why
+    the provider cannot be called (callers answer 400); a hedge provider that
+    cannot be called is dropped.
+    """
+    try:
+        topk = max(1, int(data.get('topk') or 5))
+    except (TypeError, ValueError):
+        topk = 5
+    min_score = data.get('min_score')
+    try:
+        min_score = float(min_score) if min_score not in (None, '', 'None') else None
+    except (TypeError, ValueError):
+        min_score = None
+    if min_score is not None and not -1 <= min_score <= 1:
+        min_score = None
+    provider = data.get('provider')
+    hedge_provider = data.get('hedge_provider') or os.getenv('HEDGE_PROVIDER', '')
+    return {
+        'method': data.get('method') or 'headings',
+        'question': str(data.get('question') or '').strip(),
+        'provider': provider,
+        'provider_error': provider_error(provider),
+        'hedge_provider': hedge_provider if hedge_provider and not provider_error(hedge_provider) else '',
+        'answer_len': data.get('answer_len') or 'short',
+        'topk': topk,
+        'min_score': min_score,
+    }
 _load_db_logged = False
 
 from .services_rag_exceptions import EmbeddingsMissing
+from services.embedding_store import get_store
+from services.segment_store import db_ready
 
 def embeddings_ready(method='headings'):
-    folder = _embeddings_dir() / f"{method}__minilm"
-    vectors_path = folder / "vectors.npy"
-    meta_path = folder / "meta.json"
-    return vectors_path.exists() and meta_path.exists()
+    # Flat vectors.npy/meta.json or a segmented DB (manifest.json)
+    return db_ready(_embeddings_dir() / f"{method}__minilm")
 
 def load_db(method='headings'):
     """
     Load embeddings and metadata for Step 7 RAG from Step 5 output folders.
     method: 'headings' or 'token'
+    Vectors are memory-mapped and meta is kept resident; both are only
+    re-read when the folder generation changes (see services/embedding_store).
     """
+    store = load_store(method)
+    return store.vectors, store.meta
+
+def load_store(method='headings'):
+    """Return the current StoreSnapshot for a method (raises EmbeddingsMissing)."""
     global _load_db_logged
     folder = _embeddings_dir() / f"{method}__minilm"
-    vectors_path = folder / "vectors.npy"
-    meta_path = folder / "meta.json"
     if not _load_db_logged:
         try:
             from flask import current_app
@@ -42,24 +80,42 @@ def load_db(method='headings'):
         except Exception:
             print(f"[load_db] Using embeddings folder: {folder.resolve()}")
         _load_db_logged = True
-    if not vectors_path.exists() or not meta_path.exists():
+    if not db_ready(folder):
         raise EmbeddingsMissing(method, folder.resolve())
-    vectors = np.load(str(vectors_path))
-    with open(meta_path, 'r', encoding='utf-8') as f:
-        meta = json.load(f)
-    return vectors, meta
+    # One generation check: vectors, meta and index all come from this snapshot
+    return get_store(folder)
 
 def embed_query(query, config):
     method = config.get('embed_method', 'minilm')
     if method == 'minilm':
-        from sentence_transformers import SentenceTransformer
-        model = SentenceTransformer('all-MiniLM-L6-v2')
-        return model.encode([query], convert_to_numpy=True)[0].astype(np.float32)
+        from services.encoder_registry import encode_query
+        return encode_query(query, config.get('model', 'all-MiniLM-L6-v2'))
+    raise ValueError('Unknown embedding method')
+
+def embed_queries(queries, config):
+    """Encode many questions in a single batch; returns a float32 [N, D] matrix."""
+    method = config.get('embed_method', 'minilm')
+    if method == 'minilm':
+        from services.encoder_registry import encode_queries
+        return encode_queries(queries, config.get('model', 'all-MiniLM-L6-v2'))
     raise ValueError('Unknown embedding method')
 
-def retrieve_chunks(q_vec, vectors, meta, topk, min_score=None):
+def retrieve_chunks_batch(q_mat, store, topk, min_score=None):
+    """One FAISS search (or one matrix product) for N query rows; returns N chunk lists."""
+    D, I = store.search(q_mat, topk)
+    return [_chunks_from_hits(D[i], I[i], store.meta, min_score) for i in range(len(I))]
+
+def retrieve_chunks(q_vec, vectors, meta, topk, min_score=None, store=None):
+    """
+    Top-k cosine retrieval. Pass the StoreSnapshot from load_store() to reuse its
+    cached index (persisted faiss.index or pre-normalized matrix); without it the
+    vectors are normalized and indexed on every call.
+    """
     import time
     t0 = time.time()
+    if store is not None:
+        D, I = store.search(q_vec, topk)
+        return _chunks_from_hits(D[0], I[0], store.meta, min_score), time.time() - t0
     vecs_norm = vectors / (np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-9)
     q_norm = q_vec / (np.linalg.norm(q_vec) + 1e-9)
     try:
@@ -77,8 +133,15 @@ def retrieve_chunks(q_vec, vectors, meta, topk, min_score=None):
         indices = np.argpartition(scores_raw, -topk)[-topk:]
         indices = indices[np.argsort(scores_raw[indices])[::-1]]
         scores = scores_raw[indices]
+    chunks = _chunks_from_hits(scores, indices, meta, min_score)
+    latency = time.time() - t0
+    return chunks, latency
+
+def _chunks_from_hits(scores, indices, meta, min_score=None):
     chunks = []
     for rank, (idx, score) in enumerate(zip(indices, scores), 1):
+        if idx < 0:
+            continue
         if min_score is not None and score < min_score:
             continue
         meta_row = meta[idx]
@@ -91,8 +154,7 @@ def retrieve_chunks(q_vec, vectors, meta, topk, min_score=None):
             'snippet': meta_row.get('text', '')[:200],
             'text': meta_row.get('text', '')
         })
-    latency = time.time() - t0
-    return chunks, latency
+    return chunks
 
 def build_prompt(chunks, question, answer_len):
     context = ''
@@ -114,6 +176,82 @@ USER QUESTION:
 """
     return prompt
 
+# Provider table: OpenAI-compatible chat completion endpoints.
+# "LLM_<PREFIX>_BASE_URL" env vars (e.g. LLM_GROQ_BASE_URL) override the base URL, e.g. for a local stub;
+# the prefix keeps them apart from the OPENAI_BASE_URL/GROQ_BASE_URL read by the provider SDKs.
+PROVIDERS = {
+    "openrouter_free": {
+        "label": "OpenRouter",
+        "env_key": "OPENROUTER_API_KEY",
+        "base_url_env": "LLM_OPENROUTER_BASE_URL",
+        "base_url": "https://openrouter.ai/api/v1",
+        "model": "openrouter/auto",
+        "default_model": "openrouter/auto",
+    },
+    "groq": {
+        "label": "Groq",
+        "env_key": "GROQ_API_KEY",
+        "base_url_env": "LLM_GROQ_BASE_URL",
+        "base_url": "https://api.groq.com/openai/v1",
+        "model": "llama3-8b-8192",
+        "default_model": "groq/llama3-8b-8192",
+    },
+    "openai": {
+        "label": "OpenAI",
+        "env_key": "OPENAI_API_KEY",
+        "base_url_env": "LLM_OPENAI_BASE_URL",
+        "base_url": "https://api.openai.com/v1",
+        "model": "gpt-4o-mini",
+        "default_model": "gpt-4o-mini",
+    },
+}
+
+def provider_error(provider):
+    """Why provider cannot be called (unknown, or its API key is not set), else None."""
+    spec = PROVIDERS.get(provider)
+    if spec is None:
+        return f"Unknown provider: {provider}"
+    if not os.getenv(spec["env_key"], "").strip():
+        return f"{spec['label']} not configured. Set {spec['env_key']}."
+    return None
+
+def provider_request(provider: str, prompt: str, answer_len: str):
+    """
+    Build (url, headers, body) for a provider call.
+    Returns (None, error_dict) if the provider is unknown or not configured.
+    """
+    error = provider_error(provider)
+    if error:
+        return None, {"ok": False, "error": error}
+    spec = PROVIDERS[provider]
+    api_key = os.getenv(spec["env_key"], "").strip()
+    max_words = {"short": 120, "medium": 250, "long": 400}.get(answer_len, 120)
+    base_url = (os.getenv(spec["base_url_env"], "").strip() or spec["base_url"]).rstrip("/")
+    url = f"{base_url}/chat/completions"
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json",
+    }
+    body = {
+        "model": spec["model"],
+        "messages": [
+            {"role": "system", "content": f"Be concise. Stay within {max_words} words."},
+            {"role": "user", "content": prompt},
+        ],
+        "temperature": 0.2,
+    }
+    return (url, headers, body), None
+
+def parse_provider_response(provider: str, status_code: int, text: str, data) -> dict:
+    spec = PROVIDERS[provider]
+    if status_code != 200:
+        return {"ok": False, "error": f"{spec['label']} HTTP {status_code}: {text[:200]}"}
+    answer = (data.get("choices", [{}])[0]
+                  .get("message", {})
+                  .get("content", "")) or ""
+    model = data.get("model", spec["default_model"])
+    return {"ok": True, "answer": answer, "model": model}
+
 def call_provider(provider: str, prompt: str, answer_len: str) -> dict:
     """
     Call the selected LLM provider and return:
@@ -125,102 +263,307 @@ def call_provider(provider: str, prompt: str, answer_len: str) -> dict:
       - "openrouter_free": uses OPENROUTER_API_KEY
       - "groq": uses GROQ_API_KEY
       - "openai": uses OPENAI_API_KEY
+
+    Requests go through the provider's pooled keep-alive client (services/http_pool).
     """
+    import httpx
+    from services import http_pool
     try:
+        req, err = provider_request(provider, prompt, answer_len)
+        if err:
+            return err
+        url, headers, body = req
         # Strict timeouts: connect=5s, read=15s (total=20s)
-        timeout = (5, 15)
-        max_words = {"short": 120, "medium": 250, "long": 400}.get(answer_len, 120)
-
-        if provider == "openrouter_free":
-            api_key = os.getenv("OPENROUTER_API_KEY", "").strip()
-            if not api_key:
-                return {"ok": False, "error": "OpenRouter not configured. Set OPENROUTER_API_KEY."}
-
-            url = "https://openrouter.ai/api/v1/chat/completions"
-            headers = {
-                "Authorization": f"Bearer {api_key}",
-                "Content-Type": "application/json",
-            }
-            body = {
-                "model": "openrouter/auto",
-                "messages": [
-                    {"role": "system", "content": f"Be concise. Stay within {max_words} words."},
-                    {"role": "user", "content": prompt},
-                ],
-                "temperature": 0.2,
-            }
-            resp = requests.post(url, headers=headers, json=body, timeout=timeout)
-            if resp.status_code != 200:
-                return {"ok": False, "error": f"OpenRouter HTTP {resp.status_code}: {resp.text[:200]}"}
-            data = resp.json()
-            text = (data.get("choices", [{}])[0]
-                        .get("message", {})
-                        .get("content", "")) or ""
-            model = data.get("model", "openrouter/auto")
-            return {"ok": True, "answer": text, "model": model}
-
-        elif provider == "groq":
-            api_key = os.getenv("GROQ_API_KEY", "").strip()
-            if not api_key:
-                return {"ok": False, "error": "Groq not configured. Set GROQ_API_KEY."}
-
-            url = "https://api.groq.com/openai/v1/chat/completions"
-            headers = {
-                "Authorization": f"Bearer {api_key}",
-                "Content-Type": "application/json",
-            }
-            body = {
-                "model": "llama3-8b-8192",
-                "messages": [
-                    {"role": "system", "content": f"Be concise. Stay within {max_words} words."},
-                    {"role": "user", "content": prompt},
-                ],
-                "temperature": 0.2,
-            }
-            resp = requests.post(url, headers=headers, json=body, timeout=timeout)
-            if resp.status_code != 200:
-                return {"ok": False, "error": f"Groq HTTP {resp.status_code}: {resp.text[:200]}"}
-            data = resp.json()
-            text = (data.get("choices", [{}])[0]
-                        .get("message", {})
-                        .get("content", "")) or ""
-            model = data.get("model", "groq/llama3-8b-8192")
-            return {"ok": True, "answer": text, "model": model}
-
-        elif provider == "openai":
-            api_key = os.getenv("OPENAI_API_KEY", "").strip()
-            if not api_key:
-                return {"ok": False, "error": "OpenAI not configured. Set OPENAI_API_KEY."}
-
-            url = "https://api.openai.com/v1/chat/completions"
-            headers = {
-                "Authorization": f"Bearer {api_key}",
-                "Content-Type": "application/json",
-            }
-            body = {
-                "model": "gpt-4o-mini",
-                "messages": [
-                    {"role": "system", "content": f"Be concise. Stay within {max_words} words."},
-                    {"role": "user", "content": prompt},
-                ],
-                "temperature": 0.2,
-            }
-            resp = requests.post(url, headers=headers, json=body, timeout=timeout)
-            if resp.status_code != 200:
-                return {"ok": False, "error": f"OpenAI HTTP {resp.status_code}: {resp.text[:200]}"}
-            data = resp.json()
-            text = (data.get("choices", [{}])[0]
-                        .get("message", {})
-                        .get("content", "")) or ""
-            model = data.get("model", "gpt-4o-mini")
-            return {"ok": True, "answer": text, "model": model}
-
-        else:
-            return {"ok": False, "error": f"Unknown provider: {provider}"}
-
-    except requests.Timeout:
+        timeout = httpx.Timeout(15.0, connect=5.0)
+        t0 = time.time()
+        resp = http_pool.post(provider, url, headers=headers, json=body, timeout=timeout)
+        data = resp.json() if resp.status_code == 200 else None
+        result = parse_provider_response(provider, resp.status_code, resp.text, data)
+        if result.get("ok"):
+            record_provider_latency(provider, time.time() - t0)
+        return result
+
+    except httpx.TimeoutException:
+        return {"ok": False, "error": f"{provider}: request timed out after 20s"}
+    except httpx.HTTPError as e:
+        return {"ok": False, "error": f"{provider}: network error: {str(e)[:200]}"}
+    except Exception as e:
+        return {"ok": False, "error": f"{provider}: unexpected error: {str(e)[:200]}"}
+
+
+async def call_provider_async(provider: str, prompt: str, answer_len: str) -> dict:
+    """Async twin of call_provider() for the ASGI serving path (same result shape)."""
+    import httpx
+    from services import http_pool
+    try:
+        req, err = provider_request(provider, prompt, answer_len)
+        if err:
+            return err
+        url, headers, body = req
+        timeout = httpx.Timeout(15.0, connect=5.0)
+        t0 = time.time()
+        resp = await http_pool.apost(provider, url, headers=headers, json=body, timeout=timeout)
+        data = resp.json() if resp.status_code == 200 else None
+        result = parse_provider_response(provider, resp.status_code, resp.text, data)
+        if result.get("ok"):
+            record_provider_latency(provider, time.time() - t0)
+        return result
+    except httpx.TimeoutException:
         return {"ok": False, "error": f"{provider}: request timed out after 20s"}
-    except requests.RequestException as e:
+    except httpx.HTTPError as e:
         return {"ok": False, "error": f"{provider}: network error: {str(e)[:200]}"}
     except Exception as e:
         return {"ok": False, "error": f"{provider}: unexpected error: {str(e)[:200]}"}
+
+CITATION_RE = re.compile(r'([\w\-]+#[0-9]+)')
+
+class CitationTracker:
+    """
+    Extract doc_id#chunk_id citations from a growing answer. A match touching the
+    end of the buffer may still grow, so it is only reported once more text (or
+    finish()) arrives; the final list equals CITATION_RE.findall(answer).
+    """
+    def __init__(self):
+        self.buf = ''
+        self.pos = 0
+        self.citations = []
+
+    def feed(self, text):
+        self.buf += text
+        new = []
+        for m in CITATION_RE.finditer(self.buf, self.pos):
+            if m.end() == len(self.buf):
+                break
+            new.append(m.group(1))
+            self.pos = m.end()
+        self.citations.extend(new)
+        return new
+
+    def finish(self):
+        new = CITATION_RE.findall(self.buf, self.pos)
+        self.pos = len(self.buf)
+        self.citations.extend(new)
+        return new
+
+def stream_provider(provider: str, prompt: str, answer_len: str, handle=None):
+    """
+    Stream a completion from the provider (OpenAI-compatible SSE, "stream": true).
+    Yields ("token", str) events, then exactly one ("done", result) where result
+    has the call_provider() shape: {"ok": True, "answer", "model"} or {"ok": False, "error"}.
+    handle (a _HedgeCall) is given the open response so another thread can abort it.
+    """
+    import httpx
+    from services import http_pool
+    req, err = provider_request(provider, prompt, answer_len)
+    if err:
+        yield "done", err
+        return
+    url, headers, body = req
+    body = dict(body, stream=True)
+    parts = []
+    model = PROVIDERS[provider]["default_model"]
+    try:
+        timeout = httpx.Timeout(15.0, connect=5.0)
+        with http_pool.stream(provider, url, headers=headers, json=body, timeout=timeout) as resp:
+            if handle is not None:
+                handle.attach(resp)
+            try:
+                if resp.status_code != 200:
+                    resp.read()
+                    yield "done", parse_provider_response(provider, resp.status_code, resp.text, None)
+                    return
+                for line in resp.iter_lines():
+                    if not line.startswith('data:'):
+                        continue
+                    payload = line[5:].strip()
+                    if payload == '[DONE]':
+                        break
+                    try:
+                        data = json.loads(payload)
+                    except ValueError:
+                        continue
+                    model = data.get('model') or model
+                    delta = (data.get('choices') or [{}])[0].get('delta', {}).get('content')
+                    if delta:
+                        parts.append(delta)
+                        yield "token", delta
+            finally:
+                # Before the connection goes back to the pool, where aborting it would hit another request
+                if handle is not None:
+                    handle.detach()
+        yield "done", {"ok": True, "answer": ''.join(parts), "model": model}
+    except httpx.TimeoutException:
+        yield "done", {"ok": False, "error": f"{provider}: request timed out after 20s"}
+    except httpx.HTTPError as e:
+        yield "done", {"ok": False, "error": f"{provider}: network error: {str(e)[:200]}"}
+    except Exception as e:
+        yield "done", {"ok": False, "error": f"{provider}: unexpected error: {str(e)[:200]}"}
+
+
+# --- Provider hedging ---
+# Recent successful latencies per provider; the hedge delay is their p95.
+_provider_latencies = {}
+_latency_lock = threading.Lock()
+_hedge_executor = ThreadPoolExecutor(max_workers=int(os.getenv("HEDGE_MAX_WORKERS", 16)), thread_name_prefix="hedge")
+
+def record_provider_latency(provider, seconds):
+    with _latency_lock:
+        _provider_latencies.setdefault(provider, deque(maxlen=200)).append(seconds)
+
+def provider_p95(provider, min_samples=5):
+    with _latency_lock:
+        samples = sorted(_provider_latencies.get(provider, ()))
+    if len(samples) < min_samples:
+        return None
+    return samples[min(len(samples) - 1, int(0.95 * len(samples)))]
+
+def hedge_delay(provider):
+    """Seconds to wait before hedging: p95 of recent latencies, else HEDGE_DELAY_SEC (default 3)."""
+    delay = provider_p95(provider)
+    if delay is None:
+        delay = float(os.getenv("HEDGE_DELAY_SEC", 3.0))
+    return max(float(os.getenv("HEDGE_MIN_DELAY_SEC", 0.25)), delay)
+
+class _HedgeCall:
+    """
+    Cancel flag of one hedged request plus its open response. cancel() also
+    aborts the response, so a loser blocked on a read (e.g. still waiting for
+    its first token) frees its executor thread at once instead of at the read
+    timeout.
+    """
+    def __init__(self):
+        self.cancelled = threading.Event()
+        self._response = None
+        self._lock = threading.Lock()
+
+    def _abort(self, response):
+        from services import http_pool
+        http_pool.abort_response(response)
+
+    def attach(self, response):
+        with self._lock:
+            self._response = response
+            if self.cancelled.is_set():
+                self._abort(response)
+
+    def detach(self):
+        with self._lock:
+            self._response = None
+
+    def cancel(self):
+        # Abort under the lock: detach() waits, so a connection already back in the pool is never touched
+        with self._lock:
+            self.cancelled.set()
+            if self._response is not None:
+                self._abort(self._response)
+
+def _call_cancellable(provider, prompt, answer_len, call):
+    """Streamed provider call that stops reading (and closes the connection) once call is cancelled."""
+    if call.cancelled.is_set():
+        return {"ok": False, "error": f"{provider}: cancelled (lost hedge race)"}
+    t0 = time.time()
+    events = stream_provider(provider, prompt, answer_len, handle=call)
+    try:
+        for kind, payload in events:
+            if call.cancelled.is_set():
+                return {"ok": False, "error": f"{provider}: cancelled (lost hedge race)"}
+            if kind == "done":
+                if payload.get("ok"):
+                    record_provider_latency(provider, time.time() - t0)
+                return payload
+    finally:
+        events.close()
+    return {"ok": False, "error": f"{provider}: stream ended without a result"}
+
+def call_provider_hedged(provider, prompt, answer_len, hedge_provider, delay=None, deadline=None):
+    """
+    Race the selected provider against a hedge provider.
+    The hedge is launched after `delay` seconds (default: p95 of the primary's
+    recent latencies) or immediately if the primary fails. The first successful
+    answer wins and the other request is cancelled. Returns the call_provider()
+    dict plus "provider" (winner), "hedged" (whether the hedge was launched).
+    """
+    if delay is None:
+        delay = hedge_delay(provider)
+    if deadline is None:
+        deadline = float(os.getenv("HEDGE_DEADLINE_SEC", 20))
+    t_end = time.time() + deadline
+    calls = {provider: _HedgeCall(), hedge_provider: _HedgeCall()}
+    futures = {_hedge_executor.submit(_call_cancellable, provider, prompt, answer_len, calls[provider]): provider}
+    done, _ = wait(futures, timeout=delay)
+    primary = next(iter(futures))
+    if done and primary.result().get("ok"):
+        return dict(primary.result(), provider=provider, hedged=False)
+    futures[_hedge_executor.submit(_call_cancellable, hedge_provider, prompt, answer_len, calls[hedge_provider])] = hedge_provider
+    pending = set(f for f in futures if not f.done())
+    errors = [primary.result()["error"]] if primary.done() else []
+    while pending:
+        done, pending = wait(pending, timeout=max(0.0, t_end - time.time()), return_when=FIRST_COMPLETED)
+        if not done:
+            break
+        for f in done:
+            res = f.result()
+            if res.get("ok"):
+                for other in pending:
+                    calls[futures[other]].cancel()
+                    other.cancel()
+                return dict(res, provider=futures[f], hedged=True)
+            errors.append(res.get("error"))
+    for f in pending:
+        calls[futures[f]].cancel()
+        f.cancel()
+    if pending:
+        errors.append(f"no provider answered within {deadline:.0f}s")
+    return {"ok": False, "error": "; ".join(e for e in errors if e), "provider": None, "hedged": True}
+
+def cacheable_result(result):
+    """
+    Provider result as stored in the answer cache: "hedged" describes this call
+    only and is dropped; the winning provider is kept as "answered_by".
+    """
+    value = {k: v for k, v in result.items() if k not in ("provider", "hedged")}
+    if result.get("provider"):
+        value["answered_by"] = result["provider"]
+    return value
+
+def cached_result(value, provider):
+    """A cache hit in the shape of a fresh result: the provider that answered, no hedge for this call."""
+    value = dict(value)
+    value["provider"] = value.pop("answered_by", None) or provider
+    value["hedged"] = False
+    return value
+
+async def call_provider_hedged_async(provider, prompt, answer_len, hedge_provider, delay=None, deadline=None):
+    """asyncio version of call_provider_hedged(); the losing request is cancelled as a task."""
+    import asyncio
+    if delay is None:
+        delay = hedge_delay(provider)
+    if deadline is None:
+        deadline = float(os.getenv("HEDGE_DEADLINE_SEC", 20))
+    loop = asyncio.get_running_loop()
+    t_end = loop.time() + deadline
+    primary = asyncio.ensure_future(call_provider_async(provider, prompt, answer_len))
+    done, _ = await asyncio.wait({primary}, timeout=delay)
+    if done and primary.result().get("ok"):
+        return dict(primary.result(), provider=provider, hedged=False)
+    tasks = {primary: provider,
+             asyncio.ensure_future(call_provider_async(hedge_provider, prompt, answer_len)): hedge_provider}
+    pending = set(t for t in tasks if not t.done())
+    errors = [primary.result()["error"]] if primary.done() else []
+    while pending:
+        done, pending = await asyncio.wait(pending, timeout=max(0.0, t_end - loop.time()),
+                                           return_when=asyncio.FIRST_COMPLETED)
+        if not done:
+            break
+        for t in done:
+            res = t.result()
+            if res.get("ok"):
+                for other in pending:
+                    other.cancel()
+                return dict(res, provider=tasks[t], hedged=True)
+            errors.append(res.get("error"))
+    for t in pending:
+        t.cancel()
+    if pending:
+        errors.append(f"no provider answered within {deadline:.0f}s")
+    return {"ok": False, "error": "; ".join(e for e in errors if e), "provider": None, "hedged": True}
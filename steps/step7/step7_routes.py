@@ -2,13 +2,16 @@ import os
 import json
 import time
 import numpy as np
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session
+from flask import Blueprint, render_template, request, redirect, url_for, flash, session, Response, stream_with_context
 from werkzeug.utils import secure_filename
-from .services_rag import load_db, embed_query, retrieve_chunks, build_prompt, call_provider, validate_answer, embeddings_ready
+from .services_rag import load_db, load_store, embed_query, retrieve_chunks, build_prompt, call_provider, validate_answer, embeddings_ready, stream_provider, CitationTracker, call_provider_hedged, cacheable_result, cached_result, ask_params
 from .services_rag_exceptions import EmbeddingsMissing
+from services.answer_cache import get_answer_cache
 
 step7_bp = Blueprint('step7_bp', __name__, url_prefix='/steps/7')
 
+LOG_PATH = os.path.join(os.path.dirname(__file__), 'logs', 'ask.jsonl')
+
 
 def load_api_keys():
     key_path = os.path.join(os.path.dirname(__file__), 'api_keys.json')
@@ -54,6 +57,11 @@ def api_keys():
         flash('API keys saved.', 'success')
     return redirect(url_for('step7_bp.step7_page'))
 
+@step7_bp.route('/pool_stats', methods=['GET'])
+def pool_stats_route():
+    from services.http_pool import pool_stats, http2_available
+    return json.dumps({"http2": http2_available(), "providers": pool_stats()}), 200, {"Content-Type": "application/json"}
+
 @step7_bp.route('', methods=['GET'])
 def step7_page():
     # Allow user to select chunking method (headings or token)
@@ -91,7 +99,9 @@ def step7_page():
 @step7_bp.route('/ask', methods=['POST'])
 def ask_route():
     import time as _time
-    method = request.form.get('method', 'headings')
+    data = request.get_json(silent=True) or request.form
+    params = ask_params(data)
+    method = params['method']
     # Fast-fail if embeddings are missing
     if not embeddings_ready(method):
         error_msg = "Embeddings not found on server. Please rebuild on deploy or via admin endpoint."
@@ -107,7 +117,8 @@ def ask_route():
             flash(error_msg, 'danger')
             return render_template('steps/step_7.html', vectors=None, meta=None, method=method, providers=[], available_providers=[], api_keys={}, topk=5, min_score=None, answer_len='short', question='', answer=None, context_chunks=None, citations=None, provenance=None, error=error_msg)
     try:
-        vectors, meta = load_db(method)
+        store = load_store(method)
+        vectors, meta = store.vectors, store.meta
     except EmbeddingsMissing as e:
         error_msg = str(e)
         if request.is_json or request.headers.get("Accept", "").startswith("application/json"):
@@ -121,18 +132,8 @@ def ask_route():
         else:
             flash(error_msg, 'danger')
             return render_template('steps/step_7.html', vectors=None, meta=None, method=method, providers=[], available_providers=[], api_keys={}, topk=5, min_score=None, answer_len='short', question='', answer=None, context_chunks=None, citations=None, provenance=None, error=error_msg)
-    topk = int(request.form.get('topk', 5))
-    min_score = request.form.get('min_score')
-    if min_score == 'None' or min_score is None:
-        min_score = None
-    else:
-        try:
-            min_score = float(min_score)
-        except Exception:
-            min_score = None
-    answer_len = request.form.get('answer_len', 'short')
-    provider = request.form.get('provider')
-    question = request.form.get('question', '').strip()
+    topk, min_score, answer_len = params['topk'], params['min_score'], params['answer_len']
+    provider, question = params['provider'], params['question']
     # Input validation
     api_keys = load_api_keys()
     providers = ['openrouter_free', 'groq', 'openai']
@@ -140,8 +141,9 @@ def ask_route():
         (p == 'openrouter_free' and (session.get('OPENROUTER_API_KEY') or api_keys.get('OPENROUTER_API_KEY') or api_keys.get('USE_ENV_OPENROUTER')))
         or (p != 'openrouter_free' and api_keys.get(f'{p.upper().replace("_FREE", "")}_API_KEY'))
     )]
-    if not question:
-        error_msg = "Please enter a question."
+    # Same 400 as the ASGI handler for an empty question or a provider that cannot be called
+    error_msg = "Please enter a question." if not question else params['provider_error']
+    if error_msg:
         if request.is_json or request.headers.get("Accept", "").startswith("application/json"):
             return (
                 json.dumps({
@@ -152,19 +154,12 @@ def ask_route():
         else:
             flash(error_msg, 'warning')
             return render_template('steps/step_7.html', vectors=vectors, meta=meta, method=method, providers=providers, available_providers=available_providers, api_keys=api_keys, topk=topk, min_score=min_score, answer_len=answer_len, question=question, answer=None, context_chunks=None, citations=None, provenance=None, error=None)
-    if min_score:
-        try:
-            min_score = float(min_score)
-            if min_score < -1 or min_score > 1:
-                flash('Min Score must be between -1 and 1.', 'warning')
-                min_score = None
-        except Exception:
-            flash('Min Score must be a number.', 'warning')
-            min_score = None
+    if min_score is None and data.get('min_score') not in (None, '', 'None'):
+        flash('Min Score must be a number between -1 and 1.', 'warning')
     # Retrieve chunks
     config = {}
     q_vec = embed_query(question, config)
-    context_chunks, _ = retrieve_chunks(q_vec, vectors, meta, topk, min_score)
+    context_chunks, _ = retrieve_chunks(q_vec, vectors, meta, topk, min_score, store=store)
     if not context_chunks:
         error_msg = "No evidence found with the current threshold; lower it and try again."
         if request.is_json or request.headers.get("Accept", "").startswith("application/json"):
@@ -180,8 +175,23 @@ def ask_route():
     # Build prompt
     prompt = build_prompt(context_chunks, question, answer_len)
     import re
+    used_ids = [[c['doc_id'], c['chunk_id']] for c in context_chunks]
+    # Answer cache: exact (question, chunk ids, provider, length, DB generation) or semantic match
+    answer_cache = get_answer_cache()
+    cache_args = (f'step7:{method}', question, used_ids, provider, answer_len, store.generation)
     t0 = _time.time()
-    result = call_provider(provider, prompt, answer_len)
+    result, cache_tier = answer_cache.get(*cache_args, q_vec=q_vec)
+    if result is not None:
+        result = cached_result(result, provider)
+    hedge_provider = params['hedge_provider']
+    if result is None:
+        if hedge_provider and hedge_provider != provider:
+            # Race a second provider if the selected one is slower than its p95
+            result = call_provider_hedged(provider, prompt, answer_len, hedge_provider)
+        else:
+            result = dict(call_provider(provider, prompt, answer_len), provider=provider, hedged=False)
+        if result.get('ok'):
+            answer_cache.put(*cache_args, cacheable_result(result), q_vec=q_vec)
     latency = _time.time() - t0
     answer = result.get('answer') if result.get('ok') else None
     if answer:
@@ -190,7 +200,6 @@ def ask_route():
         citations = []
     error = result.get('error') if not result.get('ok') else None
     val_msg = validate_answer(answer, citations)
-    used_ids = [[c['doc_id'], c['chunk_id']] for c in context_chunks]
     log_entry = {
         'timestamp': time.time(),
         'question': question,
@@ -203,10 +212,12 @@ def ask_route():
         'citations': citations,
         'used_ids': used_ids,
         'status': 'ok' if not val_msg else 'no_citations',
-        'error': error
+        'error': error,
+        'cache': cache_tier,
+        'hedged': bool(result.get('hedged')),
+        'provider_won': result.get('provider') if result.get('ok') else None
     }
-    log_path = os.path.join(os.path.dirname(__file__), 'logs', 'ask.jsonl')
-    with open(log_path, 'a') as f:
+    with open(LOG_PATH, 'a') as f:
         f.write(json.dumps(log_entry) + '\n')
     # Route-level timeout: if latency > 25s, return 503
     if latency > 25:
@@ -240,7 +251,114 @@ def ask_route():
             "ok": True,
             "answer": answer,
             "citations": citations,
-            "elapsed_ms": int(latency * 1000)
+            "elapsed_ms": int(latency * 1000),
+            "cached": cache_tier,
+            "provider": result.get('provider')
         }), 200, {"Content-Type": "application/json"}
     else:
         return render_template('steps/step_7.html', vectors=vectors, meta=meta, method=method, providers=providers, available_providers=available_providers, api_keys=api_keys, topk=topk, min_score=min_score, answer_len=answer_len, question=question, answer=answer, context_chunks=context_chunks, citations=citations, provenance=None, error=None)
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def _ndjson(event, data):
+    return json.dumps(dict(data, type=event)) + '\n'
+
+@step7_bp.route('/ask/stream', methods=['POST'])
+def ask_stream_route():
+    """
+    Streaming variant of /ask. Sends Server-Sent Events when the client accepts
+    text/event-stream, otherwise newline-delimited JSON. Events: "context"
+    (retrieved chunks), "token", "citation" (as soon as a doc_id#chunk_id is
+    complete) and a final "done" (or "error").
+    """
+    params = ask_params(request.get_json(silent=True) or request.form)
+    method, provider, question = params['method'], params['provider'], params['question']
+    answer_len, topk, min_score = params['answer_len'], params['topk'], params['min_score']
+    error_msg = "Please enter a question." if not question else params['provider_error']
+    if error_msg:
+        return json.dumps({"ok": False, "error": error_msg}), 400, {"Content-Type": "application/json"}
+    try:
+        store = load_store(method)
+    except EmbeddingsMissing as e:
+        return (json.dumps({
+            "ok": False,
+            "error": str(e),
+            "hint": f"Missing vectors/meta under steps/step5/Embeddings/{method}__minilm/"
+        }), 503, {"Content-Type": "application/json"})
+    t_start = time.time()
+    q_vec = embed_query(question, {})
+    context_chunks, retrieval_latency = retrieve_chunks(q_vec, store.vectors, store.meta, topk, min_score, store=store)
+    if not context_chunks:
+        return (json.dumps({"ok": False, "error": "No evidence found with the current threshold; lower it and try again."}),
+                404, {"Content-Type": "application/json"})
+    prompt = build_prompt(context_chunks, question, answer_len)
+    used_ids = [[c['doc_id'], c['chunk_id']] for c in context_chunks]
+    use_sse = 'text/event-stream' in request.headers.get('Accept', '')
+    fmt = _sse if use_sse else _ndjson
+    answer_cache = get_answer_cache()
+    cache_args = (f'step7:{method}', question, used_ids, provider, answer_len, store.generation)
+
+    def generate():
+        t0 = time.time()
+        ttft = None
+        tracker = CitationTracker()
+        yield fmt('context', {"chunks": [{k: c[k] for k in ('rank', 'score', 'doc_id', 'chunk_id', 'snippet')} for c in context_chunks]})
+        cached, cache_tier = answer_cache.get(*cache_args, q_vec=q_vec)
+        events = iter([('token', cached['answer']), ('done', cached)]) if cached else stream_provider(provider, prompt, answer_len)
+        result = None
+        for kind, payload in events:
+            if kind == 'token':
+                if ttft is None:
+                    ttft = time.time() - t0
+                yield fmt('token', {"text": payload})
+                for c in tracker.feed(payload):
+                    yield fmt('citation', {"citation": c})
+            else:
+                result = payload
+        for c in tracker.finish():
+            yield fmt('citation', {"citation": c})
+        latency = time.time() - t0
+        answer = result.get('answer') if result.get('ok') else None
+        citations = tracker.citations if answer else []
+        error = result.get('error') if not result.get('ok') else None
+        if result.get('ok') and not cached:
+            answer_cache.put(*cache_args, result, q_vec=q_vec)
+        val_msg = validate_answer(answer, citations)
+        log_entry = {
+            'timestamp': time.time(),
+            'question': question,
+            'provider': provider,
+            'method': method,
+            'topk': topk,
+            'min_score': min_score,
+            'answer_len': answer_len,
+            'latency': latency,
+            'retrieval_latency': retrieval_latency,
+            'ttft': ttft,
+            'stream': True,
+            'citations': citations,
+            'used_ids': used_ids,
+            'status': 'ok' if not val_msg else 'no_citations',
+            'error': error,
+            'cache': cache_tier
+        }
+        with open(LOG_PATH, 'a') as f:
+            f.write(json.dumps(log_entry) + '\n')
+        if error:
+            yield fmt('error', {"ok": False, "error": error, "elapsed_ms": int(latency * 1000)})
+        else:
+            yield fmt('done', {
+                "ok": True,
+                "answer": answer,
+                "citations": citations,
+                "model": result.get('model'),
+                "elapsed_ms": int(latency * 1000),
+                "ttft_ms": int(ttft * 1000) if ttft is not None else None,
+                "total_ms": int((time.time() - t_start) * 1000),
+                "cached": cache_tier
+            })
+
+    mimetype = 'text/event-stream' if use_sse else 'application/x-ndjson'
+    return Response(stream_with_context(generate()), mimetype=mimetype,
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
@@ -0,0 +1,32 @@
+import numpy as np
+from services.answer_cache import AnswerCache
+
+IDS = [["pto_policy", 1], ["pto_policy", 2]]
+
+def test_exact_hit_ignores_case_and_punctuation():
+    cache = AnswerCache(max_entries=4)
+    cache.put("step7:headings", "How many PTO days do I get?", IDS, "groq", "short", "g1", {"answer": "18"})
+    value, tier = cache.get("step7:headings", "how many pto days do i get", IDS, "groq", "short", "g1")
+    assert value == {"answer": "18"} and tier == "exact"
+    assert cache.get("step7:headings", "how many pto days do i get", IDS, "openai", "short", "g1") == (None, None)
+
+def test_new_generation_invalidates_namespace():
+    cache = AnswerCache(max_entries=4)
+    cache.put("step7:headings", "q", IDS, "groq", "short", "g1", "a")
+    assert cache.get("step7:headings", "q", IDS, "groq", "short", "g2") == (None, None)
+    assert cache.get("step7:headings", "q", IDS, "groq", "short", "g1") == (None, None)
+    assert cache.stats()["invalidations"] == 1
+
+def test_semantic_tier_and_lru_eviction():
+    cache = AnswerCache(max_entries=2, sim_threshold=0.9)
+    v = np.array([1.0, 0.0, 0.0])
+    cache.put("ask", "pto days per year", IDS, "m", "short", "g", "a1", q_vec=v)
+    value, tier = cache.get("ask", "yearly pto allowance", IDS[::-1], "m", "short", "g", q_vec=v + [0, 0.1, 0])
+    assert (value, tier) == ("a1", "semantic")
+    # A similar question whose retrieval found other chunks is not answered from the cache
+    assert cache.get("ask", "yearly pto allowance", IDS[:1], "m", "short", "g", q_vec=v) == (None, None)
+    assert cache.get("ask", "remote work", IDS, "m", "short", "g", q_vec=np.array([0.0, 1.0, 0.0])) == (None, None)
+    cache.put("ask", "b", IDS, "m", "short", "g", "b")
+    cache.put("ask", "c", IDS, "m", "short", "g", "c")
+    assert cache.get("ask", "pto days per year", IDS, "m", "short", "g") == (None, None)
+    assert cache.stats()["evictions"] == 1
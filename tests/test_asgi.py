@@ -0,0 +1,94 @@
+import asyncio, json, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import httpx
+from services import http_pool
+from steps.step7 import services_rag
+
+class _SlowHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(0.3)
+        body = json.dumps({"model": "stub-model", "choices": [{"message": {"content": "stub#1 answer"}}]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    def log_message(self, *args):
+        pass
+
+def test_async_provider_calls_overlap(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _SlowHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setenv("LLM_OPENAI_BASE_URL", f"http://127.0.0.1:{server.server_address[1]}/v1")
+    monkeypatch.setenv("LLM_HTTP2", "0")
+
+    async def main():
+        try:
+            t0 = time.time()
+            results = await asyncio.gather(*[services_rag.call_provider_async("openai", "p", "short") for _ in range(10)])
+            return results, time.time() - t0
+        finally:
+            await http_pool.aclose_clients()
+
+    try:
+        results, elapsed = asyncio.run(main())
+        assert all(r == {"ok": True, "answer": "stub#1 answer", "model": "stub-model"} for r in results)
+        assert elapsed < 2.0  # 10 x 0.3s would be 3s if serialized
+    finally:
+        server.shutdown()
+
+def test_asgi_routes_json_ask_natively(monkeypatch):
+    import asgi
+    seen = {}
+    async def fake_ask_json(data):
+        seen.update(data)
+        return 200, {"ok": True, "answer": "a#1", "citations": ["a#1"]}
+    monkeypatch.setattr(asgi, "ask_json", fake_ask_json)
+
+    async def main():
+        transport = httpx.ASGITransport(app=asgi.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            native = await client.post("/steps/7/ask", json={"question": "q", "provider": "groq"})
+            flask = await client.get("/encoders/status")
+            return native, flask
+
+    native, flask = asyncio.run(main())
+    assert native.status_code == 200 and native.json()["answer"] == "a#1"
+    assert seen == {"question": "q", "provider": "groq"}
+    assert flask.status_code == 200 and "loaded" in flask.json()
+
+def test_flask_and_asgi_ask_parse_json_alike(monkeypatch):
+    import app
+    from steps.step7 import async_ask, step7_routes
+    seen = []
+    class Store:
+        vectors, meta = None, []
+    def fake_retrieve(q_vec, vectors, meta, topk, min_score, store=None):
+        seen.append((topk, min_score))
+        return [], 0.0
+    for module in (async_ask, step7_routes):
+        monkeypatch.setattr(module, "embeddings_ready", lambda method: True)
+        monkeypatch.setattr(module, "load_store", lambda method: Store())
+        monkeypatch.setattr(module, "embed_query", lambda question, config: None)
+        monkeypatch.setattr(module, "retrieve_chunks", fake_retrieve)
+    monkeypatch.setenv("GROQ_API_KEY", "test-key")
+    body = {"question": "pto?", "topk": "3", "min_score": "0.2", "provider": "groq"}
+    r = app.app.test_client().post("/steps/7/ask", json=body)
+    status, _ = asyncio.run(async_ask.ask_json(body))
+    # The question is read from JSON by both, so both get as far as retrieval
+    assert r.status_code == 404 and status == 404
+    assert seen == [(3, 0.2), (3, 0.2)]
+    # A provider that cannot be called is refused alike, before retrieval
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    for provider, error in (("openai", "OpenAI not configured. Set OPENAI_API_KEY."), ("nope", "Unknown provider: nope")):
+        body = dict(body, provider=provider)
+        r = app.app.test_client().post("/steps/7/ask", json=body)
+        status, payload = asyncio.run(async_ask.ask_json(body))
+        assert (r.status_code, r.get_json()["error"]) == (status, payload["error"]) == (400, error)
+    assert len(seen) == 2
+    assert services_rag.ask_params({"provider": "groq", "hedge_provider": "openai"})["hedge_provider"] == ""
+    assert services_rag.ask_params({"topk": "x", "min_score": "7"})["topk"] == 5
+    assert services_rag.ask_params({"min_score": "7"})["min_score"] is None
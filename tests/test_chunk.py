@@ -0,0 +1,40 @@
+import random, re
+from scripts import chunk
+
+def _scan_split(text, max_chars, overlap):
+    # Original O(chunks x boundaries) implementation
+    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    boundaries = sorted({0, len(text), *(m.start() for m in re.finditer(r"(?m)^(?:\s*$|#{1,6}\s.*$)", text))})
+    chunks, i = [], 0
+    while i < len(text):
+        target_end = min(i + max_chars, len(text))
+        cut = None
+        for b in boundaries:
+            if i < b <= target_end:
+                cut = b
+        if cut is None or cut - i < max_chars * 0.3:
+            cut = target_end
+        if text[i:cut].strip():
+            chunks.append(text[i:cut].strip())
+        if cut >= len(text):
+            break
+        i = max(0, cut - overlap)
+        if i >= cut:
+            i = cut
+    return chunks
+
+def test_bisect_split_matches_scan():
+    pieces = ["word ", "# Head\n", "\n", "\n\n", "  \n", "## x y\n", "text.\n", "\r\n", "\t"]
+    rng = random.Random(3)
+    for _ in range(500):
+        text = "".join(rng.choice(pieces) for _ in range(rng.randint(0, 300)))
+        for max_chars, overlap in [(600, 100), (50, 10), (20, 5), (7, 0)]:
+            expected = _scan_split(text, max_chars, overlap)
+            assert chunk.split_with_overlap(text, max_chars, overlap) == expected
+            assert list(chunk.iter_split_with_overlap(text, max_chars, overlap)) == expected
+
+def test_iter_split_is_lazy():
+    text = "para one\n\n" * 1000
+    chunks = chunk.iter_split_with_overlap(text, max_chars=50, overlap=10)
+    assert not isinstance(chunks, list)
+    assert next(chunks) == chunk.split_with_overlap(text, max_chars=50, overlap=10)[0]
@@ -0,0 +1,110 @@
+import json, time
+from app import app
+from steps.step4 import chunk_jobs, services_chunk, step4_routes
+
+def test_chunk_job_runs_in_background_and_reports_progress(monkeypatch, tmp_path):
+    clean = tmp_path / "clean"
+    clean.mkdir()
+    files = []
+    for i in range(3):
+        (clean / f"doc{i}.txt").write_text(f"# Doc {i}\nIntro.\n\n## Part\nBody {i}.\n", encoding="utf-8")
+        files.append({"doc_id": f"doc{i}", "filename": f"doc{i}.txt"})
+    monkeypatch.setattr(chunk_jobs, "STEP3_CLEAN_DIR", str(clean))
+    monkeypatch.setattr(chunk_jobs, "CHUNKED_HEADING_DIR", str(tmp_path / "out"))
+    monkeypatch.setattr(chunk_jobs, "JOBS_DIR", str(tmp_path / "jobs"))
+    monkeypatch.setattr(services_chunk, "CHUNK_LOG", str(tmp_path / "chunk.jsonl"))
+    monkeypatch.setattr(step4_routes, "list_clean_files", lambda: files)
+    monkeypatch.setenv("CHUNK_WORKERS", "2")
+
+    client = app.test_client()
+    r = client.post("/steps/4/jobs", json={"method": "heading", "submit": "all", "mode": "markdown_atx"})
+    assert r.status_code == 202
+    job = r.get_json()
+    assert job["docs_total"] == 3 and job["workers"] == 2
+    status_url, deadline = job["status_url"], time.time() + 60
+    while job["state"] == "running" and time.time() < deadline:
+        time.sleep(0.1)
+        job = client.get(status_url).get_json()
+    assert job["state"] == "done" and job["docs_done"] == 3 and job["docs_failed"] == 0
+    assert job["chunks"] == 6 and "chunks_per_s" in job
+
+    for i in range(3):
+        rows = [json.loads(l) for l in (tmp_path / "out" / f"doc{i}.jsonl").read_text(encoding="utf-8").splitlines()]
+        assert [r["text"] for r in rows] == services_chunk.headings_chunk(str(clean / f"doc{i}.txt"), "markdown_atx")
+    assert len((tmp_path / "chunk.jsonl").read_text(encoding="utf-8").splitlines()) == 3
+    # Another worker process would read the mirrored status file
+    assert json.loads((tmp_path / "jobs" / f"{job['job_id']}.json").read_text())["state"] == "done"
+    assert client.get("/steps/4/jobs/ffffffffffff").status_code == 404
+
+def test_chunk_job_requires_documents(monkeypatch):
+    monkeypatch.setattr(step4_routes, "list_clean_files", lambda: [])
+    r = app.test_client().post("/steps/4/jobs", json={"method": "token", "selected_doc_ids": []})
+    assert r.status_code == 400
+
+def _isolate(monkeypatch, tmp_path, files):
+    monkeypatch.setattr(chunk_jobs, "STEP3_CLEAN_DIR", str(tmp_path))
+    monkeypatch.setattr(chunk_jobs, "CHUNKED_HEADING_DIR", str(tmp_path / "out"))
+    monkeypatch.setattr(chunk_jobs, "JOBS_DIR", str(tmp_path / "jobs"))
+    monkeypatch.setattr(services_chunk, "CHUNK_LOG", str(tmp_path / "chunk.jsonl"))
+    monkeypatch.setattr(step4_routes, "list_clean_files", lambda: files)
+    monkeypatch.setenv("CHUNK_WORKERS", "1")
+
+def _wait(job_id):
+    deadline = time.time() + 30
+    while chunk_jobs.job_status(job_id)["state"] == "running" and time.time() < deadline:
+        time.sleep(0.05)
+
+def test_second_job_refused_while_one_runs(monkeypatch, tmp_path):
+    import threading
+    release = threading.Event()
+    def slow_chunk_doc(method, doc_id, doc_path, out_path, params):
+        release.wait(30)
+        return {"doc_id": doc_id, "n_chunks": 0, "ms_elapsed": 0, "status": "ok", "error": None}
+    _isolate(monkeypatch, tmp_path, [{"doc_id": "a", "filename": "a.txt"}])
+    monkeypatch.setattr(chunk_jobs, "chunk_doc", slow_chunk_doc)
+    client = app.test_client()
+    first = client.post("/steps/4/jobs", json={"method": "heading", "submit": "all"})
+    try:
+        assert first.status_code == 202
+        second = client.post("/steps/4/jobs", json={"method": "heading", "submit": "all"})
+        assert second.status_code == 409 and second.get_json()["job_id"] == first.get_json()["job_id"]
+    finally:
+        release.set()
+    _wait(first.get_json()["job_id"])
+    third = client.post("/steps/4/jobs", json={"method": "heading", "submit": "all"})
+    assert third.status_code == 202
+    _wait(third.get_json()["job_id"])
+
+def test_dead_owner_reported_failed_and_status_files_pruned(monkeypatch, tmp_path):
+    _isolate(monkeypatch, tmp_path, [{"doc_id": "a", "filename": "a.txt"}])
+    (tmp_path / "a.txt").write_text("# A\nbody\n", encoding="utf-8")
+    jobs = tmp_path / "jobs"
+    jobs.mkdir()
+    stale = {"job_id": "0123456789ab", "state": "running", "pid": 2 ** 22 + 7, "started_ts": time.time(),
+             "heartbeat_ts": time.time() - 3600}
+    (jobs / "0123456789ab.json").write_text(json.dumps(stale), encoding="utf-8")
+    for i in range(4):
+        (jobs / f"{i:012x}.json").write_text(json.dumps({"job_id": f"{i:012x}", "state": "done"}), encoding="utf-8")
+    status = chunk_jobs.job_status("0123456789ab")
+    assert status["state"] == "failed" and "stopped" in status["error"]
+    monkeypatch.setattr(chunk_jobs, "MAX_JOBS_KEPT", 2)
+    r = app.test_client().post("/steps/4/jobs", json={"method": "heading", "submit": "all"})
+    assert r.status_code == 202
+    assert len(list(jobs.glob("*.json"))) == 2
+    _wait(r.get_json()["job_id"])
+
+def test_selected_doc_ids_type_checked(monkeypatch):
+    monkeypatch.setattr(step4_routes, "list_clean_files", lambda: [{"doc_id": "a", "filename": "a.txt"}])
+    r = app.test_client().post("/steps/4/jobs", json={"method": "token", "selected_doc_ids": 7})
+    assert r.status_code == 400
+
+def test_write_jsonl_temp_files_do_not_collide(tmp_path):
+    out = tmp_path / "doc.jsonl"
+    def chunks():
+        yield "outer 1"
+        # Same process writes the same document meanwhile (form handler + in-process job)
+        services_chunk.write_jsonl(["inner"], str(out), "doc", "token", {})
+        yield "outer 2"
+    assert services_chunk.write_jsonl(chunks(), str(out), "doc", "token", {}) == 2
+    assert [json.loads(l)["text"] for l in out.read_text(encoding="utf-8").splitlines()] == ["outer 1", "outer 2"]
+    assert [p.name for p in tmp_path.iterdir()] == ["doc.jsonl"]
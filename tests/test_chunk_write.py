@@ -0,0 +1,22 @@
+import json
+from steps.step4 import services_chunk
+
+def test_batched_jsonl_is_byte_identical(tmp_path, monkeypatch):
+    monkeypatch.setattr(services_chunk, "WRITE_BATCH", 2)
+    chunks = ["plain", 'quotes " and \\ backslash', "tab\tnew\nline\x00\x1f", "naïve — 東京  ", ""]
+    params = {"mode": "heuristic", "max_chunk_len": None, "note": "é"}
+    out = tmp_path / "out" / "doc.jsonl"
+    assert services_chunk.write_jsonl(iter(chunks), str(out), "doc-é", "heading", params) == len(chunks)
+    expected = "".join(json.dumps({"doc_id": "doc-é", "chunk_id": i, "method": "heading", "params": params, "text": c},
+                                  ensure_ascii=False) + "\n" for i, c in enumerate(chunks))
+    assert out.read_bytes() == expected.encode("utf-8")
+    assert [p.name for p in out.parent.iterdir()] == ["doc.jsonl"]
+
+def test_write_logs_appends_batch(tmp_path, monkeypatch):
+    monkeypatch.setattr(services_chunk, "CHUNK_LOG", str(tmp_path / "chunk.jsonl"))
+    services_chunk.write_log("a", "token", 3, 5, {"overlap": 1})
+    services_chunk.write_logs([services_chunk.log_entry(d, "token", 1, 2, {}) for d in ("b", "c")])
+    services_chunk.write_logs([])
+    rows = [json.loads(line) for line in (tmp_path / "chunk.jsonl").read_text(encoding="utf-8").splitlines()]
+    assert [r["doc_id"] for r in rows] == ["a", "b", "c"]
+    assert rows[0]["n_chunks"] == 3 and rows[0]["status"] == "ok" and rows[0]["error"] is None
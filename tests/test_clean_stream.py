@@ -0,0 +1,38 @@
+import io, os, random, re, unicodedata
+from html import unescape
+from services import ingest_utils
+
+def _whole_text_clean(text):
+    # The pre-streaming clean_text() pipeline
+    text = re.sub(r"\n{3,}", "\n\n", text)
+    text = text.replace("\t", " ")
+    text = "\n".join([line.rstrip() for line in text.splitlines()])
+    text = unicodedata.normalize("NFKC", text)
+    return unescape(text)
+
+def _stream_clean(raw, block_chars):
+    f = io.TextIOWrapper(io.BytesIO(raw.encode("utf-8")), encoding="utf-8")
+    return "\n".join(ingest_utils.clean_blocks(f, block_chars))
+
+def test_streaming_cleaner_matches_whole_text_pipeline():
+    alphabet = ["a", "b", " ", "\t", "\n", "\n", "\n", "\r", "\r\n", "\x0c", "\x0b", "\x1c", "\x85", " ",
+                " ", "&amp;", "&#10;", "&am", "p;", "ﬁ", "é", "＆", "&#x41"]
+    rng = random.Random(7)
+    for _ in range(3000):
+        raw = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 40)))
+        text = io.TextIOWrapper(io.BytesIO(raw.encode("utf-8")), encoding="utf-8").read()
+        # Tiny blocks put a block boundary at nearly every line
+        for block_chars in (1, 5, 1 << 20):
+            assert _stream_clean(raw, block_chars) == _whole_text_clean(text), (repr(raw), block_chars)
+
+def test_clean_doc_output_and_counts(tmp_path):
+    src = tmp_path / "doc.txt"
+    raw = "Title\t \n\n\n\n“Smart” quotes &amp; ﬁ\r\nlast line   "
+    src.write_bytes(raw.encode("utf-8"))
+    res, log = ingest_utils._clean_doc(str(src), str(tmp_path / "out"))
+    with open(res["cleaned_path"], encoding="utf-8", newline="") as f:
+        out = f.read()
+    text = raw.replace("\r\n", "\n")
+    assert out == _whole_text_clean(text)
+    assert (res["chars_in"], res["chars_out"]) == (len(text), len(out))
+    assert not os.path.exists(res["cleaned_path"] + ".tmp")
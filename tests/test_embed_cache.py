@@ -0,0 +1,52 @@
+import json, os
+import numpy as np
+from steps.step5.services_embed import embed_with_cache, save_artifacts, text_hash
+
+def _fake_embed(calls):
+    def embed(texts):
+        calls.append(list(texts))
+        return np.array([[len(t), t.count("a"), 1.0] for t in texts], dtype=np.float32)
+    return embed
+
+def test_rebuild_only_encodes_changed_chunks(tmp_path):
+    out_dir = str(tmp_path / "headings__minilm")
+    calls = []
+    first, stats = embed_with_cache(out_dir, ["alpha", "beta", "gamma"], "m", _fake_embed(calls))
+    assert stats["encoded"] == 3 and calls == [["alpha", "beta", "gamma"]]
+    vecs, stats = embed_with_cache(out_dir, ["alpha", "beta (edited)", "gamma", "alpha"], "m", _fake_embed(calls))
+    assert calls[-1] == ["beta (edited)"] and stats == {"cached": 3, "encoded": 1}
+    assert np.array_equal(vecs, _fake_embed([])(["alpha", "beta (edited)", "gamma", "alpha"]))
+    assert np.array_equal(vecs[0], first[0])
+
+def test_other_model_does_not_reuse_cache(tmp_path):
+    out_dir = str(tmp_path / "db")
+    calls = []
+    embed_with_cache(out_dir, ["x"], "m1", _fake_embed(calls))
+    _, stats = embed_with_cache(out_dir, ["x"], "m2", _fake_embed(calls))
+    assert stats["encoded"] == 1 and len(calls) == 2
+
+def test_cache_seeds_from_existing_artifacts(tmp_path):
+    out_dir = str(tmp_path / "db")
+    texts = ["one", "two"]
+    vectors = _fake_embed([])(texts)
+    meta = [{"doc_id": "d", "chunk_id": i, "text": t} for i, t in enumerate(texts)]
+    save_artifacts(out_dir, vectors, meta, {"model": "m"})
+    calls = []
+    vecs, stats = embed_with_cache(out_dir, ["two", "three"], "m", _fake_embed(calls))
+    assert calls == [["three"]] and stats == {"cached": 1, "encoded": 1}
+    with open(os.path.join(out_dir, "embed_cache.json")) as f:
+        assert json.load(f)["hashes"] == [text_hash(t) for t in ["two", "three"]]
+
+def test_full_build_prunes_cache_adding_docs_keeps_it(tmp_path):
+    out_dir = str(tmp_path / "db")
+    calls = []
+    embed_with_cache(out_dir, ["old", "kept"], "m", _fake_embed(calls))
+    embed_with_cache(out_dir, ["kept", "new", "kept"], "m", _fake_embed(calls))
+    with open(os.path.join(out_dir, "embed_cache.json")) as f:
+        assert json.load(f)["hashes"] == [text_hash("kept"), text_hash("new")]
+    assert np.load(os.path.join(out_dir, "embed_cache.npy")).shape[0] == 2
+    vecs, stats = embed_with_cache(out_dir, ["added"], "m", _fake_embed(calls), prune=False)
+    with open(os.path.join(out_dir, "embed_cache.json")) as f:
+        assert json.load(f)["hashes"] == [text_hash(t) for t in ("kept", "new", "added")]
+    _, stats = embed_with_cache(out_dir, ["kept", "added"], "m", _fake_embed(calls))
+    assert stats == {"cached": 2, "encoded": 0}
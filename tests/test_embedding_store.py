@@ -0,0 +1,103 @@
+import json, os
+import pytest
+import numpy as np
+from services.embedding_store import get_store
+
+def _write_db(folder, n):
+    os.makedirs(folder, exist_ok=True)
+    np.save(os.path.join(folder, "vectors.npy"), np.random.rand(n, 8).astype(np.float32))
+    with open(os.path.join(folder, "meta.json"), "w") as f:
+        json.dump([{"doc_id": "d", "chunk_id": i, "text": f"t{i}"} for i in range(n)], f)
+    with open(os.path.join(folder, "config.json"), "w") as f:
+        json.dump({"embed_method": "minilm", "n": n}, f)
+
+def test_store_is_resident_until_generation_changes(tmp_path):
+    folder = str(tmp_path / "headings__minilm")
+    _write_db(folder, 3)
+    store = get_store(folder)
+    gen, meta = store.generation, store.meta
+    assert isinstance(store.vectors, np.memmap) and len(meta) == 3
+    assert get_store(folder).meta is meta
+    _write_db(folder, 5)
+    os.utime(os.path.join(folder, "meta.json"), ns=(1, 1))
+    store = get_store(folder)
+    assert store.generation != gen and len(store.meta) == 5
+
+def test_store_reads_converted_meta_bin(tmp_path):
+    from services.meta_store import convert_folder, MetaTable
+    folder = str(tmp_path / "token__minilm")
+    _write_db(folder, 4)
+    with open(os.path.join(folder, "meta.json")) as f:
+        rows = json.load(f)
+    assert convert_folder(folder)[0] == 4
+    assert not os.path.exists(os.path.join(folder, "meta.json"))
+    store = get_store(folder)
+    assert isinstance(store.meta, MetaTable)
+    assert list(store.meta) == rows and store.meta[-1] == rows[-1] and store.meta[1:3] == rows[1:3]
+    assert store.meta.get(2, "text") == "t2"
+
+def test_refresh_swaps_snapshot_instead_of_mutating(tmp_path):
+    folder = str(tmp_path / "headings__minilm")
+    _write_db(folder, 3)
+    held = get_store(folder)
+    _write_db(folder, 6)
+    os.utime(os.path.join(folder, "meta.json"), ns=(2, 2))
+    fresh = get_store(folder)
+    assert fresh is not held
+    # A reader still holding the old snapshot sees matching vectors and meta
+    assert held.vectors.shape[0] == len(held.meta) == 3
+    assert fresh.vectors.shape[0] == len(fresh.meta) == 6
+
+def _save(folder, n, seed):
+    from steps.step5.services_embed import save_artifacts
+    vectors = np.random.default_rng(seed).random((n, 8), dtype=np.float32)
+    save_artifacts(folder, vectors, [{"doc_id": "d", "chunk_id": i, "text": f"t{i}"} for i in range(n)],
+                   {"embed_method": "minilm"})
+    with open(os.path.join(folder, "config.json")) as f:
+        return vectors, json.load(f)
+
+def test_save_never_leaves_an_index_of_other_vectors(tmp_path):
+    from services.embedding_store import vectors_sha256
+    folder = str(tmp_path / "headings__minilm")
+    os.makedirs(folder)
+    with open(os.path.join(folder, "faiss.index"), "wb") as f:
+        f.write(b"index of an earlier build")
+    vectors, config = _save(folder, 4, 0)
+    if config["faiss"]:
+        assert config["faiss_vectors_sha256"] == vectors_sha256(vectors)
+    else:
+        assert not os.path.exists(os.path.join(folder, "faiss.index"))
+        assert "faiss_vectors_sha256" not in config
+
+def test_persisted_index_reused_only_for_its_vectors(tmp_path, monkeypatch):
+    faiss = pytest.importorskip("faiss")
+    from services.embedding_store import StoreSnapshot
+    folder = str(tmp_path / "headings__minilm")
+    _save(folder, 5, 0)
+    stale = {name: open(os.path.join(folder, name), "rb").read() for name in ("faiss.index", "config.json")}
+    built = []
+    flat = faiss.IndexFlatIP
+    monkeypatch.setattr(faiss, "IndexFlatIP", lambda dim: built.append(dim) or flat(dim))
+    assert StoreSnapshot.load(folder).get_index().ntotal == 5 and built == []
+    # Same shape, other vectors next to the previous index and config: rebuilt, not reused
+    monkeypatch.setattr(faiss, "IndexFlatIP", flat)
+    _save(folder, 5, 1)
+    for name, data in stale.items():
+        with open(os.path.join(folder, name), "wb") as f:
+            f.write(data)
+    monkeypatch.setattr(faiss, "IndexFlatIP", lambda dim: built.append(dim) or flat(dim))
+    snapshot = StoreSnapshot.load(folder)
+    assert snapshot.get_index().ntotal == 5 and built == [8]
+    q = np.asarray(snapshot.normalized[:1])
+    assert snapshot.get_index().search(q, 1)[1][0][0] == 0
+
+def test_load_store_resolves_the_snapshot_once(tmp_path, monkeypatch):
+    from steps.step7 import services_rag
+    _write_db(str(tmp_path / "headings__minilm"), 3)
+    monkeypatch.setenv("EMBED_DIR", str(tmp_path))
+    calls = []
+    monkeypatch.setattr(services_rag, "get_store", lambda folder: calls.append(folder) or get_store(folder))
+    store = services_rag.load_store("headings")
+    assert len(calls) == 1 and store.vectors.shape[0] == len(store.meta) == 3
+    vectors, meta = services_rag.load_db("headings")
+    assert len(calls) == 2 and meta is store.meta
@@ -0,0 +1,36 @@
+import sys, types, threading
+import numpy as np
+from services import encoder_registry
+
+class _FakeModel:
+    loads = 0
+    def __init__(self, name, device=None):
+        _FakeModel.loads += 1
+        self.name = name
+    def encode(self, texts, convert_to_numpy=True):
+        return np.ones((len(texts), 4), dtype=np.float64)
+
+def _install_fake(monkeypatch):
+    fake = types.ModuleType("sentence_transformers")
+    fake.SentenceTransformer = _FakeModel
+    monkeypatch.setitem(sys.modules, "sentence_transformers", fake)
+    _FakeModel.loads = 0
+    encoder_registry.clear_encoders()
+
+def test_model_loaded_once(monkeypatch):
+    _install_fake(monkeypatch)
+    threads = [threading.Thread(target=encoder_registry.encode_query, args=("pto",)) for _ in range(8)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    encoder_registry.encode_query("pto", "sentence-transformers/all-MiniLM-L6-v2")
+    stats = encoder_registry.encoder_stats()
+    assert _FakeModel.loads == 1
+    assert stats["misses"] == 1 and stats["hits"] == 8
+    assert "all-MiniLM-L6-v2" in stats["load_ms"]
+    encoder_registry.clear_encoders()
+
+def test_encode_returns_float32(monkeypatch):
+    _install_fake(monkeypatch)
+    mat = encoder_registry.encode_queries(["a", "b"])
+    assert mat.dtype == np.float32 and mat.shape == (2, 4)
+    encoder_registry.clear_encoders()
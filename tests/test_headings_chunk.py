@@ -0,0 +1,62 @@
+import random, re
+from steps.step4 import services_chunk
+
+def _per_line_chunk(text, mode, min_heading_gap=1, max_chunk_len=None):
+    # headings_chunk() before the single-pass rewrite
+    lines = text.splitlines()
+    nxt_blank = lambda i: i + 1 == len(lines) or lines[i + 1].strip() == ''
+    starts = []
+    for i, line in enumerate(lines):
+        atx = re.match(r'^#{1,6}\s+.+', line)
+        setext = i + 1 < len(lines) and re.match(r'^(=+|-+)$', lines[i + 1])
+        if mode == 'markdown_atx':
+            hit = atx
+        elif mode == 'setext':
+            hit = setext
+        else:
+            hit = mode == 'heuristic' and (atx or setext or (len(line) <= 80 and line.endswith(':'))
+                                           or (len(line) <= 60 and line.isupper() and nxt_blank(i))
+                                           or (re.match(r'^(Section|Policy|Purpose|Scope)', line) and nxt_blank(i)))
+        if hit:
+            starts.append(i)
+    if starts and starts[0] != 0:
+        starts = [0] + starts
+    starts.append(len(lines))
+    chunks = [c for c in ('\n'.join(lines[a:b]).strip() for a, b in zip(starts, starts[1:])) if c]
+    if min_heading_gap > 1 and len(chunks) > 1:
+        merged, buf = [], chunks[0]
+        for c in chunks[1:]:
+            if len(buf.split()) < min_heading_gap:
+                buf += '\n' + c
+            else:
+                merged.append(buf)
+                buf = c
+        chunks = merged + [buf]
+    if max_chunk_len:
+        wrapped = []
+        for chunk in chunks:
+            words = chunk.split()
+            while len(words) > max_chunk_len:
+                wrapped.append(' '.join(words[:max_chunk_len]))
+                words = words[max_chunk_len:]
+            wrapped.append(' '.join(words))
+        chunks = wrapped
+    return chunks
+
+LINES = ["# Title", "## Sub x", "#", "#  ", "# ", "===", "---", "-", "=-", "SCOPE", "ÉTÉ", "ǅ", "Policy on x",
+         "Section 1:", "Purpose", "abc:", "lower text here", "A" * 61, "B" * 60, "x" * 80 + ":", "x" * 79 + ":",
+         "", "  ", "\t", " ", "\r", "\x0c", "\x85", "text\x1fmore", "Scope and such"]
+
+def test_single_pass_matches_per_line_rules():
+    rng = random.Random(5)
+    for _ in range(1500):
+        text = "\n".join(rng.choice(LINES) for _ in range(rng.randint(0, 25))) + rng.choice(["", "\n", "\n\n"])
+        for mode in ("markdown_atx", "setext", "heuristic", "unknown"):
+            for gap, max_len in [(1, None), (3, None), (1, 4), (5, 2)]:
+                expected = _per_line_chunk(text, mode, gap, max_len)
+                assert services_chunk.headings_chunk_text(text, mode, gap, max_len) == expected, (repr(text), mode)
+
+def test_headings_chunk_reads_file(tmp_path):
+    doc = tmp_path / "doc.txt"
+    doc.write_text("Intro\n# Leave\nTake it.\n\nSCOPE\n\nAll staff.\n", encoding="utf-8")
+    assert services_chunk.headings_chunk(str(doc), "heuristic") == ["Intro", "# Leave\nTake it.", "SCOPE\n\nAll staff."]
@@ -0,0 +1,109 @@
+import socket
+import threading
+import time
+from steps.step7 import services_rag
+
+def _fake_stream(delays, answers):
+    def stream_provider(provider, prompt, answer_len, handle=None):
+        time.sleep(delays[provider])
+        yield "token", answers[provider]
+        yield "done", {"ok": answers[provider] is not None, "answer": answers[provider], "model": provider,
+                       "error": None if answers[provider] else f"{provider}: HTTP 500"}
+    return stream_provider
+
+def test_hedge_wins_when_primary_is_slow(monkeypatch):
+    monkeypatch.setattr(services_rag, "stream_provider", _fake_stream({"groq": 1.0, "openai": 0.0}, {"groq": "slow", "openai": "fast"}))
+    res = services_rag.call_provider_hedged("groq", "p", "short", "openai", delay=0.05)
+    assert res["ok"] and res["answer"] == "fast" and res["provider"] == "openai" and res["hedged"]
+
+def test_primary_wins_before_hedge_delay(monkeypatch):
+    monkeypatch.setattr(services_rag, "stream_provider", _fake_stream({"groq": 0.0, "openai": 0.0}, {"groq": "a", "openai": "b"}))
+    res = services_rag.call_provider_hedged("groq", "p", "short", "openai", delay=1.0)
+    assert res["provider"] == "groq" and not res["hedged"]
+
+def test_primary_failure_falls_back_immediately(monkeypatch):
+    monkeypatch.setattr(services_rag, "stream_provider", _fake_stream({"groq": 0.0, "openai": 0.0}, {"groq": None, "openai": "b"}))
+    t0 = time.time()
+    res = services_rag.call_provider_hedged("groq", "p", "short", "openai", delay=5.0)
+    assert res["provider"] == "openai" and time.time() - t0 < 1.0
+
+def _sse_server(stall):
+    # HTTP/1.1 SSE endpoint: /fast answers at once, /slow sends headers and then stalls
+    srv = socket.socket()
+    srv.bind(("127.0.0.1", 0))
+    srv.listen(4)
+    def serve(conn):
+        with conn:
+            request = conn.recv(65536).decode("latin-1")
+            conn.sendall(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nContent-Length: 1000\r\n\r\n")
+            if request.startswith("POST /slow"):
+                stall.wait(10)
+            else:
+                conn.sendall(b'data: {"choices": [{"delta": {"content": "fast"}}]}\n\ndata: [DONE]\n\n')
+                stall.wait(10)
+    def accept():
+        while not stall.is_set():
+            try:
+                conn, _ = srv.accept()
+            except OSError:
+                return
+            threading.Thread(target=serve, args=(conn,), daemon=True).start()
+    threading.Thread(target=accept, daemon=True).start()
+    return srv
+
+def test_loser_blocked_on_first_token_frees_its_thread(monkeypatch):
+    stall = threading.Event()
+    srv = _sse_server(stall)
+    port = srv.getsockname()[1]
+    paths = {"groq": "slow", "openai": "fast"}
+    monkeypatch.setattr(services_rag, "provider_request",
+                        lambda provider, prompt, answer_len: ((f"http://127.0.0.1:{port}/{paths[provider]}", {}, {}), None))
+    finished = {}
+    call = services_rag._call_cancellable
+    def timed_call(provider, *args):
+        try:
+            return call(provider, *args)
+        finally:
+            finished[provider] = time.time()
+    monkeypatch.setattr(services_rag, "_call_cancellable", timed_call)
+    try:
+        res = services_rag.call_provider_hedged("groq", "p", "short", "openai", delay=0.2)
+        t_won = time.time()
+        assert res["ok"] and res["answer"] == "fast" and res["provider"] == "openai"
+        while "groq" not in finished and time.time() - t_won < 5:
+            time.sleep(0.02)
+        # The read timeout is 15s; cancelling aborts the response instead of waiting it out
+        assert finished["groq"] - t_won < 2
+    finally:
+        stall.set()
+        srv.close()
+
+def test_cache_keeps_answer_without_call_fields():
+    res = {"ok": True, "answer": "a", "model": "m", "provider": "openai", "hedged": True}
+    stored = services_rag.cacheable_result(res)
+    assert stored == {"ok": True, "answer": "a", "model": "m", "answered_by": "openai"}
+    # A hit has the shape of a fresh result: who answered, and no hedge for this request
+    assert services_rag.cached_result(stored, "groq") == dict(res, hedged=False)
+    assert services_rag.cached_result({"ok": True, "answer": "a"}, "groq")["provider"] == "groq"
+
+def test_ask_route_cache_hit_reports_provider_like_a_miss(monkeypatch, tmp_path):
+    import app
+    from services import answer_cache
+    from steps.step7 import step7_routes
+    class Store:
+        vectors, meta, generation = None, [], "g-hit-shape"
+    chunk = {"rank": 1, "score": 0.9, "doc_id": "pto", "chunk_id": 1, "snippet": "s", "text": "t"}
+    monkeypatch.setenv("GROQ_API_KEY", "test-key")
+    monkeypatch.setattr(step7_routes, "LOG_PATH", str(tmp_path / "ask.jsonl"))
+    monkeypatch.setattr(answer_cache, "_cache", answer_cache.AnswerCache(max_entries=8))
+    monkeypatch.setattr(step7_routes, "embeddings_ready", lambda method: True)
+    monkeypatch.setattr(step7_routes, "load_store", lambda method: Store())
+    monkeypatch.setattr(step7_routes, "embed_query", lambda question, config: None)
+    monkeypatch.setattr(step7_routes, "retrieve_chunks", lambda *a, **k: ([chunk], 0.0))
+    monkeypatch.setattr(step7_routes, "call_provider", lambda p, prompt, n: {"ok": True, "answer": "18 days pto#1", "model": "m"})
+    client = app.app.test_client()
+    miss = client.post("/steps/7/ask", json={"question": "pto?", "provider": "groq"}).get_json()
+    hit = client.post("/steps/7/ask", json={"question": "pto?", "provider": "groq"}).get_json()
+    assert (miss["cached"], hit["cached"]) == (None, "exact")
+    assert miss["provider"] == hit["provider"] == "groq"
+    assert set(miss) == set(hit)
@@ -0,0 +1,59 @@
+import json, threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from services import http_pool
+from steps.step7.services_rag import call_provider
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = json.dumps({"model": "stub-model", "choices": [{"message": {"content": "stub#1 answer"}}]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    def log_message(self, *args):
+        pass
+
+def test_call_provider_reuses_pooled_connection(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setenv("LLM_OPENAI_BASE_URL", f"http://127.0.0.1:{server.server_address[1]}/v1")
+    monkeypatch.setenv("LLM_HTTP2", "0")
+    http_pool.close_clients()
+    try:
+        for _ in range(3):
+            res = call_provider("openai", "prompt", "short")
+            assert res == {"ok": True, "answer": "stub#1 answer", "model": "stub-model"}
+        stats = http_pool.pool_stats()["openai"]
+        assert stats["requests"] == 3
+        assert stats["connections_opened"] == 1 and stats["reused"] == 2
+    finally:
+        http_pool.close_clients()
+        server.shutdown()
+
+def test_unconfigured_provider_message(monkeypatch):
+    monkeypatch.delenv("GROQ_API_KEY", raising=False)
+    assert call_provider("groq", "p", "short") == {"ok": False, "error": "Groq not configured. Set GROQ_API_KEY."}
+    assert call_provider("nope", "p", "short") == {"ok": False, "error": "Unknown provider: nope"}
+
+def test_async_clients_follow_their_loop():
+    import asyncio, gc
+    async def clients():
+        return http_pool.get_async_client("openai"), http_pool.get_async_client("openai")
+    a, b = asyncio.run(clients())
+    c, _ = asyncio.run(clients())
+    assert a is b and c is not a
+    gc.collect()
+    # Entries go away with their loop instead of piling up under reused id()s
+    assert len(http_pool._async_clients) == 0
+
+def test_stats_survive_close_clients_during_async_use():
+    import asyncio
+    trace = http_pool._async_tracer("openai")
+    http_pool.close_clients()
+    asyncio.run(trace("connection.connect_tcp.complete", {}))
+    assert http_pool.pool_stats()["openai"]["connections_opened"] == 1
+    http_pool.close_clients()
@@ -0,0 +1,92 @@
+import os
+from services import ingest_utils
+
+SRC = os.path.join("steps", "step1", "data-Policies")
+
+def _redirect_logs(monkeypatch, tmp_path):
+    monkeypatch.setattr(ingest_utils, "PARSE_LOG", str(tmp_path / "parse.jsonl"))
+    monkeypatch.setattr(ingest_utils, "CLEAN_LOG", str(tmp_path / "clean.jsonl"))
+    monkeypatch.setattr(ingest_utils, "PARSED_STATS_CSV", str(tmp_path / "parsed_stats.csv"))
+
+def test_parse_and_clean_batch_match_sequential(monkeypatch, tmp_path):
+    _redirect_logs(monkeypatch, tmp_path)
+    paths = [os.path.join(SRC, f) for f in sorted(os.listdir(SRC)) if f.endswith((".pdf", ".md", ".txt"))]
+    seq = [ingest_utils._parse_doc(p, str(tmp_path / "seq"))[0] for p in paths]
+    batch = ingest_utils.parse_batch(paths, workers=2, pdf_pages_per_task=1, out_dir=str(tmp_path / "par"))
+    assert batch["docs"] == len(paths) and batch["workers"] == 2
+    assert {"docs_per_s", "mb_per_s", "bytes_in", "elapsed_ms"} <= set(batch)
+    for a, b in zip(seq, batch["results"]):
+        assert (a["doc_id"], a["status"], a["chars_out"]) == (b["doc_id"], b["status"], b["chars_out"])
+        with open(a["parsed_raw_path"], encoding="utf-8") as fa, open(b["parsed_raw_path"], encoding="utf-8") as fb:
+            assert fa.read() == fb.read()
+    # One log line per document, stats rows for all of them
+    with open(ingest_utils.PARSE_LOG, encoding="utf-8") as f:
+        assert len(f.read().splitlines()) == len(paths)
+    assert len(ingest_utils.get_parsed_stats()) == len(paths)
+
+    raw = [r["parsed_raw_path"] for r in batch["results"]]
+    cleaned = ingest_utils.clean_batch(raw, workers=2, out_dir=str(tmp_path / "clean"))
+    for p, r in zip(raw, cleaned["results"]):
+        ref = ingest_utils._clean_doc(p, str(tmp_path / "clean_seq"))[0]
+        assert r["chars_out"] == ref["chars_out"]
+
+def test_unchanged_inputs_are_skipped(monkeypatch, tmp_path):
+    _redirect_logs(monkeypatch, tmp_path)
+    src = tmp_path / "src"
+    src.mkdir()
+    for name in ("a.md", "b.txt"):
+        (src / name).write_text(f"# {name}\n\n\n\nbody\t \n", encoding="utf-8")
+    paths = [str(src / "a.md"), str(src / "b.txt")]
+    raw_dir, clean_dir = str(tmp_path / "raw"), str(tmp_path / "clean")
+
+    first = ingest_utils.parse_batch(paths, workers=1, out_dir=raw_dir)
+    assert (first["processed"], first["skipped"]) == (2, 0)
+    (src / "b.txt").write_text("changed\n", encoding="utf-8")
+    second = ingest_utils.parse_batch(paths, workers=1, out_dir=raw_dir)
+    assert (second["processed"], second["skipped"]) == (1, 1)
+    assert second["results"][0]["skipped"] and not second["results"][1]["skipped"]
+    assert second["results"][0]["parsed_raw_path"] == first["results"][0]["parsed_raw_path"]
+    assert ingest_utils.parse_batch(paths, workers=1, out_dir=raw_dir, force=True)["skipped"] == 0
+    # The manifest lives next to the output dir, not in it
+    assert sorted(os.listdir(raw_dir)) == ["a.txt", "b.txt"]
+
+    raw = [r["parsed_raw_path"] for r in second["results"]]
+    assert ingest_utils.clean_batch(raw, workers=1, out_dir=clean_dir)["processed"] == 2
+    # A deleted output is regenerated even though the input is unchanged
+    os.remove(os.path.join(clean_dir, "a.txt"))
+    again = ingest_utils.clean_batch(raw, workers=1, out_dir=clean_dir)
+    assert (again["processed"], again["skipped"]) == (1, 1)
+
+def test_pdf_page_count_and_timing_done_in_worker_task(tmp_path):
+    pdf = os.path.join(SRC, next(f for f in sorted(os.listdir(SRC)) if f.endswith(".pdf")))
+    n_pages = ingest_utils._pdf_page_count(pdf)
+    n, count_ms, pair = ingest_utils._pdf_doc_task(pdf, n_pages, str(tmp_path))
+    assert n == n_pages and pair is not None and pair[0]["status"] in ("ok", "no_text")
+    if n_pages > 1:
+        n, count_ms, pair = ingest_utils._pdf_doc_task(pdf, n_pages - 1, str(tmp_path))
+        assert (n, pair) == (n_pages, None) and count_ms >= 0
+    text, error, ms = ingest_utils._pdf_pages_task(pdf, [0])
+    assert error is None and ms >= 0
+    # A split document's time is its workers' time plus the final write, not the batch clock
+    from datetime import datetime
+    _, entry = ingest_utils._finish_parse(pdf, ".pdf", text, "ok", None, datetime.utcnow(), str(tmp_path), work_ms=1234)
+    assert 1234 <= entry["ms_elapsed"] < 1234 + 1000
+
+def test_single_pdf_is_split_across_the_pool(monkeypatch, tmp_path):
+    _redirect_logs(monkeypatch, tmp_path)
+    pdf = os.path.join(SRC, next(f for f in sorted(os.listdir(SRC)) if f.endswith(".pdf")))
+    n_pages = ingest_utils._pdf_page_count(pdf)
+    assert n_pages > 1
+    submitted = []
+    pool_factory = ingest_utils.process_pool
+    def recording_pool(workers):
+        pool = pool_factory(workers)
+        submit = pool.submit
+        pool.submit = lambda fn, *args: submitted.append(fn.__name__) or submit(fn, *args)
+        return pool
+    monkeypatch.setattr(ingest_utils, "process_pool", recording_pool)
+    batch = ingest_utils.parse_batch([pdf], workers=2, pdf_pages_per_task=1, out_dir=str(tmp_path / "par"))
+    assert submitted == ["_pdf_doc_task"] + ["_pdf_pages_task"] * n_pages
+    ref = ingest_utils._parse_doc(pdf, str(tmp_path / "seq"))[0]
+    res = batch["results"][0]
+    assert (res["status"], res["chars_out"]) == (ref["status"], ref["chars_out"])
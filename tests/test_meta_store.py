@@ -0,0 +1,37 @@
+from services.meta_store import MetaTable, write_meta
+
+def test_round_trip_mixed_columns(tmp_path):
+    rows = [
+        {"doc_id": "pto", "chunk_id": 0, "params": {"w": 700}, "text": "Paid time off – 1.5 days", "vector_index": 0},
+        {"doc_id": "pto", "chunk_id": 1, "params": {"w": 700}, "text": "Carry-over rules", "vector_index": 1},
+        {"doc_id": "travel", "chunk_id": "x", "text": "", "vector_index": 2, "note": None},
+    ]
+    path = str(tmp_path / "meta.bin")
+    write_meta(path, rows)
+    table = MetaTable(path)
+    assert len(table) == 3 and list(table) == rows
+    kinds = {c["name"]: c["kind"] for c in table.header["columns"]}
+    assert kinds["text"] == "blob" and kinds["vector_index"] == "rownum" and kinds["chunk_id"] == kinds["params"] == "dict"
+    assert table.get(0, "text") == rows[0]["text"] and table.get(2, "params") is None
+    table[0]["params"]["w"] = 1
+    assert table[1]["params"] == {"w": 700}
+
+def test_empty_table(tmp_path):
+    path = str(tmp_path / "meta.bin")
+    write_meta(path, [])
+    assert len(MetaTable(path)) == 0 and MetaTable(path)[:3] == []
+
+def test_blob_column_keeps_none_and_missing(tmp_path):
+    rows = [{"text": f"chunk {i}", "text_hash": f"h{i}"} for i in range(6)]
+    rows[1]["text"] = None
+    del rows[4]["text"]
+    rows[2]["text"] = ""
+    path = str(tmp_path / "meta.bin")
+    write_meta(path, rows)
+    table = MetaTable(path)
+    kinds = {c["name"]: c["kind"] for c in table.header["columns"]}
+    # A None or a missing key no longer pushes text into a per-value dict column
+    assert kinds["text"] == kinds["text_hash"] == "blob"
+    assert list(table) == rows
+    assert table.get(1, "text", "x") is None and table.get(4, "text", "x") == "x" and table.get(2, "text") == ""
+    assert len(next(c for c in table.header["columns"] if c["name"] == "text_hash")["parts"]) == 2
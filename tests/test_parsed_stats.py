@@ -0,0 +1,29 @@
+import threading
+from services import ingest_utils
+
+def test_upsert_batches_and_keeps_existing_fields(monkeypatch, tmp_path):
+    monkeypatch.setattr(ingest_utils, "PARSED_STATS_CSV", str(tmp_path / "parsed_stats.csv"))
+    writes = []
+    real_replace = ingest_utils.os.replace
+    monkeypatch.setattr(ingest_utils.os, "replace", lambda a, b: (writes.append(b), real_replace(a, b)))
+
+    ingest_utils.upsert_parsed_stats([ingest_utils.stats_update(f"d{i}", ".pdf", 10, 100, None, "ok", "t0", None) for i in range(50)])
+    assert len(writes) == 1
+    # Clean step: ext/bytes_in untouched, chars_in recorded
+    ingest_utils.update_parsed_stats("d3", None, None, 90, None, "ok", "t1", None, chars_in=100)
+    rows = {r["doc_id"]: r for r in ingest_utils.get_parsed_stats()}
+    assert len(rows) == 50
+    assert rows["d3"]["ext"] == ".pdf" and rows["d3"]["bytes_in"] == "10"
+    assert rows["d3"]["chars_raw"] == "90" and rows["d3"]["chars_in"] == "100" and rows["d3"]["last_parsed_iso"] == "t1"
+
+def test_concurrent_upserts_lose_nothing(monkeypatch, tmp_path):
+    monkeypatch.setattr(ingest_utils, "PARSED_STATS_CSV", str(tmp_path / "parsed_stats.csv"))
+    def worker(n):
+        for i in range(10):
+            ingest_utils.update_parsed_stats(f"w{n}-{i}", ".md", 1, 1, None, "ok", "t", None)
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(ingest_utils.get_parsed_stats()) == 80
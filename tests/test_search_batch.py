@@ -0,0 +1,63 @@
+import numpy as np
+import app
+from scripts import vector_search
+from steps.step7 import services_rag
+from steps.step7.services_rag_exceptions import EmbeddingsMissing
+
+def _client():
+    return app.app.test_client()
+
+def test_batch_without_method_uses_data_index(monkeypatch):
+    seen = {}
+    def fake_search_batch(queries, topk):
+        seen.update(queries=queries, topk=topk)
+        return [[{"rank": 1, "score": 0.9, "doc_id": f"d{i}", "chunk_id": 2, "id": "x", "preview": ""}]
+                for i, _ in enumerate(queries)]
+    monkeypatch.setattr(vector_search, "index_ready", lambda: True)
+    monkeypatch.setattr(vector_search, "search_batch", fake_search_batch)
+    r = _client().post("/search/batch", json={"queries": [" pto ", "expenses"], "topk": "2"})
+    assert r.status_code == 200
+    data = r.get_json()
+    assert seen == {"queries": ["pto", "expenses"], "topk": 2}
+    assert data["count"] == 2 and data["method"] is None
+    assert data["results"][1]["sources"] == [{"doc_id": "d1", "chunk_id": 2}]
+
+def test_batch_with_method_uses_step5_store(monkeypatch):
+    class Store:
+        config = {"embed_method": "minilm"}
+    seen = {}
+    monkeypatch.setattr(services_rag, "load_store", lambda method: seen.setdefault("method", method) and Store())
+    monkeypatch.setattr(services_rag, "embed_queries", lambda queries, config: np.zeros((len(queries), 4), np.float32))
+    def fake_retrieve(q_mat, store, topk):
+        seen["topk"] = topk
+        return [[{"rank": 1, "score": 0.5, "doc_id": "d", "chunk_id": i, "snippet": "s", "text": "t"}]
+                for i in range(len(q_mat))]
+    monkeypatch.setattr(services_rag, "retrieve_chunks_batch", fake_retrieve)
+    r = _client().post("/search/batch", json={"queries": ["a", "b"], "method": "token", "topk": -4})
+    assert r.status_code == 200
+    assert seen == {"method": "token", "topk": 1}
+    hits = r.get_json()["results"][1]["results"]
+    assert hits == [{"rank": 1, "score": 0.5, "doc_id": "d", "chunk_id": 1, "snippet": "s"}]
+
+def test_batch_rejects_bad_input(monkeypatch):
+    client = _client()
+    assert client.post("/search/batch", json={"queries": []}).status_code == 400
+    assert client.post("/search/batch", json={"queries": ["a", " "]}).status_code == 400
+    assert client.post("/search/batch", json={"queries": ["a"], "topk": "many"}).status_code == 400
+    assert client.post("/search/batch", json={"queries": ["a"], "method": "../../etc"}).status_code == 400
+    monkeypatch.setenv("SEARCH_BATCH_MAX", "2")
+    assert client.post("/search/batch", json={"queries": ["a", "b", "c"]}).status_code == 413
+
+def test_batch_reports_missing_or_unsearchable_embeddings(monkeypatch):
+    client = _client()
+    monkeypatch.setattr(vector_search, "index_ready", lambda: False)
+    assert client.post("/search/batch", json={"queries": ["a"]}).status_code == 503
+    def missing(method):
+        raise EmbeddingsMissing(method, "embeddings/headings__minilm")
+    monkeypatch.setattr(services_rag, "load_store", missing)
+    assert client.post("/search/batch", json={"queries": ["a"], "method": "headings"}).status_code == 503
+    class Store:
+        config = {"embed_method": "openai"}
+    monkeypatch.setattr(services_rag, "load_store", lambda method: Store())
+    r = client.post("/search/batch", json={"queries": ["a"], "method": "headings"})
+    assert r.status_code == 503 and "cannot be searched" in r.get_json()["error"]
@@ -0,0 +1,49 @@
+import json
+from scripts import search_jsonl
+
+RECS = [
+    {"id": "a::chunk-1", "text": "PTO accrual is 1.5 days per month. PTO rolls over."},
+    {"id": "b::chunk-1", "text": "Expenses must be filed within 30 days."},
+    {"id": "c::chunk-1", "text": "Remote work requires manager approval."},
+]
+
+def test_bm25_ranks_and_filters():
+    hits = search_jsonl.search(RECS, "pto accrual?", topk=3)
+    assert [h["id"] for h in hits] == ["a::chunk-1"]
+    assert hits[0]["score"] > 0
+    assert search_jsonl.search(RECS, "nothing matches", topk=3) == []
+
+def test_bm25_persisted_and_rebuilt_when_stale(tmp_path):
+    path = tmp_path / "policies.jsonl"
+    path.write_text("\n".join(json.dumps(r) for r in RECS[:2]) + "\n", encoding="utf-8")
+    bm25 = search_jsonl.load_bm25(path)
+    assert search_jsonl.bm25_path(path).exists() and bm25["n_docs"] == 2
+    path.write_text("\n".join(json.dumps(r) for r in RECS) + "\n", encoding="utf-8")
+    assert search_jsonl.load_bm25(path)["n_docs"] == 3
+
+def test_get_index_cached_until_file_changes(tmp_path, monkeypatch):
+    path = tmp_path / "policies.jsonl"
+    path.write_text("\n".join(json.dumps(r) for r in RECS[:2]) + "\n", encoding="utf-8")
+    search_jsonl.clear_index_cache()
+    recs, bm25 = search_jsonl.get_index(path)
+    calls = []
+    monkeypatch.setattr(search_jsonl, "load_index", lambda p: calls.append(p) or [])
+    assert search_jsonl.get_index(path)[0] is recs and not calls
+    path.write_text("\n".join(json.dumps(r) for r in RECS) + "\n", encoding="utf-8")
+    search_jsonl.get_index(path)
+    assert calls
+    search_jsonl.clear_index_cache()
+
+def test_source_digest_hashed_once_per_file_version(tmp_path, monkeypatch):
+    import hashlib, os
+    path = tmp_path / "policies.jsonl"
+    path.write_text("\n".join(json.dumps(r) for r in RECS) + "\n", encoding="utf-8")
+    search_jsonl.load_bm25(path)
+    hashed = []
+    monkeypatch.setattr(search_jsonl.hashlib, "sha256", lambda: hashed.append(1) or hashlib.new("sha256"))
+    for _ in range(3):
+        assert search_jsonl.load_bm25(path)["n_docs"] == 3
+    assert hashed == []
+    os.utime(path, ns=(1, 1))
+    search_jsonl.load_bm25(path)
+    assert hashed == [1]
@@ -0,0 +1,56 @@
+import json, os
+import numpy as np
+from services import segment_store
+from services.embedding_store import get_store
+
+def _rows(doc_id, n, dim=4, seed=0):
+    rng = np.random.default_rng(seed)
+    meta = [{"doc_id": doc_id, "chunk_id": i, "text": f"{doc_id} {i}"} for i in range(n)]
+    return rng.random((n, dim)).astype(np.float32), meta
+
+def _flat_db(folder):
+    os.makedirs(folder)
+    vecs, meta = _rows("a", 3)
+    np.save(os.path.join(folder, "vectors.npy"), vecs)
+    with open(os.path.join(folder, "meta.json"), "w") as f:
+        json.dump(meta, f)
+    with open(os.path.join(folder, "config.json"), "w") as f:
+        json.dump({"model": "m"}, f)
+    return vecs
+
+def test_add_replace_remove_and_compact(tmp_path, monkeypatch):
+    monkeypatch.setenv("EMBED_COMPACT_RATIO", "1.0")
+    folder = str(tmp_path / "headings__minilm")
+    flat = _flat_db(folder)
+    seg1 = os.path.join(folder, "segments")
+    vb, mb = _rows("b", 2, seed=1)
+    assert segment_store.add_documents(folder, vb, mb, model="m")["replaced"] == 0
+    assert not os.path.exists(os.path.join(folder, "vectors.npy"))
+    store = get_store(folder)
+    gen = store.generation
+    assert [m["doc_id"] for m in store.meta] == ["a", "a", "a", "b", "b"]
+    assert np.allclose(store.vectors[:3], flat)
+    # Re-adding b replaces its rows without touching segment 1
+    before = os.stat(os.path.join(seg1, "seg-000001", "vectors.npy")).st_mtime_ns
+    vb2, mb2 = _rows("b", 1, seed=2)
+    assert segment_store.add_documents(folder, vb2, mb2, model="m")["replaced"] == 2
+    assert os.stat(os.path.join(seg1, "seg-000001", "vectors.npy")).st_mtime_ns == before
+    assert segment_store.remove_documents(folder, ["a"])["removed"] == 3
+    store = get_store(folder)
+    assert store.generation != gen
+    assert [m["doc_id"] for m in store.meta] == ["b"] and store.meta[0]["vector_index"] == 0
+    D, I = store.search(vb2[0], 5)
+    assert I[0].tolist() == [0]
+    assert segment_store.compact(folder) == {"segments_merged": 3, "rows": 1}
+    assert os.listdir(seg1) == ["seg-000004"]
+    assert np.allclose(get_store(folder).vectors, vb2)
+
+def test_auto_compaction_on_tombstone_ratio(tmp_path, monkeypatch):
+    monkeypatch.setenv("EMBED_COMPACT_RATIO", "0.3")
+    folder = str(tmp_path / "db")
+    va, ma = _rows("a", 3)
+    vb, mb = _rows("b", 3, seed=1)
+    segment_store.add_documents(folder, va, ma)
+    segment_store.add_documents(folder, vb, mb)
+    assert segment_store.remove_documents(folder, ["a"])["compacted"]
+    assert segment_store.segment_stats(folder) == {"segments": 1, "live_rows": 3, "tombstoned_rows": 0, "generation": 5}
@@ -0,0 +1,8 @@
+import app
+
+def test_selection_script_runs_after_the_forms():
+    html = app.app.test_client().get("/steps/5").get_data(as_text=True)
+    script = html.index("collectSelectedDocIds(")
+    # The handlers look the forms up by id, so they must already be in the DOM
+    for form_id in ("embed-form", "add-form", "remove-form"):
+        assert html.index(f'id="{form_id}"') < script
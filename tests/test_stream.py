@@ -0,0 +1,43 @@
+import json, re, threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from services import http_pool
+from steps.step7.services_rag import CitationTracker, stream_provider
+
+TOKENS = ["PTO accrues ", "1.5 days (pto_pol", "icy#2", "). See rubric#1"]
+
+class _SSEHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        lines = [f"data: {json.dumps({'model': 'stub', 'choices': [{'delta': {'content': t}}]})}\n\n" for t in TOKENS]
+        body = ("".join(lines) + "data: [DONE]\n\n").encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    def log_message(self, *args):
+        pass
+
+def test_citation_tracker_matches_findall():
+    tracker = CitationTracker()
+    seen = []
+    for t in TOKENS:
+        seen += tracker.feed(t)
+    assert "rubric#1" not in seen  # may still grow until the stream ends
+    seen += tracker.finish()
+    assert seen == tracker.citations == re.findall(r"([\w\-]+#[0-9]+)", "".join(TOKENS))
+
+def test_stream_provider_yields_tokens_then_done(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _SSEHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setenv("GROQ_API_KEY", "test-key")
+    monkeypatch.setenv("LLM_GROQ_BASE_URL", f"http://127.0.0.1:{server.server_address[1]}")
+    http_pool.close_clients()
+    try:
+        events = list(stream_provider("groq", "prompt", "short"))
+        assert [p for k, p in events if k == "token"] == TOKENS
+        assert events[-1] == ("done", {"ok": True, "answer": "".join(TOKENS), "model": "stub"})
+    finally:
+        http_pool.close_clients()
+        server.shutdown()
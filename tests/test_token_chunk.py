@@ -0,0 +1,38 @@
+import random
+import pytest
+from steps.step4 import services_chunk
+
+def _list_chunk(text, window_size, overlap, tokenization):
+    # Original whole-document token list implementation
+    tokens = text.split() if tokenization == 'whitespace_approx' else list(text)
+    chunks, i = [], 0
+    while i < len(tokens):
+        chunk = ' '.join(tokens[i:i+window_size])
+        if chunk:
+            chunks.append(chunk)
+        i += window_size - overlap
+    return chunks
+
+def test_block_windows_match_token_list(tmp_path, monkeypatch):
+    pieces = ["a", "bb", "ccc", " ", "  ", "\t", "\n", "\r\n", "\xa0", "　", "\x1c", "é"]
+    rng = random.Random(5)
+    path = tmp_path / "doc.txt"
+    for block_chars in (1, 2, 7, 1 << 16):
+        monkeypatch.setattr(services_chunk, "TOKEN_BLOCK_CHARS", block_chars)
+        for _ in range(60):
+            text = "".join(rng.choice(pieces) for _ in range(rng.randint(0, 80)))
+            path.write_text(text, encoding="utf-8", newline="")
+            with open(path, encoding="utf-8") as f:
+                decoded = f.read()
+            for w, o in [(4, 1), (3, 0), (1, 0), (5, 4), (2, -3)]:
+                for tk in ("whitespace_approx", "chars"):
+                    expected = _list_chunk(decoded, w, o, tk)
+                    assert services_chunk.token_chunk(str(path), w, o, tk) == expected
+                    assert list(services_chunk.iter_token_chunks(str(path), w, o, tk)) == expected
+
+def test_overlap_not_below_window_is_rejected(tmp_path):
+    path = tmp_path / "doc.txt"
+    path.write_text("one two three", encoding="utf-8")
+    # Used to loop forever
+    with pytest.raises(ValueError):
+        services_chunk.token_chunk(str(path), window_size=3, overlap=3)
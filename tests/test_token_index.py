@@ -0,0 +1,57 @@
+import random
+import pytest
+from steps.step4 import services_chunk, token_index
+
+tokenizers = pytest.importorskip("tokenizers")
+
+WORDS = "employees accrue paid time-off at a rate of 1.5 days per month; managers approve (HR portal) naïve ok?".split()
+
+@pytest.fixture
+def minilm_like(tmp_path, monkeypatch):
+    # Small BERT-style wordpiece tokenizer: same normalizer/pre-tokenizer/post-processor as MiniLM
+    from tokenizers import Tokenizer, models, normalizers, pre_tokenizers, processors, trainers
+    rng = random.Random(0)
+    tok = Tokenizer(models.WordPiece(unk_token="[UNK]"))
+    tok.normalizer = normalizers.BertNormalizer(lowercase=True)
+    tok.pre_tokenizer = pre_tokenizers.BertPreTokenizer()
+    corpus = [" ".join(rng.choice(WORDS) for _ in range(30)) for _ in range(100)]
+    tok.train_from_iterator(corpus, trainers.WordPieceTrainer(vocab_size=120, special_tokens=["[PAD]", "[UNK]", "[CLS]", "[SEP]"]))
+    tok.post_processor = processors.TemplateProcessing(
+        single="[CLS] $A [SEP]", special_tokens=[("[CLS]", tok.token_to_id("[CLS]")), ("[SEP]", tok.token_to_id("[SEP]"))])
+    tok.save(str(tmp_path / "tokenizer.json"))
+    monkeypatch.setenv("CHUNK_TOKENIZER", str(tmp_path))
+    monkeypatch.setattr(token_index, "_tokenizer", None)
+    monkeypatch.setattr(token_index, "TOKEN_INDEX_DIR", str(tmp_path / "index"))
+    return lambda s: tok.encode(s, add_special_tokens=False).ids
+
+def test_windows_fit_exact_wordpiece_budget(minilm_like, tmp_path):
+    rng = random.Random(1)
+    text = "\n".join(" ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 40))) for _ in range(200))
+    path = tmp_path / "doc.txt"
+    path.write_text(text, encoding="utf-8")
+    chunks = services_chunk.token_chunk(str(path), 50, 0, "minilm_wordpiece")
+    assert len(chunks) > 1
+    assert all(0 < len(minilm_like(c)) <= 50 for c in chunks)
+    # Word-aligned cuts: re-tokenizing the chunks gives back the document's tokens
+    assert sum((minilm_like(c) for c in chunks), []) == minilm_like(text)
+    with_overlap = services_chunk.token_chunk(str(path), 50, 10, "minilm_wordpiece")
+    assert all(len(minilm_like(c)) <= 50 for c in with_overlap) and len(with_overlap) > len(chunks)
+
+def test_window_capped_at_model_input(minilm_like):
+    text = " ".join(["employees"] * 2000)
+    assert token_index.max_window() == 254
+    chunks = list(token_index.wordpiece_windows(text, 700, 150))
+    assert max(len(minilm_like(c)) for c in chunks) == 254
+    with pytest.raises(ValueError):
+        list(token_index.wordpiece_windows(text, 700, 300))
+
+def test_offsets_cached_by_content_hash(minilm_like, monkeypatch):
+    text = " ".join(WORDS * 20)
+    first = list(token_index.wordpiece_windows(text, 40, 5))
+    def no_retokenize(text):
+        raise AssertionError("tokenized twice")
+    monkeypatch.setattr(token_index, "_build_index", no_retokenize)
+    before = token_index.index_stats()["hits"]
+    assert list(token_index.wordpiece_windows(text, 40, 5)) == first
+    assert len(list(token_index.wordpiece_windows(text, 30, 0))) > len(first)
+    assert token_index.index_stats()["hits"] == before + 2
@@ -0,0 +1,37 @@
+import json, os
+import numpy as np
+from scripts import vector_search
+
+def _write_index(tmp_path, monkeypatch, ids):
+    jsonl, npy, meta = tmp_path / "policies.jsonl", tmp_path / "policies.npy", tmp_path / "meta.json"
+    monkeypatch.setattr(vector_search, "INDEX_JSONL", jsonl)
+    monkeypatch.setattr(vector_search, "EMB_NPY", npy)
+    monkeypatch.setattr(vector_search, "META_JSON", meta)
+    jsonl.write_text("".join(json.dumps({"id": i, "text": f"text of {i}"}) + "\n" for i in reversed(ids)), encoding="utf-8")
+    np.save(npy, np.eye(len(ids), 4, dtype=np.float32))
+    meta.write_text(json.dumps({"model_name": "m", "id_map": [{"id": i, "doc_id": i, "chunk_id": 0} for i in ids]}),
+                    encoding="utf-8")
+
+def test_resident_index_swapped_as_one_tuple(tmp_path, monkeypatch):
+    monkeypatch.setattr(vector_search, "_resident", None)
+    _write_index(tmp_path, monkeypatch, ["a", "b"])
+    mat, meta, offsets = vector_search.load_index()
+    assert vector_search.load_index()[1] is meta
+    held = vector_search._resident
+    _write_index(tmp_path, monkeypatch, ["c", "d", "e"])
+    os.utime(vector_search.META_JSON, ns=(1, 1))
+    mat2, meta2, offsets2 = vector_search.load_index()
+    # The old tuple is untouched; the new one pairs the new matrix with its own meta and offsets
+    assert held[2] is meta and len(held[1]) == len(held[3]) == 2
+    assert len(mat2) == len(meta2["id_map"]) == len(offsets2) == 3
+    recs = vector_search.hydrate([0, 2], offsets2)
+    assert recs[0]["id"] == "c" and recs[2]["id"] == "e"
+
+def test_search_batch_hits_use_resident_rows(tmp_path, monkeypatch):
+    monkeypatch.setattr(vector_search, "_resident", None)
+    _write_index(tmp_path, monkeypatch, ["a", "b", "c"])
+    monkeypatch.setattr(vector_search, "encode_queries",
+                        lambda queries, model, device: np.eye(4, dtype=np.float32)[[2, 0][:len(queries)]])
+    hits = vector_search.search_batch(["q1", "q2"], 1)
+    assert [h[0]["id"] for h in hits] == ["c", "a"]
+    assert hits[0][0]["preview"].startswith("text of c")